@@ -0,0 +1,552 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from io import BytesIO
+
+from cache_gemini import CacheGemini, clave_cache
+from indice_columnas import IndiceColumnas, extraer_columnas, texto_pendiente
+from instrumentacion import anotar, etapa, medir
+from json_incremental import decodificar_texto, iterar_arrays_json, FlujoTrozos
+from lotes import ejecutar_en_lote, fusionar_resultados_gemini, origen_columna
+from medidas_dax import (
+    columna_categorica_preferida, columnas_numericas_preferidas, es_columna_clave_o_constante, tabla_de_columna
+)
+from metadatos import parsear_metadatos, parsear_texto_metadatos
+from tokens import contar_tokens, dividir_por_tablas, PRESUPUESTO_TOKENS_DEFECTO
+
+# Biblioteca de análisis sin Streamlit: la usan la app y la CLI. pandas, PIL y google-genai se
+# importan dentro de las funciones que los necesitan para que importar este módulo sea inmediato.
+
+MODELO_GEMINI = 'gemini-2.5-flash'
+
+# Archivos por encima de este tamaño se perfilan en streaming en lugar de cargarse completos
+UMBRAL_STREAMING_BYTES = 50 * 1024 * 1024
+
+# Claves del esquema que se piden a Gemini; las listas se reciben elemento a elemento
+CLAVES_RESPUESTA_GEMINI = ('nombre_tabla', 'columnas', 'relaciones_posibles', 'metricas_clave')
+CLAVES_LISTA_GEMINI = ('columnas', 'relaciones_posibles', 'metricas_clave')
+
+RUTA_CACHE_GEMINI = os.getenv("GEMINI_CACHE_PATH", os.path.join(tempfile.gettempdir(), "daxdesktop_gemini_cache.sqlite"))
+RUTA_INDICE_COLUMNAS = os.getenv("DAX_INDICE_COLUMNAS_PATH", os.path.join(tempfile.gettempdir(), "daxdesktop_indice_columnas.sqlite"))
+
+# Extensiones por tipo de entrada
+EXTENSIONES_DATOS = ('csv', 'xlsx', 'xls')
+EXTENSIONES_IMAGEN = ('png', 'jpg', 'jpeg')
+EXTENSIONES_ESTRUCTURA = ('json', 'txt')
+
+# Instrucciones y esquemas de las peticiones a Gemini: se construyen una vez por proceso. Forman
+# parte de la clave de la caché, así que cambiarlos invalida las respuestas guardadas.
+INSTRUCCIONES_IMAGEN = (
+    "Eres un experto en Power BI y análisis de modelos de datos. Tu tarea es analizar la imagen "
+    "que contiene una tabla, datos, o una vista del modelo de datos de Power BI. "
+    "Devuelve **SOLO** un objeto JSON con la estructura exacta definida a continuación. "
+    "Identifica los nombres de las columnas, su tipo lógico (numerico/categorico/fecha), "
+    "y sugiere métricas clave y relaciones. No incluyas texto explicativo."
+)
+ESQUEMA_IMAGEN_JSON = json.dumps({
+    "nombre_tabla": "nombre sugerido para la tabla",
+    "columnas": [
+        {"nombre": "nombre_columna", "tipo": "numerico/categorico/fecha", "descripcion": "breve descripción"},
+    ],
+    "relaciones_posibles": ["descripción de posibles relaciones con otras tablas (si aplica)"],
+    "metricas_clave": ["lista de métricas importantes identificadas"]
+}, indent=2)
+PETICION_IMAGEN = (
+    "Analiza esta imagen y devuelve la información de la tabla usando el siguiente esquema JSON.",
+    "Esquema JSON Requerido: " + ESQUEMA_IMAGEN_JSON,
+)
+
+INSTRUCCIONES_TEXTO = (
+    "Eres un experto en Power BI. Analiza el siguiente texto que contiene la estructura de un modelo de datos (nombres de tablas, columnas y tipos). "
+    "Devuelve SOLO un objeto JSON con la estructura solicitada, extrayendo los nombres de las columnas, su tipo lógico (numerico/categorico/fecha) y sugiriendo métricas clave."
+)
+ESQUEMA_TEXTO_JSON = json.dumps({
+    "nombre_tabla": "nombre_principal",
+    "columnas": [
+        {"nombre": "nombre_columna", "tipo": "numerico/categorico/fecha", "descripcion": ""},
+    ],
+    "relaciones_posibles": ["descripción de relaciones"],
+    "metricas_clave": ["métricas importantes"]
+}, indent=2)
+PETICION_TEXTO = "Analiza la estructura de datos a continuación. Usa este Esquema JSON Requerido: " + ESQUEMA_TEXTO_JSON
+
+
+# FUNCIÓN: Cliente de Gemini con reintentos (google-genai se importa en la primera petición)
+def crear_cliente_gemini(api_key=None, modelo=MODELO_GEMINI):
+    from cliente_gemini import ClienteGemini, ClientePerezoso
+
+    api_key = api_key or os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("Falta la clave de API de Gemini (GOOGLE_API_KEY).")
+    return ClienteGemini(ClientePerezoso(api_key), modelo)
+
+
+# FUNCIÓN: Caché persistente de respuestas de Gemini
+def crear_cache_gemini(ruta=RUTA_CACHE_GEMINI):
+    return CacheGemini(ruta)
+
+
+# FUNCIÓN: Índice persistente de columnas aprendidas de análisis anteriores
+def crear_indice_columnas(ruta=RUTA_INDICE_COLUMNAS):
+    return IndiceColumnas(ruta)
+
+
+# FUNCIÓN: Extensión en minúsculas de un nombre de archivo
+def extension_de(nombre):
+    return nombre.rsplit('.', 1)[-1].lower() if '.' in nombre else ''
+
+
+# FUNCIÓN: Análisis de Estructura de Datos (desde DataFrame)
+def analizar_estructura(df):
+    """ Función que analiza un DataFrame para extraer tipos de columnas y sus estadísticas. """
+    from perfilado import perfilar_dataframe
+
+    return perfilar_dataframe(df)
+
+
+# FUNCIÓN: Perfilar un archivo de datos (CSV/Excel) completo o, si es grande, por bloques
+def perfilar_archivo_datos(nombre, archivo, huella, tamano=None):
+    """ `archivo` es un objeto binario con seek; `tamano` en bytes decide entre carga completa y streaming. """
+    from ingesta import leer_datos
+    from perfilado import perfilar_por_bloques, TAMANO_BLOQUE_DEFECTO
+
+    if tamano is not None and tamano > UMBRAL_STREAMING_BYTES:
+        archivo.seek(0)
+        with etapa('perfilado', modo='streaming'):
+            return perfilar_por_bloques(archivo, nombre, TAMANO_BLOQUE_DEFECTO)
+    with etapa('lectura_datos'):
+        df = leer_datos(archivo, nombre, huella)
+    with etapa('perfilado', modo='completo'):
+        return analizar_estructura(df)
+
+
+# FUNCIÓN: Análisis de Imagen con Gemini Vision (CORREGIDA PARA ROBUSTEZ)
+def analizar_imagen_con_gemini(cliente, cache, imagen_data, bytes_originales=None, informe=None, al_recibir=None):
+    """
+    Preprocesa la imagen (recorte, reducción, recompresión y mosaicos) antes de enviarla a Gemini.
+    `al_recibir` solo se usa con una sola imagen: los mosaicos se consultan en hilos sin acceso a st.
+    """
+    from google.genai import types
+    from imagenes import preparar_imagen
+
+    clave = clave_cache(
+        cliente.modelo, INSTRUCCIONES_IMAGEN, ESQUEMA_IMAGEN_JSON,
+        imagen_data.mode, str(imagen_data.size), imagen_data.tobytes()
+    )
+    en_cache = cache.obtener(clave)
+    if en_cache is not None:
+        return en_cache
+
+    inicio = time.perf_counter()
+    preparada = preparar_imagen(imagen_data, bytes_originales)
+    partes = [types.Part.from_bytes(data=datos, mime_type=mime) for datos, mime in preparada['partes']]
+
+    if len(partes) == 1:
+        resultado = _consultar_imagen_gemini(cliente, partes[0], al_recibir)
+    else:
+        # Diagramas muy grandes: cada mosaico se analiza por separado y los resultados se fusionan
+        tareas = [(f"mosaico {i + 1}", _consultar_imagen_gemini, (cliente, parte))
+                  for i, parte in enumerate(partes)]
+        parciales = [r for _, r, _ in ejecutar_en_lote(tareas, concurrencia=len(tareas))]
+        correctos = [r for r in parciales if 'error' not in r]
+        resultado = fusionar_resultados_gemini(correctos) if correctos else parciales[0]
+
+    if informe is not None:
+        informe.update(preparada['informe'], segundos_total=time.perf_counter() - inicio)
+    cache.guardar(clave, resultado)
+    return resultado
+
+
+# FUNCIÓN: Consultar Gemini en streaming y parsear el JSON a medida que llega
+def consultar_gemini_json(cliente, instrucciones, contenido, al_recibir=None):
+    """
+    `instrucciones` va como system_instruction y `contenido` (textos y Parts de google-genai) como
+    el mensaje del usuario. Devuelve el objeto del esquema. `al_recibir(clave, valor)` se llama con cada columna (y cada
+    escalar) en cuanto termina de llegar. Si el flujo se corta después de alguna columna, se
+    devuelve lo recibido marcado como 'truncado' (no se guarda en caché).
+    """
+    resultado = {clave: [] for clave in CLAVES_LISTA_GEMINI}
+    with etapa('gemini', modelo=cliente.modelo) as registro:
+        inicio = time.perf_counter()
+        config = {'response_mime_type': 'application/json', 'system_instruction': instrucciones}
+        trozos = cliente.generar_flujo(list(contenido), config=config)
+        try:
+            for clave, valor in iterar_arrays_json(FlujoTrozos(trozos), CLAVES_RESPUESTA_GEMINI):
+                if clave in CLAVES_LISTA_GEMINI:
+                    resultado[clave].append(valor)
+                else:
+                    resultado[clave] = valor
+                if clave == 'columnas' and len(resultado['columnas']) == 1 and registro is not None:
+                    registro['atributos']['segundos_primera_columna'] = round(time.perf_counter() - inicio, 3)
+                if al_recibir is not None:
+                    al_recibir(clave, valor)
+        except Exception:
+            if not resultado['columnas']:
+                raise
+            resultado['truncado'] = True
+        if registro is not None:
+            registro['atributos'].update(columnas=len(resultado['columnas']), truncado=bool(resultado.get('truncado')))
+    if not resultado['columnas'] and 'nombre_tabla' not in resultado:
+        raise ValueError("Gemini devolvió una respuesta vacía o sin el esquema pedido.")
+    return resultado
+
+
+# FUNCIÓN: Llamada a Gemini Vision para una imagen ya preprocesada
+def _consultar_imagen_gemini(cliente, parte_imagen, al_recibir=None):
+    from google.genai.errors import APIError
+    from cliente_gemini import CircuitoAbierto
+
+    try:
+        return consultar_gemini_json(cliente, INSTRUCCIONES_IMAGEN, [*PETICION_IMAGEN, parte_imagen], al_recibir)
+    except CircuitoAbierto as e:
+        return {"error": f"Gemini no está disponible ahora mismo: {e}"}
+    except APIError as e:
+        return {"error": f"Error de API de Gemini: {e}. Revise la clave o el uso."}
+    except ValueError as e:
+         return {"error": f"El modelo no devolvió JSON válido: {e}"}
+    except Exception as e:
+         return {"error": f"Error de procesamiento de Visión: {e}. Intente con una imagen más clara."}
+
+
+# FUNCIÓN: Convertir Análisis de Imagen a formato estándar
+def convertir_analisis_imagen(analisis_gemini):
+    analisis = {
+        'columnas': [],
+        'tipos': {},
+        'numericas': [],
+        'categoricas': [],
+        'fechas': [],
+        'nulls': {},
+        'nombre_tabla': analisis_gemini.get('nombre_tabla', 'Tabla'),
+        'relaciones': analisis_gemini.get('relaciones_posibles', []),
+        'metricas_clave': analisis_gemini.get('metricas_clave', [])
+    }
+    if analisis_gemini.get('truncado'):
+        analisis['truncado'] = True
+    if analisis_gemini.get('fragmentos_reutilizados'):
+        analisis['fragmentos'] = analisis_gemini['fragmentos']
+        analisis['fragmentos_reutilizados'] = analisis_gemini['fragmentos_reutilizados']
+    if analisis_gemini.get('clasificadas_localmente'):
+        analisis['clasificadas_localmente'] = analisis_gemini['clasificadas_localmente']
+    descripciones = {c['nombre']: c['descripcion'] for c in analisis_gemini.get('columnas', [])
+                     if c.get('nombre') and c.get('descripcion')}
+    if descripciones:
+        analisis['descripciones'] = descripciones
+
+    for col_info in analisis_gemini.get('columnas', []):
+        nombre = col_info.get('nombre')
+        tipo = col_info.get('tipo', '').lower()
+
+        if not nombre: continue
+        if nombre in analisis['tipos']:
+            # El mismo nombre en otra tabla (fragmentos fusionados) se califica con ella: 'Nombre (Producto)'
+            tabla = col_info.get('tabla')
+            if not tabla or f'{nombre} ({tabla})' in analisis['tipos']:
+                continue
+            analisis.setdefault('origen_columnas', {})[f'{nombre} ({tabla})'] = (tabla, nombre)
+            nombre = f'{nombre} ({tabla})'
+
+        analisis['columnas'].append(nombre)
+        analisis['tipos'][nombre] = tipo
+        analisis['nulls'][nombre] = 0
+
+        if tipo == 'numerico':
+            analisis['numericas'].append(nombre)
+        elif tipo == 'fecha':
+            analisis['fechas'].append(nombre)
+        else:
+            analisis['categoricas'].append(nombre)
+
+    return analisis
+
+
+# FUNCIÓN: Clasificar con el índice local las columnas de un volcado de estructura
+def clasificar_texto_con_indice(indice, texto_datos):
+    """
+    Devuelve (respuesta con el esquema de Gemini, volcado con las columnas desconocidas o None).
+    La respuesta es None si el índice no reconoce ninguna columna o el texto no es una lista de columnas.
+    """
+    with etapa('indice_columnas'):
+        columnas = extraer_columnas(texto_datos)
+        if not columnas:
+            return None, None
+        clasificadas = [None if c.get('ambigua') else indice.clasificar(c['nombre']) for c in columnas]
+        conocidas = sum(1 for c in clasificadas if c is not None)
+        anotar(columnas=len(columnas), conocidas=conocidas)
+        if not conocidas:
+            return None, None
+    pendientes = [c for c, clasificada in zip(columnas, clasificadas) if clasificada is None]
+    respuesta = {
+        'nombre_tabla': next((c['tabla'] for c in columnas if c['tabla']), 'Tabla'),
+        # Las desconocidas quedan como hueco ({'nombre'}) para conservar el orden del volcado
+        'columnas': [
+            {k: clasificada[k] for k in ('nombre', 'tipo', 'descripcion')} if clasificada else {'nombre': c['nombre']}
+            for c, clasificada in zip(columnas, clasificadas)
+        ],
+        'relaciones_posibles': [],
+        'metricas_clave': [],
+        'clasificadas_localmente': [c['nombre'] for c in clasificadas if c is not None],
+    }
+    return respuesta, texto_pendiente(pendientes) if pendientes else None
+
+
+# FUNCIÓN: Completar los huecos de la respuesta del índice con la de Gemini
+def _completar_con_gemini(respuesta, resultado):
+    de_gemini = {c.get('nombre'): c for c in resultado.get('columnas', [])}
+    columnas = []
+    for col in respuesta['columnas']:
+        col = col if 'tipo' in col else de_gemini.get(col['nombre'])
+        if col is not None:
+            columnas.append(col)
+    nombres = {c['nombre'] for c in columnas}
+    columnas += [c for nombre, c in de_gemini.items() if nombre not in nombres]
+    completa = dict(resultado, columnas=columnas, clasificadas_localmente=respuesta['clasificadas_localmente'])
+    if completa.get('nombre_tabla') in (None, '', 'Tabla', 'nombre_principal'):
+        completa['nombre_tabla'] = respuesta['nombre_tabla']
+    return completa
+
+
+# FUNCIÓN: Analizar Texto con Gemini
+def analizar_texto_con_gemini(cliente, cache, texto_datos, al_recibir=None, indice=None):
+    clave = clave_cache(cliente.modelo, INSTRUCCIONES_TEXTO, ESQUEMA_TEXTO_JSON, texto_datos)
+    en_cache = cache.obtener(clave)
+    if en_cache is not None:
+        return en_cache
+
+    # Las columnas ya conocidas se clasifican con el índice; a Gemini solo va el resto del volcado
+    if indice is not None:
+        respuesta, pendiente = clasificar_texto_con_indice(indice, texto_datos)
+        if respuesta is not None:
+            if pendiente is None:
+                return respuesta
+            resultado = analizar_texto_con_gemini(cliente, cache, pendiente, al_recibir)
+            return resultado if 'error' in resultado else _completar_con_gemini(respuesta, resultado)
+
+    # Exportaciones grandes: se dividen por tablas y los fragmentos se analizan en paralelo
+    if contar_tokens(texto_datos) > PRESUPUESTO_TOKENS_DEFECTO:
+        fragmentos = dividir_por_tablas(texto_datos, PRESUPUESTO_TOKENS_DEFECTO)
+        if len(fragmentos) > 1:
+            # Re-análisis: los fragmentos sin cambios (misma clave) salen de la caché sin pasar por el lote
+            previos = [cache.obtener(clave_cache(cliente.modelo, INSTRUCCIONES_TEXTO, ESQUEMA_TEXTO_JSON, f)) for f in fragmentos]
+            tareas = [(f"fragmento {i + 1}", analizar_texto_con_gemini, (cliente, cache, fragmento))
+                      for i, (fragmento, previo) in enumerate(zip(fragmentos, previos)) if previo is None]
+            nuevos = iter([r for _, r, _ in sorted(ejecutar_en_lote(tareas), key=lambda t: int(t[0].split()[-1]))])
+            parciales = [previo if previo is not None else next(nuevos) for previo in previos]
+            correctos = [r for r in parciales if 'error' not in r]
+            if not correctos:
+                return parciales[0]
+            resultado = fusionar_resultados_gemini(correctos)
+            if any(r.get('truncado') for r in correctos):
+                resultado['truncado'] = True
+            if len(correctos) < len(parciales):
+                resultado['fragmentos_con_error'] = len(parciales) - len(correctos)
+            else:
+                cache.guardar(clave, resultado)
+            # Solo para esta respuesta: un acierto posterior de la caché no reutiliza fragmentos
+            return dict(resultado, fragmentos=len(fragmentos), fragmentos_reutilizados=len(fragmentos) - len(tareas))
+
+    try:
+        resultado = consultar_gemini_json(cliente, INSTRUCCIONES_TEXTO, [PETICION_TEXTO, f"Datos: \n{texto_datos}"], al_recibir)
+        cache.guardar(clave, resultado)
+        return resultado
+
+    except Exception as e:
+         return {"error": f"Error de análisis de texto con Gemini: {e}"}
+
+
+# FUNCIÓN: Analizar un archivo por su contenido (sin llamadas a st.; se usa desde hilos y procesos)
+def analizar_archivo(nombre, contenido, cliente=None, cache=None, indice=None):
+    """
+    CSV/Excel se perfilan localmente; JSON y TXT se leen como metadatos si es posible, si no se
+    clasifican con el `indice` y lo desconocido se envía a Gemini igual que las imágenes.
+    Sin `cliente`, lo que necesitaría Gemini devuelve error.
+    """
+    extension = extension_de(nombre)
+    if extension in EXTENSIONES_DATOS:
+        huella = hashlib.sha256(contenido).hexdigest()
+        return perfilar_archivo_datos(nombre, BytesIO(contenido), huella, len(contenido))
+
+    if extension in EXTENSIONES_IMAGEN:
+        if cliente is None:
+            return {"error": "Las imágenes necesitan Gemini (falta GOOGLE_API_KEY)."}
+        from PIL import Image
+
+        resultado = analizar_imagen_con_gemini(cliente, cache, Image.open(BytesIO(contenido)))
+    elif extension in EXTENSIONES_ESTRUCTURA:
+        texto = decodificar_texto(contenido)
+        data = json.loads(texto) if extension == 'json' else None
+        if isinstance(data, dict) and 'columnas' in data:
+            resultado = data
+        else:
+            analisis_local = parsear_metadatos(data) if extension == 'json' else parsear_texto_metadatos(texto)
+            if analisis_local:
+                return analisis_local
+            if cliente is not None:
+                resultado = analizar_texto_con_gemini(cliente, cache, texto, indice=indice)
+            else:
+                resultado, pendiente = clasificar_texto_con_indice(indice, texto) if indice else (None, None)
+                if resultado is None or pendiente is not None:
+                    return {"error": "No se reconoció el formato de metadatos y Gemini no está configurado."}
+    else:
+        return {"error": f"Tipo de archivo no soportado: .{extension}"}
+
+    if 'error' in resultado:
+        return resultado
+    analisis = convertir_analisis_imagen(resultado)
+    if analisis['nombre_tabla'] == 'Tabla':
+        analisis['nombre_tabla'] = nombre.rsplit('.', 1)[0]
+    return analisis
+
+
+# FUNCIÓN: Analizar un archivo del disco (los CSV/Excel grandes se perfilan sin leerlos enteros en memoria)
+def analizar_ruta(ruta, cliente=None, cache=None, indice=None):
+    nombre = os.path.basename(ruta)
+    if extension_de(nombre) not in EXTENSIONES_DATOS:
+        with open(ruta, 'rb') as f:
+            return analizar_archivo(nombre, f.read(), cliente, cache, indice)
+    huella = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b''):
+            huella.update(bloque)
+        return perfilar_archivo_datos(nombre, f, huella.hexdigest(), os.path.getsize(ruta))
+
+
+# FUNCIÓN: Vistas previas de las gráficas recomendadas con los datos reales de un CSV/Excel
+@medir('previsualizacion_graficas')
+def previsualizar_graficas(nombre, archivo, huella, graficas, fechas, df=None):
+    """
+    Con `df` se agrega el DataFrame ya cargado; sin él se recorren en lotes solo las columnas que usan
+    las gráficas, con tipos fijos (números como float64, claves como diccionario de texto).
+    """
+    import pyarrow as pa
+    from ingesta import iterar_lotes_datos
+    from previsualizacion import AgregadorGraficas
+
+    agregador = AgregadorGraficas(graficas, fechas)
+    if df is not None:
+        agregador.agregar(df)
+        return agregador.resultado()
+    roles = agregador.columnas()
+    tipos = {col: pa.float64() if rol == 'numerica' else pa.dictionary(pa.int32(), pa.string()) for col, rol in roles.items()}
+    for bloque in iterar_lotes_datos(archivo, nombre, huella, roles, tipos):
+        agregador.agregar(bloque)
+    return agregador.resultado()
+
+
+# FUNCIÓN: Sugerir KPI/OKR
+@medir('sugerir_kpi_okr')
+def sugerir_kpi_okr(analisis, nombre_tabla):
+    """ Las medidas base reutilizan las del catálogo ([Total X], [X Mes Anterior]...) para que RevisorDax no las marque. """
+    sugerencias = []
+    numericas = columnas_numericas_preferidas(analisis)
+    # Solo las columnas que no son claves ni constantes tienen [Total X] y sus derivadas en el catálogo
+    medibles = [col for col in numericas if not es_columna_clave_o_constante(analisis, col)]
+
+    if analisis['numericas']:
+        num_col = numericas[0]
+
+        objetivo = f'Monitorear la suma promedio o total de `{num_col}` por entidad/tiempo.'
+        stats = analisis.get('estadisticas', {}).get(num_col)
+        if stats:
+            # El rango intercuartílico por fila ayuda a fijar umbrales realistas para el medidor
+            objetivo += f" Valor típico por fila (p25–p75): {stats['percentiles'][25]:,.2f} – {stats['percentiles'][75]:,.2f}."
+        sugerencias.append({
+            'nombre': f'KPI: Tasa de {num_col}',
+            'objetivo': objetivo,
+            'dax_base': (
+                f'[Total {num_col}]' if num_col in medibles
+                else f'SUM({tabla_de_columna(analisis, num_col, nombre_tabla)}[{origen_columna(analisis, num_col)[1]}])'
+            ),
+            'tipo': 'Monitoreo de Volumen',
+            'visualizacion': 'Tarjeta o Medidor'
+        })
+
+        if analisis['fechas'] and medibles:
+            sugerencias.append({
+                'nombre': f'KPI: Crecimiento de {num_col} (MoM)',
+                'objetivo': f'Medir la variación porcentual de `{num_col}` respecto al mes anterior (Month-over-Month).',
+                'dax_base': f'\nVAR Anterior = [{num_col} Mes Anterior]\nRETURN\n    DIVIDE([Total {num_col}] - Anterior, Anterior)',
+                'tipo': 'Rendimiento y Crecimiento',
+                'visualizacion': 'Flechas Condicionales o Gráfico de Área'
+            })
+
+    if len(medibles) >= 2:
+        num_col_1 = medibles[0]
+        num_col_2 = medibles[1]
+
+        sugerencias.append({
+            'nombre': f'KPI: Ratio de {num_col_1} vs {num_col_2}',
+            'objetivo': f'Medir la eficiencia o relación entre `{num_col_1}` y `{num_col_2}` (Ej: Ingreso/Costo).',
+            'dax_base': f'DIVIDE([Total {num_col_1}], [Total {num_col_2}], 0)',
+            'tipo': 'Eficiencia/Razón',
+            'visualizacion': 'Tarjeta o Gráfico de Dispersión'
+        })
+
+    if analisis['categoricas'] and medibles:
+        num_col = medibles[0]
+        cat_col = columna_categorica_preferida(analisis)
+
+        sugerencias.append({
+            'nombre': f'OKR: Top {cat_col} Contribuyentes',
+            'objetivo': f'Identificar y aumentar el porcentaje de `{num_col}` aportado por el Top 5 de `{cat_col}`.',
+            'dax_base': f'DIVIDE([{num_col} Top 5 {cat_col}], [Total {num_col}], 0)',
+            'tipo': 'Foco Estratégico',
+            'visualizacion': 'Gráfico de Barras con Pareto'
+        })
+
+    return sugerencias
+
+# FUNCIÓN: Recomendar Gráficas
+@medir('recomendar_graficas')
+def recomendar_graficas(analisis):
+    recomendaciones = []
+    numericas = columnas_numericas_preferidas(analisis)
+
+    if analisis['fechas'] and analisis['numericas']:
+        recomendaciones.append({
+            'tipo': 'Gráfico de Líneas',
+            'uso': f'Tendencia temporal de {numericas[0]} a lo largo del tiempo (KPIs de crecimiento)',
+            'columnas': [analisis['fechas'][0], numericas[0]],
+            'icono': '📈'
+        })
+
+    if analisis['categoricas'] and analisis['numericas']:
+        cat_col = columna_categorica_preferida(analisis)
+        recomendaciones.append({
+            'tipo': 'Gráfico de Cascada (Waterfall)',
+            'uso': 'Mostrar la contribución o descomposición de una métrica por categoría o estado (ideal para demostrar el impacto en un OKR).',
+            'columnas': [cat_col, numericas[0]],
+            'icono': '🌊'
+        })
+        recomendaciones.append({
+            'tipo': 'Gráfico de Barras/Columnas',
+            'uso': f'Comparar {numericas[0]} por {cat_col}',
+            'columnas': [cat_col, numericas[0]],
+            'icono': '📊'
+        })
+
+    if len(analisis['numericas']) >= 2:
+        recomendaciones.append({
+            'tipo': 'Gráfico de Dispersión',
+            'uso': f'Analizar correlación entre {numericas[0]} y {numericas[1]} (KPIs de Eficiencia)',
+            'columnas': numericas[:2],
+            'icono': '📊'
+        })
+
+    if analisis['numericas']:
+        recomendaciones.append({
+            'tipo': 'Tarjeta de KPI con Tendencia',
+            'uso': f'Visualizar métrica clave ({numericas[0]}) con comparación de período anterior (MoM o YoY)',
+            'columnas': [numericas[0]],
+            'icono': '🎯'
+        })
+        recomendaciones.append({
+            'tipo': 'Gráfico de Medidor (Gauge)',
+            'uso': f'Visualizar progreso de {numericas[0]} hacia una meta (Objetivos)',
+            'columnas': [numericas[0]],
+            'icono': '🎚️'
+        })
+
+    return recomendaciones
@@ -0,0 +1,143 @@
+"""
+Mide el arranque en frío de la app como lo paga la primera sesión de un contenedor recién creado:
+tiempo hasta terminar la primera ejecución del script y RSS pico, cada escenario en un proceso nuevo.
+
+Uso:
+    python benchmarks/bench_arranque.py --repeticiones 5
+Escenarios:
+    streamlit        script vacío (el suelo: lo que cuesta cualquier app de Streamlit)
+    app_csv          primera ejecución de streamlit_app.py en el camino de CSV/Excel
+    app_csv_anterior lo mismo con la carga anticipada anterior (google-genai, langchain_core y genai.Client
+                     antes del script) para comparar con el mismo árbol
+    primera_gemini   primera petición de texto con un ClienteGemini creado por crear_cliente_gemini: el
+                     coste de google-genai que ahora se paga solo al llamar a Gemini
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+ESCENARIOS = ('streamlit', 'app_csv', 'app_csv_anterior', 'primera_gemini')
+
+# Módulos cuya presencia tras el arranque se informa
+MODULOS_PESADOS = ('pandas', 'pyarrow', 'PIL.Image', 'google.genai', 'langchain_core', 'tiktoken')
+
+
+# FUNCIÓN: RSS pico del proceso en MB
+def rss_pico_mb():
+    # ru_maxrss se hereda a través de fork/exec en Linux; VmHWM pertenece solo a este proceso
+    try:
+        with open('/proc/self/status') as f:
+            for linea in f:
+                if linea.startswith('VmHWM:'):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# FUNCIÓN: Carga anticipada del diseño anterior (cliente de Gemini y LangChain al importar la app)
+def precargar_anterior():
+    from google import genai
+
+    try:
+        import langchain_core.messages  # noqa: F401
+    except ImportError:
+        # Ya no es una dependencia: sin instalar, el escenario solo incluye google-genai
+        pass
+    genai.Client(api_key=os.environ['GOOGLE_API_KEY'])
+
+
+# FUNCIÓN: Primera petición de texto a Gemini con el transporte sustituido por uno local
+def primera_peticion_gemini():
+    from analizador import crear_cliente_gemini, analizar_texto_con_gemini
+    from cache_gemini import CacheGemini
+    from cliente_gemini import ClienteFalso
+
+    cliente = crear_cliente_gemini()
+    # Se fuerza la creación perezosa del genai.Client (la importación que se mide) y luego se
+    # sustituye por un cliente local para no salir a la red
+    cliente.cliente.models
+    cliente.cliente._cliente = ClienteFalso(['{"nombre_tabla": "T", "columnas": [{"nombre": "a", "tipo": "numerico"}]}'])
+    resultado = analizar_texto_con_gemini(cliente, CacheGemini(':memory:'), "Tabla T\n  - a (int64)")
+    if 'error' in resultado:
+        raise RuntimeError(resultado['error'])
+
+
+# FUNCIÓN: Ejecutar un escenario en este proceso y devolver sus métricas
+def medir(escenario):
+    inicio = time.perf_counter()
+    if escenario == 'primera_gemini':
+        primera_peticion_gemini()
+    else:
+        from streamlit.testing.v1 import AppTest
+
+        if escenario == 'app_csv_anterior':
+            precargar_anterior()
+        if escenario == 'streamlit':
+            app = AppTest.from_string("import streamlit as st\nst.write('')", default_timeout=120)
+        else:
+            app = AppTest.from_file(os.path.join(RAIZ, 'streamlit_app.py'), default_timeout=120)
+        app.run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+    return {
+        'escenario': escenario,
+        'segundos': round(time.perf_counter() - inicio, 4),
+        'rss_pico_mb': round(rss_pico_mb(), 1),
+        'modulos': [m for m in MODULOS_PESADOS if m in sys.modules],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=3, help="Procesos nuevos por escenario (se informa la mediana)")
+    parser.add_argument('--escenarios', nargs='+', choices=ESCENARIOS, default=list(ESCENARIOS))
+    parser.add_argument('--salida', help="Ruta del JSON de resultados (por defecto, stdout)")
+    parser.add_argument('--medir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        print(json.dumps(medir(args.medir)))
+        return
+
+    # Clave ficticia: la app no se detiene pidiéndola y ningún escenario sale a la red
+    entorno = dict(os.environ, GOOGLE_API_KEY=os.environ.get('GOOGLE_API_KEY', 'clave-bench'))
+    resultados = []
+    for escenario in args.escenarios:
+        medidas = []
+        for _ in range(args.repeticiones):
+            salida = subprocess.run(
+                [sys.executable, __file__, '--medir', escenario],
+                capture_output=True, text=True, check=True, env=entorno, cwd=RAIZ
+            )
+            medidas.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+        resultado = {
+            'escenario': escenario,
+            'segundos': statistics.median(m['segundos'] for m in medidas),
+            'segundos_min': min(m['segundos'] for m in medidas),
+            'rss_pico_mb': statistics.median(m['rss_pico_mb'] for m in medidas),
+            'modulos': medidas[-1]['modulos'],
+        }
+        resultados.append(resultado)
+        print(f"{escenario:<18} {resultado['segundos']:>8.3f} s  {resultado['rss_pico_mb']:>8.1f} MB RSS  "
+              f"{', '.join(resultado['modulos'])}", file=sys.stderr)
+
+    informe = {'parametros': {'repeticiones': args.repeticiones}, 'resultados': resultados}
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Compara tiempo de carga y memoria (RSS pico) de la ingesta actual con pandas
+frente a la ingesta columnar con pyarrow (CSV) y la caché Parquet (Excel).
+
+Uso:
+    python benchmarks/bench_ingesta.py --filas 200000 --columnas-texto 20
+Cada método se mide en un subproceso aparte para que el RSS pico no se contamine.
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+# FUNCIÓN: CSV sintético ancho y con mucho texto (como los que se perfilan en la app)
+def generar_datos(filas, columnas_texto, semilla=0):
+    rng = np.random.default_rng(semilla)
+    datos = {
+        'id': np.arange(filas),
+        'importe': rng.normal(100, 25, filas).round(2),
+        'cantidad': rng.integers(1, 50, filas),
+        'fecha': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 730, filas), unit='D'),
+    }
+    for i in range(columnas_texto):
+        # Mitad de columnas de baja cardinalidad (categorías) y mitad de alta (texto libre)
+        cardinalidad = 50 if i % 2 == 0 else filas
+        datos[f'texto_{i}'] = np.char.add(f'valor_{i}_', rng.integers(0, cardinalidad, filas).astype(str))
+    return pd.DataFrame(datos)
+
+
+# FUNCIÓN: RSS pico del proceso en MB
+def rss_pico_mb():
+    # ru_maxrss se hereda a través de fork/exec en Linux; VmHWM pertenece solo a este proceso
+    try:
+        with open('/proc/self/status') as f:
+            for linea in f:
+                if linea.startswith('VmHWM:'):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# FUNCIÓN: Ejecutar un método de carga en este proceso y devolver sus métricas
+def medir(metodo, ruta):
+    from ingesta import iterar_lotes_datos, leer_csv_arrow, leer_excel_cacheado
+
+    with open(ruta, 'rb') as f:
+        archivo = io.BytesIO(f.read())
+    huella = os.path.basename(ruta)
+
+    inicio = time.perf_counter()
+    if metodo == 'pandas_csv':
+        df = pd.read_csv(archivo)
+    elif metodo == 'arrow_csv':
+        df = leer_csv_arrow(archivo)
+    elif metodo == 'arrow_csv_proyeccion':
+        df = leer_csv_arrow(archivo, columnas=['id', 'importe', 'fecha', 'texto_0'])
+    elif metodo == 'pandas_excel':
+        df = pd.read_excel(archivo)
+    elif metodo == 'parquet_excel_primera':
+        df = leer_excel_cacheado(archivo, huella)
+    elif metodo == 'parquet_excel_lotes':
+        # Camino de las vistas previas: primera conversión y recorrido de pocas columnas en lotes
+        df = pd.concat(iterar_lotes_datos(archivo, 'datos.xlsx', huella, ['id', 'importe']))
+    elif metodo == 'parquet_excel_cacheado':
+        leer_excel_cacheado(archivo, huella)
+        inicio = time.perf_counter()
+        df = leer_excel_cacheado(archivo, huella)
+    else:
+        raise ValueError(f"Método desconocido: {metodo}")
+    segundos = time.perf_counter() - inicio
+
+    return {
+        'metodo': metodo,
+        'segundos': round(segundos, 4),
+        'rss_pico_mb': round(rss_pico_mb(), 1),
+        'memoria_df_mb': round(df.memory_usage(deep=True).sum() / 1024 ** 2, 1),
+        'filas': len(df),
+        'columnas': len(df.columns),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=200_000)
+    parser.add_argument('--filas-excel', type=int, default=20_000)
+    parser.add_argument('--columnas-texto', type=int, default=20)
+    parser.add_argument('--salida', help="Ruta del JSON de resultados (por defecto, stdout)")
+    parser.add_argument('--medir', nargs=2, metavar=('METODO', 'RUTA'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        print(json.dumps(medir(*args.medir)))
+        return
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_csv = os.path.join(carpeta, 'datos.csv')
+        ruta_excel = os.path.join(carpeta, 'datos.xlsx')
+        generar_datos(args.filas, args.columnas_texto).to_csv(ruta_csv, index=False)
+        generar_datos(args.filas_excel, args.columnas_texto).to_excel(ruta_excel, index=False)
+
+        entorno = dict(os.environ, DAX_PARQUET_CACHE_DIR=os.path.join(carpeta, 'parquet'))
+        casos = [
+            ('pandas_csv', ruta_csv), ('arrow_csv', ruta_csv), ('arrow_csv_proyeccion', ruta_csv),
+            ('pandas_excel', ruta_excel), ('parquet_excel_primera', ruta_excel), ('parquet_excel_lotes', ruta_excel),
+            ('parquet_excel_cacheado', ruta_excel),
+        ]
+        resultados = []
+        for metodo, ruta in casos:
+            # La caché Parquet se vacía antes de cada medición para que la "primera" lectura sea real
+            shutil.rmtree(entorno['DAX_PARQUET_CACHE_DIR'], ignore_errors=True)
+            salida = subprocess.run(
+                [sys.executable, __file__, '--medir', metodo, ruta],
+                capture_output=True, text=True, check=True, env=entorno
+            )
+            resultados.append(json.loads(salida.stdout))
+            print(f"{metodo:<24} {resultados[-1]['segundos']:>8.3f} s  {resultados[-1]['rss_pico_mb']:>8.1f} MB RSS", file=sys.stderr)
+
+    informe = {
+        'parametros': {'filas': args.filas, 'filas_excel': args.filas_excel, 'columnas_texto': args.columnas_texto},
+        'resultados': resultados,
+    }
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
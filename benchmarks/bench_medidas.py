@@ -0,0 +1,140 @@
+"""
+Mide el generador de medidas DAX y el render de la sección de medidas con ~10.000 medidas.
+
+Uso:
+    python benchmarks/bench_medidas.py --medidas 10000
+Compara pintar todas las medidas como st.expander (comportamiento anterior) con pintar una página,
+y mide la revisión DAX (referencias y patrones lentos) en medidas por segundo.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from medidas_dax import generar_medidas_dax  # noqa: E402
+from revision_dax import RevisorDax, resumir_revisiones  # noqa: E402
+
+# Script mínimo que reproduce la sección "Medidas DAX Detalladas" de la app
+SCRIPT_RENDER = '''
+import sys
+sys.path.insert(0, {raiz!r})
+import streamlit as st
+from benchmarks.bench_medidas import analisis_sintetico
+from medidas_dax import generar_medidas_dax
+
+medidas = generar_medidas_dax(analisis_sintetico({numericas}, {categoricas}, {fechas}), "Ventas")
+tipos = medidas.tipos()
+filtradas = medidas.filtrar(tipos)
+lista = list(filtradas) if {todas} else filtradas.pagina(0, {tamano_pagina})
+for medida in lista:
+    with st.expander(f"📊 {{medida['nombre']}} ({{medida['tipo']}})"):
+        st.markdown(f"**Descripción:** {{medida['descripcion']}}")
+        st.code(medida['dax'], language='dax')
+'''
+
+
+# FUNCIÓN: Análisis sintético con el número de columnas indicado
+def analisis_sintetico(numericas, categoricas, fechas):
+    analisis = {
+        'numericas': [f'Importe {i}' for i in range(numericas)],
+        'categoricas': [f'Categoría {i}' for i in range(categoricas)],
+        'fechas': [f'Fecha {i}' for i in range(fechas)],
+        'tipos': {},
+        'nulls': {},
+    }
+    analisis['columnas'] = analisis['numericas'] + analisis['categoricas'] + analisis['fechas']
+    return analisis
+
+
+# FUNCIÓN: Columnas numéricas necesarias para llegar a `objetivo` medidas
+def dimensionar(objetivo, categoricas, fechas):
+    numericas = 1
+    while len(generar_medidas_dax(analisis_sintetico(numericas, categoricas, fechas), 'Ventas')) < objetivo:
+        numericas += 1
+    return numericas
+
+
+# FUNCIÓN: Tiempo de una ejecución de la sección con AppTest
+def medir_render(numericas, categoricas, fechas, todas, tamano_pagina):
+    from streamlit.testing.v1 import AppTest
+
+    script = SCRIPT_RENDER.format(
+        raiz=RAIZ, numericas=numericas, categoricas=categoricas, fechas=fechas, todas=todas, tamano_pagina=tamano_pagina
+    )
+    app = AppTest.from_string(script, default_timeout=600)
+    inicio = time.perf_counter()
+    app.run()
+    return time.perf_counter() - inicio, len(app.get('expandable'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--medidas', type=int, default=10_000)
+    parser.add_argument('--categoricas', type=int, default=10)
+    parser.add_argument('--fechas', type=int, default=2)
+    parser.add_argument('--tamano-pagina', type=int, default=50)
+    parser.add_argument('--sin-render', action='store_true', help="Omitir la medición del render con AppTest")
+    parser.add_argument('--salida', help="Ruta del JSON de resultados (por defecto, stdout)")
+    args = parser.parse_args()
+
+    numericas = dimensionar(args.medidas, args.categoricas, args.fechas)
+    analisis = analisis_sintetico(numericas, args.categoricas, args.fechas)
+
+    inicio = time.perf_counter()
+    catalogo = generar_medidas_dax(analisis, 'Ventas')
+    total = len(catalogo)
+    segundos_catalogo = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    catalogo.pagina(total // args.tamano_pagina // 2, args.tamano_pagina)
+    segundos_pagina = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    texto = "\n\n".join(f"// {m['nombre']}\n// {m['descripcion']}\n{m['dax']}" for m in catalogo)
+    segundos_todas = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    revisor = RevisorDax(catalogo, analisis, 'Ventas')
+    segundos_revisor = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    revisiones = [revisor.revisar(m) for m in catalogo]
+    segundos_revision = time.perf_counter() - inicio
+
+    resultados = {
+        'parametros': {'numericas': numericas, 'categoricas': args.categoricas, 'fechas': args.fechas},
+        'medidas': total,
+        'generacion': {
+            'segundos_catalogo_y_conteo': round(segundos_catalogo, 5),
+            'segundos_pagina_intermedia': round(segundos_pagina, 5),
+            'segundos_todas': round(segundos_todas, 4),
+            'kb_texto_dax': round(len(texto.encode('utf-8')) / 1024, 1),
+        },
+        'revision': {
+            'segundos_construir_revisor': round(segundos_revisor, 4),
+            'segundos_revisar_todas': round(segundos_revision, 4),
+            'medidas_por_segundo': round(total / segundos_revision),
+            'hallazgos': dict(resumir_revisiones(revisiones)),
+        },
+    }
+
+    if not args.sin_render:
+        resultados['render'] = {}
+        for nombre, todas in (('pagina', False), ('todas', True)):
+            segundos, expanders = medir_render(numericas, args.categoricas, args.fechas, todas, args.tamano_pagina)
+            resultados['render'][nombre] = {'segundos': round(segundos, 3), 'expanders': expanders}
+            print(f"render {nombre:<8} {segundos:>8.2f} s  ({expanders:,} expanders)", file=sys.stderr)
+
+    texto = json.dumps(resultados, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
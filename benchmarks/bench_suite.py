@@ -0,0 +1,396 @@
+"""
+Suite de benchmarks de extremo a extremo con entradas sintéticas para cada tipo de entrada:
+CSV/Excel (perfilado: lectura + analizar_estructura), metadata JSON y TXT y capturas (el camino de
+manejar_analisis_archivo, vía analizador.analizar_archivo, con Gemini sustituido por un cliente
+local determinista), el re-análisis de un volcado con pocas tablas cambiadas, la clasificación de un
+volcado con el índice local de columnas, las vistas previas de las gráficas sobre un CSV (lectura en
+lotes de las columnas usadas, agregados y LTTB), convertir_analisis_imagen y los generadores (medidas DAX,
+KPI/OKR y gráficas) y la exportación del modelo a TMDL/TMSL.
+
+Uso:
+    python benchmarks/bench_suite.py --salida base.json
+    python benchmarks/bench_suite.py --perfil completo --casos datos_csv --salida base.json
+    python benchmarks/bench_suite.py --comparar base.json            # ejecuta y compara con base.json
+    python benchmarks/bench_suite.py --comparar base.json nuevo.json # solo compara dos resultados
+Cada caso se mide en un subproceso aparte (RSS pico sin contaminar). La comparación termina con
+código 1 si algún caso es más lento o usa más memoria que la base por encima de la tolerancia.
+Las entradas generadas se conservan en --datos y se reutilizan entre ejecuciones.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.bench_ingesta import rss_pico_mb  # noqa: E402
+
+# Casos por perfil: (caso, parámetros). 'rapido' tarda un par de minutos; 'completo' llega a 10⁸
+# filas y 2.000 columnas (varios GB en disco la primera vez).
+PERFILES = {
+    'rapido': [
+        ('datos_csv', {'filas': 1_000, 'columnas': 5}),
+        ('datos_csv', {'filas': 100_000, 'columnas': 20}),
+        ('datos_csv', {'filas': 10_000, 'columnas': 500}),
+        ('datos_csv', {'filas': 2_000, 'columnas': 2_000}),
+        ('datos_excel', {'filas': 1_000, 'columnas': 5}),
+        ('datos_excel', {'filas': 20_000, 'columnas': 20}),
+        ('previas_graficas', {'filas': 1_000_000, 'columnas': 8}),
+        ('metadatos_json', {'tablas': 10, 'columnas': 20}),
+        ('metadatos_json', {'tablas': 300, 'columnas': 40}),
+        ('metadatos_texto', {'tablas': 5, 'columnas': 20}),
+        ('metadatos_texto', {'tablas': 300, 'columnas': 20}),
+        ('reanalisis_texto', {'tablas': 300, 'columnas': 20, 'cambiadas': 3}),
+        ('indice_columnas', {'tablas': 300, 'columnas': 20}),
+        ('imagen', {'ancho': 1280, 'alto': 720}),
+        ('imagen', {'ancho': 3840, 'alto': 2160}),
+        ('convertir', {'columnas': 50}),
+        ('convertir', {'columnas': 2_000}),
+        ('generadores', {'columnas': 5}),
+        ('generadores', {'columnas': 50}),
+        ('exportacion', {'columnas': 50, 'formato': 'tmdl'}),
+        ('exportacion', {'columnas': 200, 'formato': 'tmsl'}),
+        ('generadores', {'columnas': 500}),
+    ],
+    'completo': [
+        *[('datos_csv', {'filas': 10 ** e, 'columnas': 5}) for e in range(3, 9)],
+        ('datos_csv', {'filas': 1_000_000, 'columnas': 200}),
+        ('datos_csv', {'filas': 100_000, 'columnas': 2_000}),
+        ('datos_excel', {'filas': 100_000, 'columnas': 20}),
+        ('datos_excel', {'filas': 1_000_000, 'columnas': 5}),
+        ('previas_graficas', {'filas': 50_000_000, 'columnas': 8}),
+        ('metadatos_json', {'tablas': 300, 'columnas': 40}),
+        ('metadatos_json', {'tablas': 2_000, 'columnas': 100}),
+        ('metadatos_texto', {'tablas': 1_000, 'columnas': 20}),
+        ('reanalisis_texto', {'tablas': 1_000, 'columnas': 20, 'cambiadas': 10}),
+        ('indice_columnas', {'tablas': 2_000, 'columnas': 20}),
+        ('imagen', {'ancho': 3840, 'alto': 2160}),
+        ('imagen', {'ancho': 10_000, 'alto': 8_000}),
+        ('convertir', {'columnas': 2_000}),
+        ('generadores', {'columnas': 500}),
+        ('generadores', {'columnas': 2_000}),
+        ('exportacion', {'columnas': 500, 'formato': 'tmdl'}),
+        ('exportacion', {'columnas': 500, 'formato': 'tmsl'}),
+        ('exportacion', {'columnas': 1_000, 'formato': 'tmdl'}),
+    ],
+}
+
+# Casos en los que solo se mide una parte de la repetición: el resto prepara el estado
+SEGUNDOS_MEDIDOS = {
+    'reanalisis_texto': 'segundos_reanalisis', 'indice_columnas': 'segundos_clasificacion',
+    'previas_graficas': 'segundos_previas', 'exportacion': 'segundos_exportacion',
+}
+
+# Diferencias menores que estas se consideran ruido al comparar
+MIN_DIFERENCIA_SEGUNDOS = 0.005
+MIN_DIFERENCIA_MB = 5.0
+
+
+# FUNCIÓN: Identificador estable de un caso (clave para comparar ejecuciones)
+def id_caso(caso, parametros):
+    return caso + ':' + ','.join(f"{k}={v}" for k, v in sorted(parametros.items()))
+
+
+# FUNCIÓN: Generar (o reutilizar) la entrada de un caso; None si el caso no lee archivos
+def preparar_entrada(caso, parametros, carpeta):
+    from benchmarks import sinteticos
+
+    os.makedirs(carpeta, exist_ok=True)
+    sufijo = '_'.join(str(v) for _, v in sorted(parametros.items()))
+    if caso in ('datos_csv', 'previas_graficas'):
+        return sinteticos.generar_csv(os.path.join(carpeta, f'datos_{sufijo}.csv'), parametros['filas'], parametros['columnas'])
+    if caso == 'datos_excel':
+        return sinteticos.generar_excel(os.path.join(carpeta, f'datos_{sufijo}.xlsx'), parametros['filas'], parametros['columnas'])
+    if caso == 'metadatos_json':
+        return sinteticos.generar_metadata_json(os.path.join(carpeta, f'modelo_{sufijo}.json'), parametros['tablas'], parametros['columnas'])
+    if caso in ('metadatos_texto', 'reanalisis_texto', 'indice_columnas'):
+        return sinteticos.generar_metadata_texto(os.path.join(carpeta, f'modelo_{sufijo}.txt'), parametros['tablas'], parametros['columnas'])
+    if caso == 'imagen':
+        return sinteticos.generar_captura(os.path.join(carpeta, f'captura_{sufijo}.png'), parametros['ancho'], parametros['alto'])
+    return None
+
+
+# FUNCIÓN: Cliente de Gemini local y determinista (misma respuesta para la misma entrada, sin red)
+def cliente_gemini_falso(columnas, latencia_segundos=0.0):
+    from benchmarks.sinteticos import respuesta_gemini
+    from cliente_gemini import ClienteGemini, ClienteFalso, LimitadorTasa
+
+    texto = json.dumps(respuesta_gemini(columnas), ensure_ascii=False)
+    falso = ClienteFalso([texto], latencia_segundos=latencia_segundos)
+    # Sin límite de cuota: se mide el código de la app, no el limitador
+    return ClienteGemini(falso, 'gemini-falso', limitador=LimitadorTasa(0))
+
+
+# FUNCIÓN: Ejecutar un caso en este proceso y devolver sus métricas
+def medir_caso(caso, parametros, ruta, repeticiones, latencia_gemini):
+    import pandas as pd
+
+    from analizador import (
+        perfilar_archivo_datos, analizar_archivo, convertir_analisis_imagen, sugerir_kpi_okr, recomendar_graficas,
+        previsualizar_graficas
+    )
+    from benchmarks.sinteticos import respuesta_gemini, modificar_metadata_texto, metadata_tmsl
+    from cache_gemini import CacheGemini
+    from exportacion import exportar_modelo
+    from indice_columnas import IndiceColumnas
+    from instrumentacion import iniciar_traza, etapa, resumir_etapas
+    from medidas_dax import generar_medidas_dax
+
+    contenido = None
+    if ruta is not None:
+        with open(ruta, 'rb') as f:
+            contenido = f.read()
+    carpeta_cache = tempfile.mkdtemp(prefix='bench_cache_')
+    cliente = cliente_gemini_falso(parametros.get('columnas', 8), latencia_gemini)
+
+    extra = {}
+
+    def una_vez(repeticion):
+        """ Devuelve las unidades procesadas (filas, columnas, medidas o llamadas) en esta repetición. """
+        if caso in ('datos_csv', 'datos_excel'):
+            # Huella distinta por repetición: cada lectura de Excel convierte a Parquet desde cero
+            huella = f"{hashlib.sha256(contenido).hexdigest()}-{repeticion}"
+            with open(ruta, 'rb') as f:
+                analisis = perfilar_archivo_datos(os.path.basename(ruta), f, huella, len(contenido))
+            return analisis.get('filas_totales') or parametros['filas']
+        if caso in ('metadatos_json', 'metadatos_texto', 'imagen'):
+            # Caché nueva en cada repetición: se mide la llamada (falsa) a Gemini, no un acierto de caché
+            cache = CacheGemini(os.path.join(carpeta_cache, f'cache_{repeticion}.sqlite'))
+            analisis = analizar_archivo(os.path.basename(ruta), contenido, cliente, cache)
+            if 'error' in analisis:
+                raise RuntimeError(analisis['error'])
+            return len(analisis['columnas'])
+        if caso == 'reanalisis_texto':
+            # Primer análisis completo (fuera de la medición) y re-análisis del volcado con unas tablas cambiadas
+            cache = CacheGemini(os.path.join(carpeta_cache, f'cache_{repeticion}.sqlite'))
+            inicio = time.perf_counter()
+            analizar_archivo(os.path.basename(ruta), contenido, cliente, cache)
+            extra['segundos_analisis_completo'] = round(time.perf_counter() - inicio, 5)
+            texto = modificar_metadata_texto(contenido.decode('utf-8'), parametros['tablas'], parametros['cambiadas'])
+            llamadas = cliente.estadisticas()['llamadas']
+            inicio = time.perf_counter()
+            analisis = analizar_archivo(os.path.basename(ruta), texto.encode('utf-8'), cliente, cache)
+            extra['segundos_reanalisis'] = round(time.perf_counter() - inicio, 5)
+            extra['fragmentos'] = analisis.get('fragmentos')
+            extra['fragmentos_reutilizados'] = analisis.get('fragmentos_reutilizados')
+            return cliente.estadisticas()['llamadas'] - llamadas
+        if caso == 'indice_columnas':
+            # El índice aprende de la metadata TMSL del mismo modelo (fuera de la medición) y clasifica el volcado
+            indice = IndiceColumnas(os.path.join(carpeta_cache, f'indice_{repeticion}.sqlite'))
+            modelo = json.dumps(metadata_tmsl(parametros['tablas'], parametros['columnas'])).encode('utf-8')
+            indice.aprender_analisis(analizar_archivo('modelo.json', modelo))
+            cache = CacheGemini(os.path.join(carpeta_cache, f'cache_{repeticion}.sqlite'))
+            llamadas = cliente.estadisticas()['llamadas']
+            inicio = time.perf_counter()
+            analisis = analizar_archivo(os.path.basename(ruta), contenido, cliente, cache, indice)
+            extra['segundos_clasificacion'] = round(time.perf_counter() - inicio, 5)
+            extra['llamadas_gemini'] = cliente.estadisticas()['llamadas'] - llamadas
+            extra['clasificadas_localmente'] = len(analisis.get('clasificadas_localmente', []))
+            extra['microsegundos_por_columna'] = round(extra['segundos_clasificacion'] / len(analisis['columnas']) * 1e6, 1)
+            return len(analisis['columnas'])
+        if caso == 'previas_graficas':
+            # Las recomendaciones salen de un perfil de la muestra (fuera de la medición); se mide el
+            # camino en streaming: lectura de las columnas usadas, agregados y reducción de las series
+            nombres = pd.read_csv(ruta, nrows=1_000)
+            analisis = perfilar_archivo_datos('muestra.csv', io.BytesIO(nombres.to_csv(index=False).encode('utf-8')), 'muestra')
+            graficas = recomendar_graficas(analisis)
+            inicio = time.perf_counter()
+            with open(ruta, 'rb') as f:
+                previas = previsualizar_graficas(os.path.basename(ruta), f, 'bench', graficas, analisis['fechas'])
+            extra['segundos_previas'] = round(time.perf_counter() - inicio, 5)
+            extra['graficas_con_previa'] = sum(1 for p in previas['graficas'] if p)
+            return previas['filas']
+        if caso == 'convertir':
+            return len(convertir_analisis_imagen(respuesta_gemini(parametros['columnas']))['columnas'])
+        if caso == 'generadores':
+            analisis = convertir_analisis_imagen(respuesta_gemini(parametros['columnas']))
+            with etapa('generar_medidas_dax'):
+                # El catálogo es perezoso: se recorren todas las medidas para materializar su DAX
+                total = sum(len(m['dax']) > 0 for m in generar_medidas_dax(analisis, 'Sintetica'))
+            sugerir_kpi_okr(analisis, 'Sintetica')
+            recomendar_graficas(analisis)
+            return total
+        if caso == 'exportacion':
+            # Zip completo (medidas, bases de los KPI y relaciones) en memoria, como el botón de descarga
+            analisis = convertir_analisis_imagen(respuesta_gemini(parametros['columnas']))
+            medidas, kpi_okr = generar_medidas_dax(analisis, 'Sintetica'), sugerir_kpi_okr(analisis, 'Sintetica')
+            inicio = time.perf_counter()
+            datos = exportar_modelo(analisis, 'Sintetica', medidas, kpi_okr, parametros['formato'], io.BytesIO()).getvalue()
+            extra['segundos_exportacion'] = round(time.perf_counter() - inicio, 5)
+            total = len(medidas) + len(kpi_okr)
+            extra['bytes_zip'] = len(datos)
+            extra['bytes_por_medida'] = round(len(datos) / total, 1)
+            return total
+        raise ValueError(f"Caso desconocido: {caso}")
+
+    rss_base = rss_pico_mb()
+    tiempos = []
+    for repeticion in range(repeticiones):
+        traza = iniciar_traza()
+        inicio = time.perf_counter()
+        unidades = una_vez(repeticion)
+        # En el re-análisis solo cuenta la segunda pasada (la primera llena la caché) y en el índice, la clasificación
+        tiempos.append(extra[SEGUNDOS_MEDIDOS[caso]] if caso in SEGUNDOS_MEDIDOS else time.perf_counter() - inicio)
+
+    segundos = statistics.median(tiempos)
+    return {
+        'id': id_caso(caso, parametros),
+        'caso': caso,
+        'parametros': parametros,
+        'bytes_entrada': len(contenido) if contenido is not None else None,
+        'unidades': unidades,
+        'segundos': round(segundos, 5),
+        'segundos_min': round(min(tiempos), 5),
+        'unidades_por_segundo': round(unidades / segundos, 1) if segundos > 0 else None,
+        'mb_por_segundo': round(len(contenido) / 1024 ** 2 / segundos, 2) if contenido and segundos > 0 else None,
+        'rss_base_mb': round(rss_base, 1),
+        'rss_pico_mb': round(rss_pico_mb(), 1),
+        # Desglose de la última repetición (lectura, perfilado, gemini, generadores...)
+        'etapas': [{k: e[k] for k in ('etapa', 'llamadas', 'segundos')} for e in resumir_etapas(traza.destino)],
+        **extra,
+    }
+
+
+# FUNCIÓN: Comparar dos resultados de la suite caso a caso
+def comparar(base, nuevo, tolerancia_tiempo, tolerancia_memoria):
+    """ Devuelve (filas, regresiones); una regresión supera la tolerancia relativa y la diferencia mínima. """
+    por_id = {r['id']: r for r in base['resultados']}
+    filas, regresiones = [], []
+    for r in nuevo['resultados']:
+        b = por_id.get(r['id'])
+        if b is None:
+            continue
+        fila = {
+            'id': r['id'],
+            'segundos_base': b['segundos'], 'segundos': r['segundos'],
+            'cambio_tiempo': round(r['segundos'] / b['segundos'] - 1, 3) if b['segundos'] else None,
+            'rss_pico_base_mb': b['rss_pico_mb'], 'rss_pico_mb': r['rss_pico_mb'],
+            'cambio_memoria': round(r['rss_pico_mb'] / b['rss_pico_mb'] - 1, 3) if b['rss_pico_mb'] else None,
+        }
+        motivos = []
+        if (r['segundos'] > b['segundos'] * (1 + tolerancia_tiempo)
+                and r['segundos'] - b['segundos'] > MIN_DIFERENCIA_SEGUNDOS):
+            motivos.append('tiempo')
+        if (r['rss_pico_mb'] > b['rss_pico_mb'] * (1 + tolerancia_memoria)
+                and r['rss_pico_mb'] - b['rss_pico_mb'] > MIN_DIFERENCIA_MB):
+            motivos.append('memoria')
+        fila['regresion'] = motivos
+        filas.append(fila)
+        if motivos:
+            regresiones.append(fila)
+    return filas, regresiones
+
+
+# FUNCIÓN: Tabla de la comparación en stderr
+def imprimir_comparacion(filas):
+    print(f"{'caso':<48} {'base s':>9} {'nuevo s':>9} {'Δt':>7} {'base MB':>8} {'nuevo MB':>8} {'ΔMB':>7}", file=sys.stderr)
+    for f in filas:
+        marca = '  << ' + '+'.join(f['regresion']) if f['regresion'] else ''
+        print(
+            f"{f['id']:<48} {f['segundos_base']:>9.4f} {f['segundos']:>9.4f} {f['cambio_tiempo'] or 0:>+7.1%} "
+            f"{f['rss_pico_base_mb']:>8.1f} {f['rss_pico_mb']:>8.1f} {f['cambio_memoria'] or 0:>+7.1%}{marca}",
+            file=sys.stderr,
+        )
+
+
+# FUNCIÓN: Versión del código medido (commit de git si está disponible)
+def version_codigo():
+    try:
+        salida = subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=RAIZ, capture_output=True, text=True)
+        return salida.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--perfil', choices=sorted(PERFILES), default='rapido')
+    parser.add_argument('--casos', nargs='+', help="Ejecutar solo estos casos (p. ej. datos_csv imagen)")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--latencia-gemini', type=float, default=0.0, help="Latencia simulada por llamada a Gemini (s)")
+    parser.add_argument('--datos', default=os.path.join(tempfile.gettempdir(), 'daxdesktop_bench_datos'),
+                        help="Carpeta de las entradas sintéticas (se reutilizan entre ejecuciones)")
+    parser.add_argument('--salida', help="Ruta del JSON de resultados (por defecto, stdout)")
+    parser.add_argument('--comparar', nargs='+', metavar='JSON',
+                        help="Base con la que comparar esta ejecución, o base y nuevo para comparar sin ejecutar")
+    parser.add_argument('--tolerancia-tiempo', type=float, default=0.15)
+    parser.add_argument('--tolerancia-memoria', type=float, default=0.15)
+    parser.add_argument('--medir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        caso, parametros, ruta = json.loads(args.medir)
+        print(json.dumps(medir_caso(caso, parametros, ruta, args.repeticiones, args.latencia_gemini)))
+        return 0
+
+    if args.comparar and len(args.comparar) > 2:
+        parser.error("--comparar admite una base o una base y un resultado nuevo.")
+
+    if args.comparar and len(args.comparar) == 2:
+        with open(args.comparar[1], encoding='utf-8') as f:
+            informe = json.load(f)
+    else:
+        casos = [(c, p) for c, p in PERFILES[args.perfil] if not args.casos or c in args.casos]
+        # La caché Parquet de los Excel va a una carpeta propia de la ejecución
+        entorno = dict(os.environ, DAX_PARQUET_CACHE_DIR=tempfile.mkdtemp(prefix='bench_parquet_'))
+        resultados = []
+        for caso, parametros in casos:
+            ruta = preparar_entrada(caso, parametros, args.datos)
+            salida = subprocess.run(
+                [sys.executable, __file__, '--medir', json.dumps([caso, parametros, ruta]),
+                 '--repeticiones', str(args.repeticiones), '--latencia-gemini', str(args.latencia_gemini)],
+                capture_output=True, text=True, env=entorno,
+            )
+            if salida.returncode != 0:
+                resultado = {'id': id_caso(caso, parametros), 'caso': caso, 'parametros': parametros,
+                             'error': salida.stderr.strip().splitlines()[-1] if salida.stderr.strip() else 'sin salida'}
+                print(f"{resultado['id']:<48} ERROR: {resultado['error']}", file=sys.stderr)
+            else:
+                resultado = json.loads(salida.stdout)
+                print(
+                    f"{resultado['id']:<48} {resultado['segundos']:>9.4f} s  "
+                    f"{resultado['unidades_por_segundo'] or 0:>14,.0f} u/s  {resultado['rss_pico_mb']:>8.1f} MB RSS",
+                    file=sys.stderr,
+                )
+            resultados.append(resultado)
+        informe = {
+            'version': version_codigo(),
+            'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'parametros': {'perfil': args.perfil, 'repeticiones': args.repeticiones, 'latencia_gemini': args.latencia_gemini},
+            'resultados': resultados,
+        }
+
+    codigo = 0
+    if args.comparar:
+        with open(args.comparar[0], encoding='utf-8') as f:
+            base = json.load(f)
+        validos = dict(informe, resultados=[r for r in informe['resultados'] if 'error' not in r])
+        base = dict(base, resultados=[r for r in base['resultados'] if 'error' not in r])
+        filas, regresiones = comparar(base, validos, args.tolerancia_tiempo, args.tolerancia_memoria)
+        imprimir_comparacion(filas)
+        informe['comparacion'] = {'base': base.get('version'), 'filas': filas, 'regresiones': len(regresiones)}
+        codigo = 1 if regresiones else 0
+    if any('error' in r for r in informe['resultados']):
+        codigo = 1
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            f.write(texto)
+    elif not (args.comparar and len(args.comparar) == 2):
+        print(texto)
+    return codigo
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Generadores de entradas sintéticas para los benchmarks: CSV/Excel de datos con tipos mezclados,
+nulos y fechas en texto; metadata de modelos (TMSL y volcado de texto) y capturas de tablas.
+Todo es determinista para una misma semilla.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Filas que se generan y escriben de una vez (los CSV de 10⁸ filas no caben en memoria)
+FILAS_POR_BLOQUE = 200_000
+
+# Proporción de nulos en las columnas que los admiten
+PROPORCION_NULOS = 0.05
+
+# Prefijos por tipo de columna; se reparten en este orden para que todos los tipos aparezcan pronto
+TIPOS_COLUMNA = ('Importe', 'Cantidad', 'Categoria', 'Fecha', 'Codigo', 'Descuento', 'FechaTexto', 'Activo')
+
+# Tipos de la metadata TMSL según el prefijo de la columna
+TIPOS_TMSL = {
+    'Importe': 'decimal', 'Cantidad': 'int64', 'Categoria': 'string', 'Fecha': 'dateTime',
+    'Codigo': 'string', 'Descuento': 'double', 'FechaTexto': 'dateTime', 'Activo': 'boolean',
+}
+
+
+# FUNCIÓN: Nombres de columna sintéticos (Importe 0, Cantidad 1, Categoria 2...)
+def nombres_columnas(columnas):
+    return [f"{TIPOS_COLUMNA[i % len(TIPOS_COLUMNA)]} {i}" for i in range(columnas)]
+
+
+# FUNCIÓN: Un bloque de filas con los tipos de `nombres`
+def bloque_datos(nombres, filas, inicio, rng):
+    datos = {}
+    for nombre in nombres:
+        tipo = nombre.rsplit(' ', 1)[0]
+        if tipo == 'Importe':
+            valores = rng.gamma(2.0, 50.0, filas).round(2)
+        elif tipo == 'Cantidad':
+            valores = rng.integers(1, 100, filas)
+        elif tipo == 'Categoria':
+            valores = np.char.add('Cat ', rng.integers(0, 40, filas).astype(str))
+        elif tipo == 'Fecha':
+            dias = rng.integers(0, 1500, filas).astype('timedelta64[D]')
+            valores = (np.datetime64('2021-01-01') + dias).astype(str)
+        elif tipo == 'Codigo':
+            # Alta cardinalidad: casi un valor distinto por fila
+            valores = np.char.add('C', (np.arange(inicio, inicio + filas) * 7919 % 10_000_019).astype(str))
+        elif tipo == 'Descuento':
+            valores = rng.random(filas).round(3)
+        elif tipo == 'FechaTexto':
+            fechas = np.datetime64('2021-01-01') + rng.integers(0, 1500, filas).astype('timedelta64[D]')
+            meses = fechas.astype('datetime64[M]')
+            dia = np.char.zfill(((fechas - meses).astype(int) + 1).astype(str), 2)
+            mes = np.char.zfill((meses.astype(int) % 12 + 1).astype(str), 2)
+            anio = (fechas.astype('datetime64[Y]').astype(int) + 1970).astype(str)
+            # dd/mm/aaaa, como las exportaciones regionales de Excel
+            valores = np.char.add(np.char.add(np.char.add(np.char.add(dia, '/'), mes), '/'), anio)
+        else:
+            # object: una columna booleana con nulos no cabe en el dtype bool
+            valores = (rng.random(filas) < 0.5).astype(object)
+        serie = pd.Series(valores)
+        if tipo not in ('Codigo', 'Cantidad'):
+            serie[rng.random(filas) < PROPORCION_NULOS] = None
+        datos[nombre] = serie
+    return pd.DataFrame(datos)
+
+
+# FUNCIÓN: Escribir un CSV sintético por bloques; si ya existe se reutiliza
+def generar_csv(ruta, filas, columnas, semilla=0):
+    if os.path.exists(ruta):
+        return ruta
+    rng = np.random.default_rng(semilla)
+    nombres = nombres_columnas(columnas)
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8', newline='') as f:
+        # Con muchas columnas se reduce el bloque para acotar la memoria
+        por_bloque = max(1_000, FILAS_POR_BLOQUE * 20 // max(columnas, 20))
+        for inicio in range(0, filas, por_bloque):
+            df = bloque_datos(nombres, min(por_bloque, filas - inicio), inicio, rng)
+            df.to_csv(f, index=False, header=inicio == 0)
+    os.replace(temporal, ruta)
+    return ruta
+
+
+# FUNCIÓN: Escribir un Excel sintético (limitado a lo que cabe en una hoja)
+def generar_excel(ruta, filas, columnas, semilla=0):
+    if os.path.exists(ruta):
+        return ruta
+    filas = min(filas, 1_048_575)
+    df = bloque_datos(nombres_columnas(columnas), filas, 0, np.random.default_rng(semilla))
+    temporal = ruta + '.tmp.xlsx'
+    df.to_excel(temporal, index=False)
+    os.replace(temporal, ruta)
+    return ruta
+
+
+# FUNCIÓN: Metadata TMSL (model.bim) con `tablas` tablas de `columnas` columnas y relaciones en cadena
+def metadata_tmsl(tablas, columnas):
+    lista = []
+    for t in range(tablas):
+        cols = [{'name': f'Id Tabla{t}', 'dataType': 'int64'}]
+        cols += [{'name': f'{n} T{t}', 'dataType': TIPOS_TMSL[n.rsplit(' ', 1)[0]]} for n in nombres_columnas(columnas - 1)]
+        lista.append({'name': f'Tabla{t}', 'columns': cols})
+    relaciones = [
+        {'name': f'R{t}', 'fromTable': f'Tabla{t}', 'fromColumn': f'Id Tabla{t + 1}',
+         'toTable': f'Tabla{t + 1}', 'toColumn': f'Id Tabla{t + 1}'}
+        for t in range(tablas - 1)
+    ]
+    return {'name': 'Sintetico', 'compatibilityLevel': 1567, 'model': {'tables': lista, 'relationships': relaciones}}
+
+
+# FUNCIÓN: Escribir la metadata TMSL como JSON
+def generar_metadata_json(ruta, tablas, columnas):
+    if not os.path.exists(ruta):
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(metadata_tmsl(tablas, columnas), f)
+    return ruta
+
+
+# FUNCIÓN: Descripción en texto libre del modelo (no se reconoce localmente: la analiza Gemini)
+def generar_metadata_texto(ruta, tablas, columnas):
+    if not os.path.exists(ruta):
+        with open(ruta, 'w', encoding='utf-8') as f:
+            for t in range(tablas):
+                f.write(f"Table Tabla{t}\n")
+                for n in nombres_columnas(columnas):
+                    f.write(f"  - {n} T{t} ({TIPOS_TMSL[n.rsplit(' ', 1)[0]]}): columna del modelo\n")
+                f.write("\n")
+    return ruta
+
+
+# FUNCIÓN: Versión "refrescada" de un volcado de texto: una columna nueva en `cambiadas` de sus tablas
+def modificar_metadata_texto(texto, tablas, cambiadas):
+    for t in range(0, tablas, max(1, tablas // max(cambiadas, 1)))[:cambiadas]:
+        texto = texto.replace(f"Table Tabla{t}\n", f"Table Tabla{t}\n  - Nueva T{t} (int64): columna añadida\n", 1)
+    return texto
+
+
+# FUNCIÓN: Captura sintética de una tabla (cabecera y filas como en la vista de datos de Power BI)
+def generar_captura(ruta, ancho, alto, columnas=8, semilla=0):
+    from PIL import Image, ImageDraw
+
+    if os.path.exists(ruta):
+        return ruta
+    rng = np.random.default_rng(semilla)
+    img = Image.new('RGB', (ancho, alto), 'white')
+    dibujo = ImageDraw.Draw(img)
+    nombres = nombres_columnas(columnas)
+    # La tabla ocupa la parte central, con margen blanco que el preprocesado recorta
+    margen = min(ancho, alto) // 10
+    ancho_col = (ancho - 2 * margen) // columnas
+    dibujo.rectangle([margen, margen, ancho - margen, margen + 24], fill=(240, 240, 240))
+    for c, nombre in enumerate(nombres):
+        dibujo.text((margen + c * ancho_col + 4, margen + 6), nombre, fill='black')
+    for fila, y in enumerate(range(margen + 30, alto - margen, 20)):
+        for c in range(columnas):
+            dibujo.text((margen + c * ancho_col + 4, y), f"{rng.integers(0, 10_000)}", fill=(40, 40, 40))
+        if fila % 2:
+            dibujo.line([margen, y - 2, ancho - margen, y - 2], fill=(220, 220, 220))
+    img.save(ruta)
+    return ruta
+
+
+# FUNCIÓN: Respuesta de Gemini determinista para `columnas` columnas (la que devolvería el modelo)
+def respuesta_gemini(columnas, nombre_tabla='Sintetica'):
+    tipos = {'Importe': 'numerico', 'Cantidad': 'numerico', 'Descuento': 'numerico', 'Fecha': 'fecha', 'FechaTexto': 'fecha'}
+    return {
+        'nombre_tabla': nombre_tabla,
+        'columnas': [
+            {'nombre': n, 'tipo': tipos.get(n.rsplit(' ', 1)[0], 'categorico'), 'descripcion': 'columna sintética'}
+            for n in nombres_columnas(columnas)
+        ],
+        'relaciones_posibles': [],
+        'metricas_clave': ['Total Importe 0'],
+    }
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+# Valores por defecto de la caché de resultados de Gemini
+CAPACIDAD_MEMORIA_DEFECTO = 256
+TTL_DEFECTO_SEGUNDOS = 7 * 24 * 3600
+MAX_BYTES_DISCO_DEFECTO = 200 * 1024 * 1024
+
+
+# FUNCIÓN: Clave direccionada por contenido
+def clave_cache(modelo, *partes):
+    """ Hash SHA-256 del modelo y de cada parte (bytes o texto) con prefijo de longitud. """
+    h = hashlib.sha256()
+    for parte in (modelo,) + partes:
+        if isinstance(parte, str):
+            parte = parte.encode('utf-8')
+        h.update(len(parte).to_bytes(8, 'little'))
+        h.update(parte)
+    return h.hexdigest()
+
+
+# CLASE: Caché de dos niveles (LRU en memoria + SQLite en disco)
+class CacheGemini:
+    """ Guarda solo resultados JSON correctos; expira por TTL y expulsa por tamaño. """
+
+    def __init__(self, ruta, capacidad_memoria=CAPACIDAD_MEMORIA_DEFECTO,
+                 ttl_segundos=TTL_DEFECTO_SEGUNDOS, max_bytes_disco=MAX_BYTES_DISCO_DEFECTO):
+        self.capacidad_memoria = capacidad_memoria
+        self.ttl_segundos = ttl_segundos
+        self.max_bytes_disco = max_bytes_disco
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+        self.contadores = {'aciertos_memoria': 0, 'aciertos_disco': 0, 'fallos': 0, 'expulsiones': 0}
+
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS resultados ("
+            "clave TEXT PRIMARY KEY, valor TEXT NOT NULL, creado REAL NOT NULL, "
+            "accedido REAL NOT NULL, tamano INTEGER NOT NULL)"
+        )
+        self._conexion.commit()
+
+    def _recordar(self, clave, creado, valor):
+        self._memoria[clave] = (creado, valor)
+        self._memoria.move_to_end(clave)
+        while len(self._memoria) > self.capacidad_memoria:
+            self._memoria.popitem(last=False)
+
+    def obtener(self, clave):
+        """ Devuelve una copia del resultado guardado o None. """
+        ahora = time.time()
+        with self._lock:
+            if clave in self._memoria:
+                creado, valor = self._memoria[clave]
+                if ahora - creado <= self.ttl_segundos:
+                    self._memoria.move_to_end(clave)
+                    self.contadores['aciertos_memoria'] += 1
+                    return json.loads(valor)
+                del self._memoria[clave]
+
+            fila = self._conexion.execute(
+                "SELECT valor, creado FROM resultados WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila and ahora - fila[1] <= self.ttl_segundos:
+                self._conexion.execute("UPDATE resultados SET accedido = ? WHERE clave = ?", (ahora, clave))
+                self._conexion.commit()
+                self._recordar(clave, fila[1], fila[0])
+                self.contadores['aciertos_disco'] += 1
+                return json.loads(fila[0])
+            if fila:
+                self._conexion.execute("DELETE FROM resultados WHERE clave = ?", (clave,))
+                self._conexion.commit()
+
+            self.contadores['fallos'] += 1
+            return None
+
+    def guardar(self, clave, resultado):
+        """ Ignora resultados que no sean dict, que contengan 'error' o que estén incompletos ('truncado'). """
+        if not isinstance(resultado, dict) or 'error' in resultado or resultado.get('truncado'):
+            return
+        valor = json.dumps(resultado, ensure_ascii=False)
+        ahora = time.time()
+        with self._lock:
+            self._recordar(clave, ahora, valor)
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO resultados (clave, valor, creado, accedido, tamano) VALUES (?, ?, ?, ?, ?)",
+                (clave, valor, ahora, ahora, len(valor))
+            )
+            self._expulsar(ahora)
+            self._conexion.commit()
+
+    def _expulsar(self, ahora):
+        borradas = self._conexion.execute(
+            "DELETE FROM resultados WHERE creado < ?", (ahora - self.ttl_segundos,)
+        ).rowcount
+        total = self._conexion.execute("SELECT COALESCE(SUM(tamano), 0) FROM resultados").fetchone()[0]
+        if total > self.max_bytes_disco:
+            # Se eliminan las entradas menos usadas recientemente hasta volver al límite
+            for clave, tamano in self._conexion.execute(
+                "SELECT clave, tamano FROM resultados ORDER BY accedido ASC"
+            ).fetchall():
+                if total <= self.max_bytes_disco:
+                    break
+                self._conexion.execute("DELETE FROM resultados WHERE clave = ?", (clave,))
+                self._memoria.pop(clave, None)
+                total -= tamano
+                borradas += 1
+        self.contadores['expulsiones'] += borradas
+
+    def estadisticas(self):
+        with self._lock:
+            entradas, bytes_disco = self._conexion.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamano), 0) FROM resultados"
+            ).fetchone()
+            return dict(self.contadores, entradas_memoria=len(self._memoria),
+                        entradas_disco=entradas, bytes_disco=bytes_disco)
+
+    def limpiar(self):
+        with self._lock:
+            self._memoria.clear()
+            self._conexion.execute("DELETE FROM resultados")
+            self._conexion.commit()
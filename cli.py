@@ -0,0 +1,243 @@
+"""
+Análisis por lotes sin Streamlit: perfila CSV/Excel, lee metadatos JSON/TXT y analiza imágenes con
+Gemini; por cada entrada escribe sus medidas DAX (<archivo>.dax) y un informe (<archivo>.json).
+Las salidas replican la ruta de cada entrada relativa a la carpeta común de todas, así dos archivos
+con el mismo nombre en carpetas distintas no se pisan.
+
+Uso:
+    python cli.py datos/ --salida resultados
+    python cli.py "exportaciones/*.json" capturas/modelo.png --procesos 4
+    python cli.py datos/ventas.csv --modelo tmdl
+Los CSV/Excel se perfilan en un pool de procesos; las entradas que pueden necesitar Gemini se
+analizan en hilos con un único cliente compartido; las columnas que ya están en el índice local
+no se envían a Gemini, y el índice aprende de todos los análisis del lote. Streamlit no se importa nunca y google-genai
+solo si hay entradas que lo necesitan.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from analizador import (
+    analizar_ruta, crear_cliente_gemini, crear_cache_gemini, crear_indice_columnas, extension_de, sugerir_kpi_okr,
+    recomendar_graficas, EXTENSIONES_DATOS, EXTENSIONES_IMAGEN, EXTENSIONES_ESTRUCTURA
+)
+from instrumentacion import iniciar_traza, resumir_etapas, exportador_por_defecto, ExportadorArchivo, etapa
+from exportacion import exportar_modelo
+from lotes import ejecutar_en_lote, CONCURRENCIA_DEFECTO, TIMEOUT_DEFECTO_SEGUNDOS
+from medidas_dax import generar_medidas_dax
+from revision_dax import RevisorDax, resumir_revisiones
+
+EXTENSIONES_SOPORTADAS = EXTENSIONES_DATOS + EXTENSIONES_IMAGEN + EXTENSIONES_ESTRUCTURA
+
+
+# FUNCIÓN: Archivos de entrada a partir de rutas, directorios y patrones glob (sin duplicados, en orden)
+def expandir_entradas(entradas):
+    rutas = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            candidatas = sorted(os.path.join(entrada, f) for f in os.listdir(entrada))
+        elif glob.has_magic(entrada):
+            candidatas = sorted(glob.glob(entrada, recursive=True))
+        else:
+            candidatas = [entrada]
+        for ruta in candidatas:
+            if os.path.isfile(ruta) and extension_de(ruta) in EXTENSIONES_SOPORTADAS and ruta not in rutas:
+                rutas.append(ruta)
+    return rutas
+
+
+# FUNCIÓN: Ruta de salida de cada entrada relativa a --salida (sin las extensiones que se añaden)
+def rutas_salida(rutas):
+    """ datos/a/ventas.csv y datos/b/ventas.csv se escriben en a/ventas.csv.* y b/ventas.csv.* """
+    absolutas = [os.path.abspath(r) for r in rutas]
+    try:
+        comun = os.path.commonpath([os.path.dirname(r) for r in absolutas])
+    except ValueError:
+        # Unidades distintas en Windows: no hay carpeta común, se replica la ruta completa
+        return {r: os.path.splitdrive(a)[1].lstrip(os.sep) for r, a in zip(rutas, absolutas)}
+    return {r: os.path.relpath(a, comun) for r, a in zip(rutas, absolutas)}
+
+
+# FUNCIÓN: Resumen del análisis para el informe (sin estadísticas ni muestras)
+def resumir_analisis(analisis):
+    resumen = {
+        'columnas': len(analisis.get('columnas', [])),
+        'numericas': analisis.get('numericas', []),
+        'categoricas': analisis.get('categoricas', []),
+        'fechas': analisis.get('fechas', []),
+    }
+    if analisis.get('tablas'):
+        resumen['tablas'] = len(analisis['tablas'])
+    if analisis.get('truncado'):
+        resumen['truncado'] = True
+    for clave in ('descripciones', 'clasificadas_localmente'):
+        if analisis.get(clave):
+            resumen[clave] = analisis[clave]
+    return resumen
+
+
+# FUNCIÓN: Escribir las medidas y el informe de un análisis ya hecho (`base`: ruta de salida sin extensión)
+def escribir_resultados(analisis, base, nombre_tabla, formato_modelo=None):
+    medidas = generar_medidas_dax(analisis, nombre_tabla)
+    kpi_okr = sugerir_kpi_okr(analisis, nombre_tabla)
+    # El catálogo se escribe medida a medida: no se construye el texto completo en memoria
+    with etapa('escritura_dax'), open(base + '.dax', 'w', encoding='utf-8') as f:
+        for i, m in enumerate(medidas):
+            f.write(("\n\n" if i else "") + f"// {m['nombre']}\n// {m['descripcion']}\n{m['dax']}")
+    if formato_modelo:
+        # Medidas, bases de los KPI y relaciones como proyecto TMDL o script TMSL (<archivo>.<formato>.zip)
+        with etapa('exportacion_modelo', formato=formato_modelo):
+            exportar_modelo(analisis, nombre_tabla, medidas, kpi_okr, formato_modelo,
+                            f"{base}.{formato_modelo}.zip")
+    with etapa('revision_dax'):
+        revisiones = list(RevisorDax(medidas, analisis, nombre_tabla).revisar_todas(medidas))
+    return {
+        'nombre_tabla': nombre_tabla,
+        'analisis': resumir_analisis(analisis),
+        'medidas': len(medidas),
+        'revision': dict(resumir_revisiones(revisiones)),
+        'kpi_okr': kpi_okr,
+        'graficas': recomendar_graficas(analisis),
+    }
+
+
+# FUNCIÓN: Analizar una entrada y escribir sus resultados; devuelve el informe (también con error)
+def procesar_archivo(ruta, salida, nombre_tabla=None, cliente=None, cache=None, ruta_trazas=None, indice=None,
+                     formato_modelo=None, relativa=None):
+    """ `relativa`: ruta de salida dentro de `salida` (por defecto, el nombre del archivo; ver rutas_salida). """
+    exportador = ExportadorArchivo(ruta_trazas) if ruta_trazas else exportador_por_defecto()
+    traza = iniciar_traza(exportador=exportador)
+    nombre = os.path.basename(ruta)
+    base = os.path.join(salida, relativa or nombre)
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    informe = {'archivo': ruta}
+    inicio = time.perf_counter()
+    try:
+        with etapa('archivo', archivo=nombre):
+            analisis = analizar_ruta(ruta, cliente, cache, indice)
+            if 'error' in analisis:
+                informe['error'] = analisis['error']
+            else:
+                informe.update(escribir_resultados(
+                    analisis, base, nombre_tabla or nombre.rsplit('.', 1)[0], formato_modelo
+                ))
+    except Exception as e:
+        informe['error'] = f"{type(e).__name__}: {e}"
+    informe['segundos'] = round(time.perf_counter() - inicio, 3)
+    informe['etapas'] = resumir_etapas(traza.destino)
+    traza.terminar()
+    with open(base + '.json', 'w', encoding='utf-8') as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False, default=str)
+    return informe
+
+
+# FUNCIÓN: Línea de progreso en stderr (stdout queda para el resumen)
+def _avisar(informe):
+    estado = f"ERROR: {informe['error']}" if 'error' in informe else f"{informe['medidas']} medidas"
+    print(f"{informe['segundos']:>8.2f} s  {informe['archivo']}  {estado}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('entradas', nargs='+', help="Archivos, directorios o patrones glob (entre comillas)")
+    parser.add_argument('--salida', default='salida_dax', help="Directorio de resultados (por defecto: salida_dax)")
+    parser.add_argument('--nombre-tabla', help="Nombre de la tabla en Power BI (por defecto, el nombre del archivo)")
+    parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1,
+                        help="Procesos para perfilar CSV/Excel (por defecto, uno por CPU)")
+    parser.add_argument('--concurrencia', type=int, default=CONCURRENCIA_DEFECTO,
+                        help="Peticiones simultáneas a Gemini")
+    parser.add_argument('--timeout', type=int, default=TIMEOUT_DEFECTO_SEGUNDOS, help="Timeout por archivo con Gemini (s)")
+    parser.add_argument('--sin-gemini', action='store_true',
+                        help="No llamar a Gemini: las imágenes y metadatos no reconocidos se informan como error")
+    parser.add_argument('--sin-indice', action='store_true',
+                        help="No usar ni actualizar el índice local de columnas (DAX_INDICE_COLUMNAS_PATH)")
+    parser.add_argument('--modelo', choices=('tmdl', 'tmsl'),
+                        help="Exportar también medidas, KPI y relaciones como <archivo>.<formato>.zip")
+    parser.add_argument('--trazas', help="Archivo JSONL donde exportar las etapas (por defecto, DAX_TRAZAS_RUTA)")
+    args = parser.parse_args(argv)
+
+    rutas = expandir_entradas(args.entradas)
+    if not rutas:
+        parser.error("No se encontraron archivos soportados (" + ", ".join(EXTENSIONES_SOPORTADAS) + ").")
+    os.makedirs(args.salida, exist_ok=True)
+    relativas = rutas_salida(rutas)
+
+    locales = [r for r in rutas if extension_de(r) in EXTENSIONES_DATOS]
+    remotas = [r for r in rutas if extension_de(r) not in EXTENSIONES_DATOS]
+    informes = []
+    inicio = time.perf_counter()
+    indice = None if args.sin_indice else crear_indice_columnas()
+
+    # CSV/Excel: el perfilado es CPU puro, así que se reparte entre procesos. Se lanzan antes que
+    # los hilos de Gemini para que los procesos se creen sin hilos activos y ambos avancen a la vez.
+    procesos = max(1, min(args.procesos, len(locales)))
+    ejecutor = futuros = None
+    if locales and procesos > 1:
+        ejecutor = ProcessPoolExecutor(max_workers=procesos)
+        futuros = {ejecutor.submit(procesar_archivo, r, args.salida, args.nombre_tabla,
+                                   ruta_trazas=args.trazas, formato_modelo=args.modelo, relativa=relativas[r]): r
+                   for r in locales}
+
+    # Entradas que pueden necesitar Gemini: hilos con un cliente (limitador y cortacircuitos) compartido
+    if remotas:
+        cliente = cache = None
+        if not args.sin_gemini:
+            try:
+                cliente, cache = crear_cliente_gemini(), crear_cache_gemini()
+            except ValueError as e:
+                print(f"Aviso: {e} Solo se analizarán los metadatos reconocibles localmente.", file=sys.stderr)
+        tareas = [(r, procesar_archivo, (r, args.salida, args.nombre_tabla, cliente, cache, args.trazas, indice, args.modelo,
+                                         relativas[r]))
+                  for r in remotas]
+        for ruta, informe, segundos in ejecutar_en_lote(tareas, args.concurrencia, args.timeout):
+            if 'archivo' not in informe:
+                informe = {'archivo': ruta, 'error': informe['error'], 'segundos': round(segundos, 3)}
+            _avisar(informe)
+            informes.append(informe)
+
+    if ejecutor is not None:
+        resultados = (_resultado_proceso(f, futuros[f]) for f in as_completed(futuros))
+    else:
+        resultados = (procesar_archivo(r, args.salida, args.nombre_tabla, ruta_trazas=args.trazas, formato_modelo=args.modelo,
+                                       relativa=relativas[r])
+                      for r in locales)
+    for informe in resultados:
+        _avisar(informe)
+        informes.append(informe)
+    if ejecutor is not None:
+        ejecutor.shutdown()
+
+    informes.sort(key=lambda i: rutas.index(i['archivo']))
+    # Los procesos del pool no comparten el índice: se aprende aquí, de los informes, en una sola pasada
+    if indice is not None:
+        for informe in informes:
+            if 'analisis' in informe:
+                indice.aprender_analisis(informe['analisis'])
+    errores = sum(1 for i in informes if 'error' in i)
+    resumen = {
+        'archivos': len(informes),
+        'errores': errores,
+        'medidas': sum(i.get('medidas', 0) for i in informes),
+        'segundos': round(time.perf_counter() - inicio, 3),
+        'informes': [{k: i[k] for k in ('archivo', 'medidas', 'error', 'segundos') if k in i} for i in informes],
+    }
+    with open(os.path.join(args.salida, 'resumen.json'), 'w', encoding='utf-8') as f:
+        json.dump(resumen, f, indent=2, ensure_ascii=False)
+    print(json.dumps({k: v for k, v in resumen.items() if k != 'informes'}, ensure_ascii=False))
+    return 1 if errores else 0
+
+
+# FUNCIÓN: Resultado de un proceso del pool (un proceso caído se informa como error del archivo)
+def _resultado_proceso(futuro, ruta):
+    try:
+        return futuro.result()
+    except Exception as e:
+        return {'archivo': ruta, 'error': f"{type(e).__name__}: {e}", 'segundos': 0.0}
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,317 @@
+import os
+import random
+import threading
+import time
+
+from instrumentacion import anotar
+
+
+# Valores por defecto de la capa de llamadas a Gemini (sobrescribibles por variables de entorno)
+TIMEOUT_DEFECTO_SEGUNDOS = float(os.getenv("GEMINI_TIMEOUT_SEGUNDOS", 90))
+REINTENTOS_DEFECTO = int(os.getenv("GEMINI_REINTENTOS", 4))
+ESPERA_BASE_SEGUNDOS = 1.0
+ESPERA_MAXIMA_SEGUNDOS = 30.0
+PETICIONES_POR_MINUTO_DEFECTO = float(os.getenv("GEMINI_PETICIONES_POR_MINUTO", 60))
+RAFAGA_DEFECTO = 5
+FALLOS_PARA_ABRIR_CIRCUITO = 5
+SEGUNDOS_CIRCUITO_ABIERTO = 30.0
+
+# Códigos HTTP transitorios: cuota (429), tiempo de espera (408) y errores del servidor
+CODIGOS_REINTENTABLES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+# CLASE: Error de la capa de llamadas (se muestra al usuario como cualquier otro error de Gemini)
+class ErrorGemini(Exception):
+    pass
+
+
+# CLASE: El circuito está abierto: Gemini falló repetidamente y no se envían más peticiones por ahora
+class CircuitoAbierto(ErrorGemini):
+    pass
+
+
+# FUNCIÓN: ¿Merece la pena repetir la petición?
+def es_reintentable(error):
+    # Importados aquí: crear un ClienteGemini (o un ClienteFalso) no debe cargar google-genai
+    import httpx
+    from google.genai.errors import APIError
+
+    if isinstance(error, APIError):
+        return error.code in CODIGOS_REINTENTABLES
+    return isinstance(error, (httpx.TimeoutException, httpx.TransportError, TimeoutError, ConnectionError))
+
+
+# FUNCIÓN: Segundos pedidos por el servidor en la cabecera Retry-After (None si no hay)
+def espera_solicitada(error):
+    respuesta = getattr(error, 'response', None)
+    cabeceras = getattr(respuesta, 'headers', None)
+    if not cabeceras:
+        return None
+    try:
+        return float(cabeceras.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+# FUNCIÓN: Espera antes del reintento `intento` (desde 0): exponencial con jitter completo
+def espera_reintento(intento, base=ESPERA_BASE_SEGUNDOS, maxima=ESPERA_MAXIMA_SEGUNDOS, aleatorio=random.random):
+    """ El jitter completo reparte en el tiempo los reintentos de sesiones que fallaron a la vez. """
+    return aleatorio() * min(maxima, base * 2 ** intento)
+
+
+# FUNCIÓN: Anotar en la etapa abierta los tokens que informa Gemini (usage_metadata)
+def anotar_uso(respuesta):
+    uso = getattr(respuesta, 'usage_metadata', None)
+    if uso is None:
+        return
+    anotar(
+        tokens_entrada=getattr(uso, 'prompt_token_count', None) or 0,
+        tokens_salida=getattr(uso, 'candidates_token_count', None) or 0,
+    )
+
+
+# CLASE: Limitador de peticiones compartido por todas las sesiones del proceso
+class LimitadorTasa:
+    """
+    Cada petición reserva el siguiente hueco libre (planificación virtual, como un cubo de
+    fichas): las sesiones esperan en orden de llegada y ninguna acapara la cuota.
+    `rafaga` peticiones pueden salir seguidas antes de que se note el límite.
+    """
+
+    def __init__(self, peticiones_por_minuto=PETICIONES_POR_MINUTO_DEFECTO, rafaga=RAFAGA_DEFECTO, reloj=time.monotonic):
+        self.intervalo = 60.0 / peticiones_por_minuto if peticiones_por_minuto > 0 else 0.0
+        self.holgura = self.intervalo * max(rafaga - 1, 0)
+        self._reloj = reloj
+        # Un limitador recién creado ya tiene la ráfaga disponible
+        self._siguiente = reloj() - self.holgura
+        self._lock = threading.Lock()
+
+    def reservar(self):
+        """ Segundos que debe esperar quien llama antes de enviar su petición. """
+        with self._lock:
+            ahora = self._reloj()
+            self._siguiente = max(self._siguiente, ahora - self.holgura)
+            espera = max(0.0, self._siguiente - ahora)
+            self._siguiente += self.intervalo
+            return espera
+
+    def esperar(self, dormir=time.sleep):
+        espera = self.reservar()
+        if espera > 0:
+            dormir(espera)
+        return espera
+
+
+# CLASE: Cortacircuitos (cerrado -> abierto tras N fallos seguidos -> semiabierto tras el enfriamiento)
+class Cortacircuitos:
+    """ Con Gemini caído, las sesiones fallan al instante en lugar de acumular reintentos. """
+
+    def __init__(self, fallos_para_abrir=FALLOS_PARA_ABRIR_CIRCUITO, segundos_abierto=SEGUNDOS_CIRCUITO_ABIERTO, reloj=time.monotonic):
+        self.fallos_para_abrir = fallos_para_abrir
+        self.segundos_abierto = segundos_abierto
+        self._reloj = reloj
+        self._fallos = 0
+        self._abierto_desde = None
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self):
+        with self._lock:
+            if self._abierto_desde is None:
+                return 'cerrado'
+            if self._reloj() - self._abierto_desde < self.segundos_abierto:
+                return 'abierto'
+            return 'semiabierto'
+
+    def permitir(self):
+        """ Lanza CircuitoAbierto si no se debe llamar; en semiabierto deja pasar una sola petición de prueba. """
+        with self._lock:
+            if self._abierto_desde is None:
+                return
+            restante = self.segundos_abierto - (self._reloj() - self._abierto_desde)
+            if restante > 0 or self._prueba_en_curso:
+                raise CircuitoAbierto(
+                    f"Gemini ha fallado {self._fallos} veces seguidas; se reintentará en {max(restante, 0):.0f} s."
+                )
+            self._prueba_en_curso = True
+
+    def registrar_exito(self):
+        with self._lock:
+            self._fallos = 0
+            self._abierto_desde = None
+            self._prueba_en_curso = False
+
+    def registrar_fallo(self):
+        with self._lock:
+            self._fallos += 1
+            if self._prueba_en_curso or self._fallos >= self.fallos_para_abrir:
+                self._abierto_desde = self._reloj()
+            self._prueba_en_curso = False
+
+
+# CLASE: genai.Client que se crea en la primera petición
+class ClientePerezoso:
+    """
+    Expone `models` como un genai.Client. Importar google-genai tarda más de un segundo y ocupa
+    decenas de MB: las sesiones que nunca llaman a Gemini (CSV/Excel) no lo cargan.
+    """
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+        self._cliente = None
+        self._lock = threading.Lock()
+
+    @property
+    def models(self):
+        if self._cliente is None:
+            with self._lock:
+                if self._cliente is None:
+                    from google import genai
+                    self._cliente = genai.Client(api_key=self.api_key)
+        return self._cliente.models
+
+
+# CLASE: Cliente de Gemini con timeouts, reintentos, cortacircuitos y limitador compartidos
+class ClienteGemini:
+    """
+    Envuelve un `genai.Client` (que mantiene abiertas sus conexiones HTTP) y se crea una vez por
+    proceso. Cualquier objeto con `models.generate_content(...)` sirve, p. ej. ClienteFalso.
+    """
+
+    def __init__(self, cliente, modelo, timeout_segundos=TIMEOUT_DEFECTO_SEGUNDOS, reintentos=REINTENTOS_DEFECTO,
+                 limitador=None, cortacircuitos=None, dormir=time.sleep, aleatorio=random.random):
+        self.cliente = cliente
+        self.modelo = modelo
+        self.timeout_segundos = timeout_segundos
+        self.reintentos = reintentos
+        self.limitador = limitador or LimitadorTasa()
+        self.cortacircuitos = cortacircuitos or Cortacircuitos()
+        self._dormir = dormir
+        self._aleatorio = aleatorio
+        self._lock = threading.Lock()
+        self.contadores = {'llamadas': 0, 'reintentos': 0, 'fallos': 0, 'rechazadas': 0, 'segundos_espera_cuota': 0.0}
+
+    def _contar(self, clave, cantidad=1):
+        with self._lock:
+            self.contadores[clave] += cantidad
+
+    def _configuracion(self, config):
+        """ Añade el timeout por petición (milisegundos en http_options) sin pisar el del llamador. """
+        config = dict(config or {})
+        opciones = dict(config.get('http_options') or {})
+        opciones.setdefault('timeout', int(self.timeout_segundos * 1000))
+        config['http_options'] = opciones
+        return config
+
+    def _con_reintentos(self, llamada):
+        """ Ejecuta `llamada()` con cortacircuitos, limitador y reintentos; lanza el último error si se agotan. """
+        for intento in range(self.reintentos + 1):
+            try:
+                self.cortacircuitos.permitir()
+            except CircuitoAbierto:
+                self._contar('rechazadas')
+                raise
+            self._contar('segundos_espera_cuota', self.limitador.esperar(self._dormir))
+            self._contar('llamadas')
+            try:
+                resultado = llamada()
+            except Exception as e:
+                reintentable = es_reintentable(e)
+                # Un error del cliente (clave inválida, petición mal formada) es una respuesta: Gemini está disponible
+                if reintentable:
+                    self.cortacircuitos.registrar_fallo()
+                else:
+                    self.cortacircuitos.registrar_exito()
+                if not reintentable or intento == self.reintentos:
+                    self._contar('fallos')
+                    raise
+                self._contar('reintentos')
+                espera = espera_solicitada(e)
+                if espera is None:
+                    espera = espera_reintento(intento, aleatorio=self._aleatorio)
+                self._dormir(min(espera, ESPERA_MAXIMA_SEGUNDOS))
+                continue
+            self.cortacircuitos.registrar_exito()
+            return resultado
+
+    def generar(self, contents, config=None):
+        """ generate_content con reintentos. """
+        config = self._configuracion(config)
+        respuesta = self._con_reintentos(
+            lambda: self.cliente.models.generate_content(model=self.modelo, contents=contents, config=config)
+        )
+        anotar_uso(respuesta)
+        return respuesta
+
+    def generar_flujo(self, contents, config=None):
+        """
+        Generador con el texto de generate_content_stream trozo a trozo. Solo se reintenta hasta
+        recibir el primer trozo; un corte posterior se propaga a quien consume el flujo.
+        """
+        config = self._configuracion(config)
+
+        def abrir():
+            flujo = iter(self.cliente.models.generate_content_stream(model=self.modelo, contents=contents, config=config))
+            # Los errores de cuota y de conexión aparecen al pedir el primer trozo
+            return flujo, next(flujo, None)
+
+        flujo, primero = self._con_reintentos(abrir)
+        if primero is None:
+            return
+        ultimo = primero
+        yield primero.text or ''
+        for trozo in flujo:
+            ultimo = trozo
+            yield trozo.text or ''
+        # El último trozo trae el uso acumulado de toda la respuesta
+        anotar_uso(ultimo)
+
+    def estadisticas(self):
+        with self._lock:
+            return dict(self.contadores, circuito=self.cortacircuitos.estado)
+
+
+# CLASE: Respuesta mínima compatible con la de google-genai
+class RespuestaFalsa:
+    def __init__(self, text):
+        self.text = text
+
+
+# CLASE: Cliente local sin red para pruebas y benchmarks
+class ClienteFalso:
+    """
+    `respuestas` es una lista de textos o de excepciones que se devuelven/lanzan en orden
+    (la última se repite); también puede ser una función contents -> texto.
+    """
+
+    def __init__(self, respuestas, latencia_segundos=0.0, tamano_trozo=64, latencia_trozo_segundos=0.0):
+        self.respuestas = respuestas
+        self.latencia_segundos = latencia_segundos
+        self.tamano_trozo = tamano_trozo
+        self.latencia_trozo_segundos = latencia_trozo_segundos
+        self.peticiones = []
+        self._lock = threading.Lock()
+        self.models = self
+
+    def generate_content(self, model, contents, config=None):
+        with self._lock:
+            indice = len(self.peticiones)
+            self.peticiones.append({'model': model, 'contents': contents, 'config': config})
+        if self.latencia_segundos:
+            time.sleep(self.latencia_segundos)
+        if callable(self.respuestas):
+            respuesta = self.respuestas(contents)
+        else:
+            respuesta = self.respuestas[min(indice, len(self.respuestas) - 1)]
+        if isinstance(respuesta, BaseException):
+            raise respuesta
+        return RespuestaFalsa(respuesta)
+
+    def generate_content_stream(self, model, contents, config=None):
+        """ La misma respuesta en trozos de `tamano_trozo` caracteres; un texto cortado simula un flujo truncado. """
+        texto = self.generate_content(model, contents, config).text
+        for inicio in range(0, len(texto), self.tamano_trozo):
+            if self.latencia_trozo_segundos:
+                time.sleep(self.latencia_trozo_segundos)
+            yield RespuestaFalsa(texto[inicio:inicio + self.tamano_trozo])
@@ -0,0 +1,206 @@
+import io
+import json
+import re
+import uuid
+import zipfile
+
+from lotes import id_columna
+from medidas_dax import columnas_numericas_preferidas, es_columna_clave_o_constante
+
+# Exportación de las medidas, las medidas base de los KPI y las relaciones inferidas como proyecto
+# TMDL (carpeta definition/), script TMSL createOrReplace o texto DAX, siempre en un .zip. Todo se
+# escribe con generadores directamente en la entrada del zip: el texto completo nunca está en memoria.
+
+# Formatos ofrecidos en la interfaz: etiqueta → formato
+FORMATOS_EXPORTACION = {
+    'TMDL (carpeta definition/)': 'tmdl',
+    'TMSL (script createOrReplace)': 'tmsl',
+    'DAX (texto)': 'dax',
+}
+
+# Nivel de compatibilidad del script TMSL (el de Power BI Desktop actual)
+NIVEL_COMPATIBILIDAD = 1567
+
+# Carpeta de visualización de las medidas base de los KPI
+CARPETA_KPI = 'KPI'
+
+# Nombres TMDL que no necesitan comillas simples
+_PATRON_NOMBRE_TMDL = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# Espacio de nombres de los identificadores deterministas de las relaciones
+_ESPACIO_RELACIONES = uuid.UUID('6f1c2a52-4d1e-4b7a-9a55-2f0d3c9b8e11')
+
+
+# FUNCIÓN: Nombre de objeto TMDL ('Total Importe' lleva comillas; Importe no)
+def nombre_tmdl(nombre):
+    if _PATRON_NOMBRE_TMDL.match(nombre):
+        return nombre
+    return "'" + nombre.replace("'", "''") + "'"
+
+
+# FUNCIÓN: Tipo de datos del modelo tabular para una columna del análisis
+def tipo_columna(analisis, col):
+    tipo = str(analisis.get('tipos', {}).get(col, '')).lower()
+    if col in analisis.get('fechas', []):
+        return 'dateTime'
+    if col in analisis.get('numericas', []):
+        return 'int64' if 'int' in tipo else 'decimal' if 'decimal' in tipo else 'double'
+    return 'boolean' if 'bool' in tipo else 'string'
+
+
+# FUNCIÓN: Tablas del modelo con sus columnas: {tabla: [(columna, dataType, summarizeBy)]}
+def tablas_modelo(analisis, nombre_tabla):
+    """
+    La tabla principal (la primera) se exporta con el nombre elegido por el usuario. Los tipos se
+    buscan por (tabla, columna): Cliente[Nombre] y Producto[Nombre] pueden ser distintos.
+    """
+    tablas = analisis.get('tablas') or {nombre_tabla: analisis.get('columnas', [])}
+    sumables = set(columnas_numericas_preferidas(analisis))
+    modelo = {}
+    for i, (tabla, columnas) in enumerate(tablas.items()):
+        ids = [id_columna(analisis, tabla, col) for col in columnas]
+        modelo[nombre_tabla if i == 0 else tabla] = [
+            (col, tipo_columna(analisis, id_col),
+             'sum' if id_col in sumables and not es_columna_clave_o_constante(analisis, id_col) else 'none')
+            for col, id_col in zip(columnas, ids)
+        ]
+    return modelo
+
+
+# FUNCIÓN: Relaciones inferidas con los nombres de tabla del modelo exportado
+def relaciones_modelo(analisis, nombre_tabla):
+    tablas = list(analisis.get('tablas') or {})
+    principal = tablas[0] if tablas else None
+    renombrar = lambda tabla: nombre_tabla if tabla == principal else tabla
+    for r in analisis.get('relaciones_modelo', []):
+        desde, hacia = renombrar(r['desde_tabla']), renombrar(r['hacia_tabla'])
+        clave = f"{desde}[{r['desde_columna']}]->{hacia}[{r['hacia_columna']}]"
+        yield {
+            'nombre': str(uuid.uuid5(_ESPACIO_RELACIONES, clave)),
+            'desde_tabla': desde, 'desde_columna': r['desde_columna'],
+            'hacia_tabla': hacia, 'hacia_columna': r['hacia_columna'],
+            'activa': r.get('activa', True),
+        }
+
+
+# FUNCIÓN: Medidas a exportar: las del catálogo y las bases de los KPI que no repiten un nombre
+def medidas_exportacion(medidas, kpi_okr):
+    """ Genera (nombre, expresión, descripción, carpeta) recorriendo el catálogo una sola vez. """
+    # Solo se recuerdan los nombres de los KPI (pocos): la memoria no crece con el catálogo
+    pendientes = {k['nombre']: k for k in kpi_okr or []}
+    for m in medidas:
+        pendientes.pop(m['nombre'], None)
+        yield m['nombre'], m['dax'][len(m['nombre']) + 3:].strip('\n'), m.get('descripcion', ''), m['tipo']
+    for k in pendientes.values():
+        yield k['nombre'], k['dax_base'], k.get('objetivo', ''), CARPETA_KPI
+
+
+# FUNCIÓN: Una medida en TMDL (las expresiones de varias líneas van sangradas bajo el nombre)
+def _medida_tmdl(nombre, expresion, descripcion, carpeta):
+    if '\n' in descripcion:
+        texto = ''.join(f"\t/// {linea}\n" for linea in descripcion.splitlines() if linea.strip())
+    else:
+        texto = f"\t/// {descripcion}\n" if descripcion.strip() else ''
+    if '\n' in expresion:
+        texto += f"\tmeasure {nombre_tmdl(nombre)} =\n" + ''.join(f"\t\t\t{linea}\n" for linea in expresion.splitlines())
+    else:
+        texto += f"\tmeasure {nombre_tmdl(nombre)} = {expresion}\n"
+    return texto + f"\t\tdisplayFolder: {carpeta}\n\n"
+
+
+# FUNCIÓN: Archivo TMDL de una tabla (columnas y, en la principal, las medidas)
+def _tabla_tmdl(tabla, columnas, medidas):
+    yield f"table {nombre_tmdl(tabla)}\n\n"
+    for medida in medidas:
+        yield _medida_tmdl(*medida)
+    for col, tipo, resumen in columnas:
+        yield f"\tcolumn {nombre_tmdl(col)}\n\t\tdataType: {tipo}\n\t\tsummarizeBy: {resumen}\n\t\tsourceColumn: {col}\n\n"
+
+
+# FUNCIÓN: relationships.tmdl
+def _relaciones_tmdl(relaciones):
+    for r in relaciones:
+        yield (
+            f"relationship {r['nombre']}\n"
+            + ("\tisActive: false\n" if not r['activa'] else "")
+            + f"\tfromColumn: {nombre_tmdl(r['desde_tabla'])}.{nombre_tmdl(r['desde_columna'])}\n"
+            f"\ttoColumn: {nombre_tmdl(r['hacia_tabla'])}.{nombre_tmdl(r['hacia_columna'])}\n\n"
+        )
+
+
+# FUNCIÓN: Entradas del zip TMDL: (ruta, generador de texto)
+def archivos_tmdl(analisis, nombre_tabla, medidas, kpi_okr):
+    tablas = tablas_modelo(analisis, nombre_tabla)
+    archivos = [('definition/model.tmdl', iter(
+        ["model Model\n\tculture: es-ES\n\n"] + [f"ref table {nombre_tmdl(t)}\n" for t in tablas]
+    ))]
+    for i, (tabla, columnas) in enumerate(tablas.items()):
+        # Las medidas cuelgan de la tabla principal; el archivo se genera al escribirse en el zip
+        medidas_tabla = medidas_exportacion(medidas, kpi_okr) if i == 0 else ()
+        archivos.append((f"definition/tables/{_nombre_archivo(tabla)}.tmdl", _tabla_tmdl(tabla, columnas, medidas_tabla)))
+    archivos.append(('definition/relationships.tmdl', _relaciones_tmdl(relaciones_modelo(analisis, nombre_tabla))))
+    return archivos
+
+
+# FUNCIÓN: Script TMSL createOrReplace escrito objeto a objeto
+def _script_tmsl(analisis, nombre_tabla, medidas, kpi_okr):
+    tablas = tablas_modelo(analisis, nombre_tabla)
+    yield (
+        '{"createOrReplace": {"object": {"database": ' + json.dumps(nombre_tabla, ensure_ascii=False) + '}, '
+        '"database": {"name": ' + json.dumps(nombre_tabla, ensure_ascii=False)
+        + f', "compatibilityLevel": {NIVEL_COMPATIBILIDAD}, "model": {{"culture": "es-ES", "tables": ['
+    )
+    for i, (tabla, columnas) in enumerate(tablas.items()):
+        columnas_json = [{'name': c, 'dataType': t, 'sourceColumn': c, 'summarizeBy': s} for c, t, s in columnas]
+        yield (',\n' if i else '\n') + json.dumps({'name': tabla, 'columns': columnas_json}, ensure_ascii=False)[:-1]
+        yield ', "measures": ['
+        if i == 0:
+            for j, (nombre, expresion, descripcion, carpeta) in enumerate(medidas_exportacion(medidas, kpi_okr)):
+                medida = {'name': nombre, 'expression': expresion, 'displayFolder': carpeta}
+                if descripcion:
+                    medida['description'] = descripcion
+                yield (',\n' if j else '\n') + json.dumps(medida, ensure_ascii=False)
+        yield ']}'
+    yield '\n], "relationships": ['
+    for i, r in enumerate(relaciones_modelo(analisis, nombre_tabla)):
+        relacion = {
+            'name': r['nombre'], 'fromTable': r['desde_tabla'], 'fromColumn': r['desde_columna'],
+            'toTable': r['hacia_tabla'], 'toColumn': r['hacia_columna'],
+        }
+        if not r['activa']:
+            relacion['isActive'] = False
+        yield (',\n' if i else '\n') + json.dumps(relacion, ensure_ascii=False)
+    yield '\n]}}}}\n'
+
+
+# FUNCIÓN: Texto DAX (el formato del antiguo .txt, ahora con las bases de los KPI)
+def _texto_dax(medidas, kpi_okr):
+    for i, (nombre, expresion, descripcion, _) in enumerate(medidas_exportacion(medidas, kpi_okr)):
+        yield ("\n\n" if i else "") + f"// {nombre}\n// {descripcion}\n{nombre} = {expresion}"
+
+
+# FUNCIÓN: Nombre de archivo seguro para una tabla
+def _nombre_archivo(nombre):
+    return re.sub(r'[\\/:*?"<>|]', '_', nombre)
+
+
+# FUNCIÓN: Entradas del zip según el formato
+def archivos_exportacion(analisis, nombre_tabla, medidas, kpi_okr, formato):
+    if formato == 'tmdl':
+        return archivos_tmdl(analisis, nombre_tabla, medidas, kpi_okr)
+    if formato == 'tmsl':
+        return [(f"{_nombre_archivo(nombre_tabla)}.tmsl.json", _script_tmsl(analisis, nombre_tabla, medidas, kpi_okr))]
+    if formato == 'dax':
+        return [(f"medidas_dax_{_nombre_archivo(nombre_tabla)}.dax", _texto_dax(medidas, kpi_okr))]
+    raise ValueError(f"Formato de exportación desconocido: {formato}")
+
+
+# FUNCIÓN: Escribir el zip de exportación en `destino` (ruta o archivo binario)
+def exportar_modelo(analisis, nombre_tabla, medidas, kpi_okr, formato, destino):
+    """ Cada trozo generado se comprime en cuanto se escribe; devuelve `destino`. """
+    with zipfile.ZipFile(destino, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for ruta, trozos in archivos_exportacion(analisis, nombre_tabla, medidas, kpi_okr, formato):
+            with zf.open(ruta, 'w') as binario, io.TextIOWrapper(binario, encoding='utf-8', newline='\n') as texto:
+                for trozo in trozos:
+                    texto.write(trozo)
+    return destino
@@ -0,0 +1,151 @@
+import math
+import time
+from io import BytesIO
+
+from PIL import Image, ImageChops
+
+
+# Parámetros por defecto del preprocesado antes de enviar a Gemini Vision
+LADO_MAXIMO_DEFECTO = 2048
+PRESUPUESTO_BYTES_DEFECTO = 800 * 1024
+UMBRAL_MOSAICO = 3200
+SOLAPE_MOSAICO = 0.15
+TOLERANCIA_FONDO = 12
+MARGEN_RECORTE = 8
+CALIDADES_JPEG = (85, 75, 60, 45)
+
+# Ancho de banda de subida supuesto para estimar la latencia ahorrada (10 Mbit/s)
+ANCHO_BANDA_BPS = 10_000_000
+
+# Gemini factura 258 tokens por imagen pequeña o por cada tesela de 768x768
+TOKENS_POR_TESELA = 258
+LADO_TESELA_GEMINI = 768
+
+
+# FUNCIÓN: Tokens estimados que Gemini cobra por una imagen
+def estimar_tokens_imagen(ancho, alto):
+    if ancho <= 384 and alto <= 384:
+        return TOKENS_POR_TESELA
+    return math.ceil(ancho / LADO_TESELA_GEMINI) * math.ceil(alto / LADO_TESELA_GEMINI) * TOKENS_POR_TESELA
+
+
+# FUNCIÓN: Normalizar a RGB (la transparencia se compone sobre blanco)
+def _a_rgb(img):
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+        fondo = Image.new('RGB', img.size, (255, 255, 255))
+        fondo.paste(img, mask=img.split()[-1])
+        return fondo
+    return img.convert('RGB')
+
+
+# FUNCIÓN: Recortar al contenido, tomando como fondo el color de la esquina superior izquierda
+def recortar_contenido(img, tolerancia=TOLERANCIA_FONDO, margen=MARGEN_RECORTE):
+    fondo = Image.new(img.mode, img.size, img.getpixel((0, 0)))
+    diferencia = ImageChops.difference(img, fondo).convert('L').point(lambda p: 255 if p > tolerancia else 0)
+    caja = diferencia.getbbox()
+    if not caja:
+        return img
+    izquierda, arriba, derecha, abajo = caja
+    return img.crop((
+        max(0, izquierda - margen), max(0, arriba - margen),
+        min(img.width, derecha + margen), min(img.height, abajo + margen)
+    ))
+
+
+# FUNCIÓN: Dividir un diagrama muy grande en mosaicos solapados
+def dividir_en_mosaicos(img, lado=LADO_MAXIMO_DEFECTO, solape=SOLAPE_MOSAICO):
+    """ Devuelve recortes de como máximo `lado` px; el solape evita cortar tablas por la mitad. """
+    paso = max(1, int(lado * (1 - solape)))
+
+    def posiciones(total):
+        if total <= lado:
+            return [0]
+        inicios = list(range(0, total - lado, paso))
+        return inicios + [total - lado]
+
+    return [
+        img.crop((x, y, min(x + lado, img.width), min(y + lado, img.height)))
+        for y in posiciones(img.height)
+        for x in posiciones(img.width)
+    ]
+
+
+# FUNCIÓN: Reducir colores cuando no se pierde información útil
+def reducir_color(img):
+    """ Paleta si la captura tiene pocos colores, escala de grises si es casi gris; si no, RGB. """
+    if img.getcolors(maxcolors=256) is not None:
+        return img.quantize(colors=256)
+    r, g, b = img.split()
+    diferencia = ImageChops.add(ImageChops.difference(r, g), ImageChops.difference(g, b))
+    if max(diferencia.getextrema()) <= 2 * TOLERANCIA_FONDO:
+        return img.convert('L')
+    return img
+
+
+# FUNCIÓN: Codificar a un presupuesto de bytes (PNG sin pérdida, luego JPEG, luego reducción)
+def comprimir_a_presupuesto(img, presupuesto=PRESUPUESTO_BYTES_DEFECTO):
+    """ Devuelve (bytes, mime, imagen_codificada). """
+    buffer = BytesIO()
+    img.save(buffer, 'PNG', optimize=True)
+    if buffer.tell() <= presupuesto:
+        return buffer.getvalue(), 'image/png', img
+
+    # Si el PNG no cabe, reducir la imagen no suele bastar: se pasa a JPEG y después se reduce
+    rgb = img.convert('RGB') if img.mode not in ('RGB', 'L') else img
+    while True:
+        for calidad in CALIDADES_JPEG:
+            buffer = BytesIO()
+            rgb.save(buffer, 'JPEG', quality=calidad, optimize=True)
+            if buffer.tell() <= presupuesto:
+                return buffer.getvalue(), 'image/jpeg', rgb
+
+        if max(rgb.size) <= LADO_TESELA_GEMINI:
+            return buffer.getvalue(), 'image/jpeg', rgb
+        # El tamaño en bytes escala aproximadamente con el área: se reduce en proporción al exceso
+        factor = max(0.5, min(0.9, math.sqrt(presupuesto / buffer.tell())))
+        rgb = rgb.resize((int(rgb.width * factor), int(rgb.height * factor)), Image.LANCZOS)
+
+
+# FUNCIÓN: Pipeline completo de preprocesado
+def preparar_imagen(img, bytes_originales=None, lado_maximo=LADO_MAXIMO_DEFECTO,
+                    presupuesto=PRESUPUESTO_BYTES_DEFECTO):
+    """
+    Devuelve {'partes': [(bytes, mime), ...], 'vista': PIL.Image, 'informe': {...}}.
+    `bytes_originales` es el tamaño subido; si falta se mide como el PNG que se habría enviado.
+    """
+    inicio = time.perf_counter()
+    dimensiones_antes = img.size
+    if bytes_originales is None:
+        buffer = BytesIO()
+        img.save(buffer, 'PNG')
+        bytes_originales = buffer.tell()
+
+    contenido = recortar_contenido(_a_rgb(img))
+    if max(contenido.size) > UMBRAL_MOSAICO:
+        recortes = dividir_en_mosaicos(contenido, lado_maximo)
+    else:
+        recortes = [contenido]
+
+    partes = []
+    codificadas = []
+    for recorte in recortes:
+        recorte = recorte.copy()
+        recorte.thumbnail((lado_maximo, lado_maximo), Image.LANCZOS)
+        datos, mime, codificada = comprimir_a_presupuesto(reducir_color(recorte), presupuesto)
+        partes.append((datos, mime))
+        codificadas.append(codificada)
+
+    bytes_despues = sum(len(datos) for datos, _ in partes)
+    informe = {
+        'bytes_antes': bytes_originales,
+        'bytes_despues': bytes_despues,
+        'dimensiones_antes': dimensiones_antes,
+        'dimensiones_despues': [c.size for c in codificadas],
+        'mosaicos': len(partes),
+        'tokens_antes': estimar_tokens_imagen(*dimensiones_antes),
+        'tokens_despues': sum(estimar_tokens_imagen(*c.size) for c in codificadas),
+        'segundos_preprocesado': time.perf_counter() - inicio,
+        'segundos_subida_ahorrados': max(0, bytes_originales - bytes_despues) * 8 / ANCHO_BANDA_BPS,
+    }
+    return {'partes': partes, 'vista': codificadas[0], 'informe': informe}
@@ -0,0 +1,97 @@
+import hashlib
+import json
+
+from lotes import id_columna
+
+# Re-análisis incremental: cada columna se resume en una huella (nombre, tipo y estadísticas) para
+# comparar un análisis con el anterior del mismo modelo y saber qué tablas y columnas cambiaron.
+
+CATEGORIAS = ('numericas', 'categoricas', 'fechas')
+
+
+# FUNCIÓN: Categoría (numericas/categoricas/fechas) de cada columna del análisis
+def _categorias(analisis):
+    categorias = {}
+    for categoria in CATEGORIAS:
+        for col in analisis.get(categoria, []):
+            categorias.setdefault(col, categoria)
+    return categorias
+
+
+# FUNCIÓN: Columnas por tabla (los análisis de una sola tabla no tienen 'tablas')
+def columnas_por_tabla(analisis):
+    tablas = analisis.get('tablas')
+    if isinstance(tablas, dict) and tablas:
+        return tablas
+    return {analisis.get('nombre_tabla', 'Tabla'): list(analisis.get('columnas', []))}
+
+
+# FUNCIÓN: Huellas del análisis: {tabla: {columna: (categoria, tipo, huella)}}
+def huellas_analisis(analisis):
+    """
+    La huella cubre nombre, tipo y estadísticas: cambia si la columna se retipa o cambian sus datos.
+    En los análisis fusionados las estadísticas se buscan por el id de Tabla[Columna] ('Nombre (Producto)').
+    """
+    categorias = _categorias(analisis)
+    huellas = {}
+    for tabla, columnas in columnas_por_tabla(analisis).items():
+        huellas[tabla] = {}
+        for col in columnas:
+            id_col = id_columna(analisis, tabla, col)
+            tipo = str(analisis.get('tipos', {}).get(id_col, ''))
+            datos = [
+                col, categorias.get(id_col), tipo, analisis.get('nulls', {}).get(id_col),
+                analisis.get('cardinalidad', {}).get(id_col), analisis.get('estadisticas', {}).get(id_col),
+            ]
+            texto = json.dumps(datos, sort_keys=True, default=str, ensure_ascii=False)
+            huellas[tabla][col] = (categorias.get(id_col), tipo, hashlib.blake2b(texto.encode('utf-8'), digest_size=8).hexdigest())
+    return {'tablas': huellas, 'relaciones': sorted(map(str, analisis.get('relaciones', [])))}
+
+
+# FUNCIÓN: Diferencias entre las huellas de dos análisis (None si no parecen el mismo modelo)
+def comparar_huellas(anteriores, nuevas):
+    """
+    Por tabla: columnas añadidas, eliminadas, retipadas (cambió la categoría o el tipo) y con datos
+    distintos (misma definición, otras estadísticas). Solo hay diff si comparten alguna columna.
+    """
+    if not anteriores:
+        return None
+    previas, actuales = anteriores['tablas'], nuevas['tablas']
+    columnas_previas = {(t, c) for t, cols in previas.items() for c in cols}
+    if not any((t, c) in columnas_previas for t, cols in actuales.items() for c in cols):
+        return None
+
+    tablas = {}
+    for tabla in list(actuales) + [t for t in previas if t not in actuales]:
+        antes, despues = previas.get(tabla, {}), actuales.get(tabla, {})
+        cambios = {
+            'añadidas': [c for c in despues if c not in antes],
+            'eliminadas': [c for c in antes if c not in despues],
+            'retipadas': [
+                {'columna': c, 'antes': antes[c][0] or antes[c][1], 'despues': despues[c][0] or despues[c][1]}
+                for c in despues if c in antes and antes[c][:2] != despues[c][:2]
+            ],
+            'modificadas': [c for c in despues if c in antes and antes[c][:2] == despues[c][:2] and antes[c][2] != despues[c][2]],
+        }
+        if any(cambios.values()):
+            cambios['estado'] = 'nueva' if tabla not in previas else 'eliminada' if tabla not in actuales else 'cambiada'
+            tablas[tabla] = cambios
+
+    relaciones_previas, relaciones = set(anteriores['relaciones']), set(nuevas['relaciones'])
+    diferencias = {
+        'tablas': tablas,
+        'sin_cambios': sum(1 for t in actuales if t in previas and t not in tablas),
+        'relaciones_añadidas': sorted(relaciones - relaciones_previas),
+        'relaciones_eliminadas': sorted(relaciones_previas - relaciones),
+    }
+    diferencias['hay_cambios'] = bool(tablas or diferencias['relaciones_añadidas'] or diferencias['relaciones_eliminadas'])
+    return diferencias
+
+
+# FUNCIÓN: Totales del diff para el resumen de la interfaz
+def resumir_diferencias(diferencias):
+    totales = {clave: sum(len(t[clave]) for t in diferencias['tablas'].values())
+               for clave in ('añadidas', 'eliminadas', 'retipadas', 'modificadas')}
+    totales['tablas_cambiadas'] = len(diferencias['tablas'])
+    totales['tablas_sin_cambios'] = diferencias['sin_cambios']
+    return totales
@@ -0,0 +1,315 @@
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+from lotes import origen_columna
+
+# Índice local de columnas: cada análisis correcto enseña el tipo (y la descripción, si la hay) de
+# sus columnas. Los volcados de estructura se clasifican aquí antes de llamar a Gemini; solo las
+# columnas desconocidas llegan al modelo.
+
+TIPOS = ('numerico', 'categorico', 'fecha')
+CATEGORIA_A_TIPO = {'numericas': 'numerico', 'categoricas': 'categorico', 'fechas': 'fecha'}
+
+# Similitud mínima (Jaccard de trigramas) para aceptar una columna parecida a una conocida
+UMBRAL_SIMILITUD = 0.75
+
+# Proporción mínima de votos del tipo mayoritario para fiarse de una entrada
+PUREZA_MINIMA = 0.8
+
+# Un token decide el tipo por sí solo con suficientes votos y casi sin discrepancias ("fecha", "importe")
+VOTOS_MINIMOS_TOKEN = 3
+PUREZA_MINIMA_TOKEN = 0.95
+
+# Líneas de un volcado de texto que se aceptan como nombre de columna
+MAX_PALABRAS_COLUMNA = 6
+RE_TABLA = re.compile(r"^(?:table|tabla)\b\s*[:\-]?\s*['\"\[]?([^'\"\]:(]+?)['\"\]]?\s*:?$", re.IGNORECASE)
+RE_COLUMNA = re.compile(
+    r"^(?:[-*•·]|\d+[.)])?\s*['\"\[]?([^\W\d][\w .#%/]*?)['\"\]]?\s*(?:[(:\t|,;=]|\s-\s|$)"
+)
+RE_ENCABEZADO = re.compile(r"^[^\W\d][\w ]*:$")
+
+# Tipos que los volcados "nombre tipo" escriben tras el nombre, sin separador ("Importe decimal")
+TIPOS_DECLARADOS = frozenset({
+    'int', 'int32', 'int64', 'integer', 'bigint', 'smallint', 'tinyint', 'long', 'decimal', 'double', 'float',
+    'real', 'numeric', 'money', 'string', 'varchar', 'nvarchar', 'char', 'nchar', 'bool', 'boolean', 'datetime',
+    'datetime2', 'datetimezone', 'datetimeoffset', 'timestamp', 'date/time', 'date/time/timezone', 'true/false',
+    'whole number', 'decimal number', 'fixed decimal number',
+    'date', 'time', 'number', 'text', 'currency', 'binary',
+})
+# Tipos que también son palabras de nombres reales ("Order Date"): solo se separan si el volcado
+# declara tipos inequívocos en otras líneas; si no, la línea es ambigua y la resuelve Gemini
+TIPOS_AMBIGUOS = frozenset({'date', 'time', 'number', 'text', 'currency', 'binary'})
+
+
+# FUNCIÓN: Tokens normalizados de un nombre (sin acentos, camelCase y snake_case separados)
+def normalizar(nombre):
+    texto = unicodedata.normalize('NFKD', str(nombre)).encode('ascii', 'ignore').decode('ascii')
+    texto = re.sub(r'([a-z0-9])([A-Z])', r'\1 \2', texto)
+    texto = re.sub(r'([A-Z]+)([A-Z][a-z])', r'\1 \2', texto)
+    # Los números no cambian el tipo (Importe 2023, Q1Ventas) salvo que no haya otra cosa
+    return re.findall(r'[a-z]+', texto.lower()) or re.findall(r'\d+', texto)
+
+
+# FUNCIÓN: Trigramas de la forma normalizada (con bordes, para que cuenten inicio y fin)
+def trigramas(clave):
+    texto = f" {clave} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+# FUNCIÓN: Tipo mayoritario de unos votos y su proporción
+def _mayoritario(votos):
+    total = sum(votos.values())
+    if not total:
+        return None, 0.0
+    tipo, n = votos.most_common(1)[0]
+    return tipo, n / total
+
+
+# FUNCIÓN: Separar un tipo declarado al final del nombre ("Importe decimal" → ("Importe", 'decimal'))
+def separar_tipo(nombre):
+    palabras = nombre.split()
+    for n in (3, 2, 1):
+        tipo = ' '.join(palabras[-n:]).lower()
+        if len(palabras) > n and tipo in TIPOS_DECLARADOS:
+            return ' '.join(palabras[:-n]), tipo
+    return nombre, None
+
+
+# FUNCIÓN: Columnas de un volcado de estructura (texto o JSON) con la línea de la que salen
+def extraer_columnas(texto):
+    """
+    Devuelve [{'tabla', 'nombre', 'fuente'}] o None si el texto no es una lista limpia de tablas y
+    columnas (prosa, relaciones...): en ese caso el índice no se usa y todo va a Gemini. Las líneas
+    que no se pueden separar con seguridad en nombre y tipo llevan 'ambigua' y van a Gemini.
+    """
+    limpio = texto.lstrip()
+    if limpio[:1] in ('[', '{'):
+        try:
+            return _columnas_json(json.loads(limpio))
+        except ValueError:
+            return None
+
+    columnas = []
+    tabla = None
+    for linea in texto.splitlines():
+        linea = linea.strip()
+        if not linea or not any(c.isalnum() for c in linea) or RE_ENCABEZADO.match(linea):
+            continue
+        encontrada = RE_TABLA.match(linea)
+        if encontrada:
+            tabla = encontrada.group(1).strip()
+            continue
+        encontrada = RE_COLUMNA.match(linea)
+        nombre = encontrada.group(1).strip() if encontrada else ''
+        if not nombre or len(nombre.split()) > MAX_PALABRAS_COLUMNA:
+            return None
+        columna = {'tabla': tabla, 'nombre': nombre, 'fuente': linea}
+        # Sin separador el nombre llega hasta el final de la línea y puede arrastrar el tipo
+        if not linea[encontrada.end(1):].strip(" '\"]"):
+            base, tipo = separar_tipo(nombre)
+            if tipo is not None:
+                columna.update(base=base, tipo_declarado=tipo)
+        columnas.append(columna)
+
+    # Volcado "nombre tipo": todas las líneas terminan en un tipo y alguno es inequívoco. Solo entonces
+    # se separan también los ambiguos ("Order Date date" → Order Date, "Ship Date" → Ship)
+    tipado = all('base' in c for c in columnas) and any(c['tipo_declarado'] not in TIPOS_AMBIGUOS for c in columnas)
+    for columna in columnas:
+        if 'base' not in columna:
+            continue
+        base, tipo = columna.pop('base'), columna.pop('tipo_declarado')
+        if tipado or tipo not in TIPOS_AMBIGUOS:
+            columna['nombre'] = base
+        else:
+            columna['ambigua'] = True
+    return columnas or None
+
+
+# FUNCIÓN: Columnas de un JSON [{name, columns: [...]}, ...] o [{name, dataType}, ...]
+def _columnas_json(data):
+    if isinstance(data, dict):
+        data = data.get('tables') or data.get('tablas') or [data]
+    if not isinstance(data, list):
+        return None
+    columnas = []
+    for item in data:
+        if not isinstance(item, dict):
+            return None
+        nombre = item.get('name') or item.get('nombre')
+        hijas = item.get('columns') or item.get('columnas')
+        if isinstance(hijas, list):
+            for col in hijas:
+                nombre_col = (col.get('name') or col.get('nombre')) if isinstance(col, dict) else col
+                if not isinstance(nombre_col, str) or not nombre_col:
+                    return None
+                columnas.append({'tabla': nombre, 'nombre': nombre_col, 'fuente': col})
+        elif isinstance(nombre, str) and nombre:
+            columnas.append({'tabla': None, 'nombre': nombre, 'fuente': item})
+        else:
+            return None
+    return columnas or None
+
+
+# FUNCIÓN: Volcado reducido a las columnas indicadas (lo que se envía a Gemini)
+def texto_pendiente(columnas):
+    """ Conserva el formato de origen: líneas bajo su 'Table X' o JSON con sus tablas. """
+    por_tabla = {}
+    for col in columnas:
+        por_tabla.setdefault(col['tabla'], []).append(col['fuente'])
+    if isinstance(columnas[0]['fuente'], str):
+        bloques = [(f"Table {tabla}\n" if tabla else "") + "\n".join(fuentes) for tabla, fuentes in por_tabla.items()]
+        return "\n\n".join(bloques)
+    lista = []
+    for tabla, fuentes in por_tabla.items():
+        if tabla is None:
+            lista.extend(fuentes)
+        else:
+            lista.append({'name': tabla, 'columns': fuentes})
+    return json.dumps(lista, ensure_ascii=False)
+
+
+# CLASE: Índice persistente de columnas (SQLite en disco, búsqueda en memoria)
+class IndiceColumnas:
+    """ Clasifica por nombre exacto normalizado, por trigramas parecidos o por tokens decisivos. """
+
+    def __init__(self, ruta):
+        self._lock = threading.Lock()
+        self._entradas = {}
+        self._trigramas = {}
+        self._tokens = {}
+        self.contadores = {'exactas': 0, 'aproximadas': 0, 'por_tokens': 0, 'desconocidas': 0}
+
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS columnas ("
+            "clave TEXT PRIMARY KEY, nombre TEXT NOT NULL, votos TEXT NOT NULL, "
+            "descripcion TEXT NOT NULL, actualizado REAL NOT NULL)"
+        )
+        self._conexion.commit()
+        for clave, nombre, votos, descripcion in self._conexion.execute(
+            "SELECT clave, nombre, votos, descripcion FROM columnas"
+        ):
+            self._registrar(clave, nombre, Counter(json.loads(votos)), descripcion)
+
+    def _registrar(self, clave, nombre, votos, descripcion):
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            entrada = self._entradas[clave] = {'nombre': nombre, 'votos': Counter(), 'descripcion': '',
+                                               'trigramas': frozenset(trigramas(clave))}
+            # Índice invertido por (trigrama, nº de trigramas): la búsqueda descarta longitudes imposibles
+            for trigrama in entrada['trigramas']:
+                self._trigramas.setdefault(trigrama, {}).setdefault(len(entrada['trigramas']), set()).add(clave)
+        entrada['votos'].update(votos)
+        entrada['nombre'] = nombre
+        if descripcion:
+            entrada['descripcion'] = descripcion
+        for token in set(clave.split()):
+            self._tokens.setdefault(token, Counter()).update(votos)
+
+    def aprender(self, columnas):
+        """ columnas: (nombre, tipo, descripcion); un voto por aparición. Devuelve cuántas se guardaron. """
+        cambiadas = set()
+        with self._lock:
+            for nombre, tipo, descripcion in columnas:
+                clave = ' '.join(normalizar(nombre))
+                if tipo not in TIPOS or not clave:
+                    continue
+                self._registrar(clave, str(nombre), Counter({tipo: 1}), descripcion or '')
+                cambiadas.add(clave)
+            if cambiadas:
+                ahora = time.time()
+                self._conexion.executemany(
+                    "INSERT OR REPLACE INTO columnas (clave, nombre, votos, descripcion, actualizado) VALUES (?, ?, ?, ?, ?)",
+                    [(clave, self._entradas[clave]['nombre'], json.dumps(self._entradas[clave]['votos']),
+                      self._entradas[clave]['descripcion'], ahora) for clave in cambiadas]
+                )
+                self._conexion.commit()
+        return len(cambiadas)
+
+    def aprender_analisis(self, analisis):
+        """ Aprende de un análisis estándar; lo que ya salió del índice no vuelve a votar. """
+        locales = set(analisis.get('clasificadas_localmente', []))
+        descripciones = analisis.get('descripciones', {})
+        # En análisis fusionados se aprende el nombre real, no el calificado con la tabla ('Nombre (Producto)')
+        return self.aprender(
+            (origen_columna(analisis, col)[1], tipo, descripciones.get(col, ''))
+            for categoria, tipo in CATEGORIA_A_TIPO.items()
+            for col in analisis.get(categoria, []) if col not in locales
+        )
+
+    def clasificar(self, nombre):
+        """ {'nombre', 'tipo', 'descripcion', 'metodo', 'confianza'} o None si la columna es desconocida. """
+        clave = ' '.join(normalizar(nombre))
+        with self._lock:
+            resultado = self._clasificar(clave) if clave else None
+            self.contadores[resultado[2] if resultado else 'desconocidas'] += 1
+        if resultado is None:
+            return None
+        tipo, confianza, metodo, descripcion = resultado
+        return {'nombre': nombre, 'tipo': tipo, 'descripcion': descripcion, 'metodo': metodo,
+                'confianza': round(confianza, 3)}
+
+    def _clasificar(self, clave):
+        entrada = self._entradas.get(clave)
+        if entrada is not None:
+            tipo, pureza = _mayoritario(entrada['votos'])
+            return (tipo, pureza, 'exactas', entrada['descripcion']) if pureza >= PUREZA_MINIMA else None
+
+        # Parecidas: Jaccard >= u exige compartir al menos u·|consulta| trigramas, así que toda candidata
+        # válida aparece entre los |consulta| - ceil(u·|consulta|) + 1 trigramas más raros (filtro de prefijo)
+        propios = trigramas(clave)
+        longitudes = range(math.ceil(UMBRAL_SIMILITUD * len(propios)), math.floor(len(propios) / UMBRAL_SIMILITUD) + 1)
+        por_trigrama = {}
+        for trigrama in propios:
+            grupos = self._trigramas.get(trigrama, {})
+            por_trigrama[trigrama] = [grupos[n] for n in longitudes if n in grupos]
+        raros = sorted(propios, key=lambda t: sum(map(len, por_trigrama[t])))
+        candidatas = set()
+        for trigrama in raros[:len(propios) - math.ceil(UMBRAL_SIMILITUD * len(propios)) + 1]:
+            candidatas.update(*por_trigrama[trigrama])
+        mejor, similitud = None, (0.0, 0)
+        for candidata in candidatas:
+            otros = self._entradas[candidata]['trigramas']
+            n = len(propios & otros)
+            # A igual similitud gana la entrada con más votos
+            puntuacion = (n / (len(propios) + len(otros) - n), sum(self._entradas[candidata]['votos'].values()))
+            if puntuacion > similitud:
+                mejor, similitud = candidata, puntuacion
+        similitud = similitud[0]
+        if mejor is not None and similitud >= UMBRAL_SIMILITUD:
+            tipo, pureza = _mayoritario(self._entradas[mejor]['votos'])
+            if pureza >= PUREZA_MINIMA:
+                return tipo, similitud * pureza, 'aproximadas', self._entradas[mejor]['descripcion']
+
+        # Tokens decisivos: todos los que opinan deben coincidir ("Fecha Key" queda sin clasificar)
+        decisivos = set()
+        confianza = 1.0
+        for token in clave.split():
+            votos = self._tokens.get(token)
+            if votos is None or sum(votos.values()) < VOTOS_MINIMOS_TOKEN:
+                continue
+            tipo, pureza = _mayoritario(votos)
+            if pureza >= PUREZA_MINIMA_TOKEN:
+                decisivos.add(tipo)
+                confianza = min(confianza, pureza)
+        if len(decisivos) == 1:
+            return decisivos.pop(), confianza, 'por_tokens', ''
+        return None
+
+    def estadisticas(self):
+        with self._lock:
+            return dict(self.contadores, entradas=len(self._entradas))
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._trigramas.clear()
+            self._tokens.clear()
+            self._conexion.execute("DELETE FROM columnas")
+            self._conexion.commit()
@@ -0,0 +1,190 @@
+import os
+import tempfile
+import zipfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from perfilado import iterar_bloques
+
+
+# Bloque de lectura de pyarrow: cada bloque se parsea en un hilo distinto
+TAMANO_BLOQUE_ARROW = 16 * 1024 * 1024
+
+# Las columnas de texto con hasta esta cantidad de valores distintos se cargan como categorías
+CARDINALIDAD_MAXIMA_DICCIONARIO = 10_000
+
+DIR_CACHE_PARQUET = os.getenv("DAX_PARQUET_CACHE_DIR", os.path.join(tempfile.gettempdir(), "daxdesktop_parquet"))
+MAX_PARQUET_EN_CACHE = 20
+
+# Filas de Excel convertidas a Parquet a la vez: la memoria de la conversión depende de esto, no del archivo
+FILAS_BLOQUE_EXCEL = 50_000
+
+
+# FUNCIÓN: Tipo de pandas para cada tipo de Arrow (texto Arrow, diccionarios como category)
+def _tipo_pandas(tipo_arrow):
+    if pa.types.is_dictionary(tipo_arrow):
+        return None
+    if pa.types.is_string(tipo_arrow) or pa.types.is_large_string(tipo_arrow):
+        return pd.StringDtype('pyarrow')
+    return pd.ArrowDtype(tipo_arrow)
+
+
+# FUNCIÓN: Convertir una tabla de Arrow a DataFrame con dtypes respaldados por Arrow
+def tabla_a_dataframe(tabla):
+    return tabla.to_pandas(types_mapper=_tipo_pandas, self_destruct=True)
+
+
+# FUNCIÓN: Nombres de columna de un CSV leyendo solo la cabecera
+def leer_encabezado_csv(archivo):
+    archivo.seek(0)
+    lector = pa_csv.open_csv(archivo, read_options=pa_csv.ReadOptions(block_size=1 << 20))
+    columnas = lector.schema.names
+    archivo.seek(0)
+    return columnas
+
+
+# FUNCIÓN: Lectura multihilo de CSV con pyarrow, proyección de columnas y tipos predeclarados
+def leer_csv_arrow(archivo, columnas=None, tipos=None):
+    """
+    `columnas`: solo se materializan estas columnas (proyección).
+    `tipos`: dict {columna: tipo de Arrow} que evita la inferencia para esas columnas.
+    """
+    archivo.seek(0)
+    tabla = pa_csv.read_csv(
+        archivo,
+        read_options=pa_csv.ReadOptions(use_threads=True, block_size=TAMANO_BLOQUE_ARROW),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=list(columnas) if columnas else None,
+            column_types=tipos,
+            strings_can_be_null=True,
+            auto_dict_encode=True,
+            auto_dict_max_cardinality=CARDINALIDAD_MAXIMA_DICCIONARIO,
+        ),
+    )
+    archivo.seek(0)
+    return tabla_a_dataframe(tabla)
+
+
+# FUNCIÓN: Mantener acotado el directorio de Parquet en caché (se borran los más antiguos)
+def _limpiar_cache_parquet():
+    archivos = [os.path.join(DIR_CACHE_PARQUET, f) for f in os.listdir(DIR_CACHE_PARQUET) if f.endswith('.parquet')]
+    for ruta in sorted(archivos, key=os.path.getmtime)[:-MAX_PARQUET_EN_CACHE]:
+        os.remove(ruta)
+
+
+# FUNCIÓN: Bloque de Excel como tabla de Arrow
+def _tabla_de_bloque(bloque):
+    # Columnas de tipo mixto (texto y números) se guardan como texto para que Arrow las acepte
+    for col in bloque.columns[bloque.dtypes == object]:
+        bloque[col] = bloque[col].map(lambda v: v if v is None or isinstance(v, str) or pd.isna(v) else str(v))
+    bloque.columns = [str(c) for c in bloque.columns]
+    return pa.Table.from_pandas(bloque, preserve_index=False)
+
+
+# FUNCIÓN: Tipo que admite los valores de dos bloques con tipos distintos en una columna
+def _tipo_ampliado(anterior, nuevo):
+    if pa.types.is_null(anterior):
+        return nuevo
+    if pa.types.is_null(nuevo):
+        return anterior
+    if pa.types.is_integer(anterior) and pa.types.is_integer(nuevo):
+        return pa.int64()
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in (anterior, nuevo)):
+        return pa.float64()
+    return pa.string()
+
+
+# FUNCIÓN: Escribir un Excel en `ruta` como Parquet, bloque a bloque
+def _escribir_parquet_excel(archivo, ruta, tipos):
+    """
+    El primer bloque fija el esquema, salvo las columnas de `tipos`. Si un bloque posterior no cabe
+    (texto en una columna numérica, decimales en una entera...) devuelve los tipos ampliados para
+    volver a empezar; si todo cabe, devuelve None.
+    """
+    archivo.seek(0)
+    # .xlsx (un zip) se lee con openpyxl en modo solo lectura; .xls (xlrd) solo puede leerse completo
+    nombre = 'datos.xlsx' if zipfile.is_zipfile(archivo) else 'datos.xls'
+    archivo.seek(0)
+    escritor = None
+    try:
+        for bloque in iterar_bloques(archivo, nombre, FILAS_BLOQUE_EXCEL):
+            tabla = _tabla_de_bloque(bloque)
+            if escritor is None:
+                esquema = pa.schema([pa.field(c.name, tipos.get(c.name, c.type)) for c in tabla.schema])
+                escritor = pq.ParquetWriter(ruta, esquema)
+            try:
+                tabla = tabla.cast(esquema)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                ampliados = {c.name: _tipo_ampliado(c.type, tabla.schema.field(c.name).type) for c in esquema}
+                if all(esquema.field(c).type == t for c, t in ampliados.items()):
+                    raise
+                return ampliados
+            escritor.write_table(tabla)
+    finally:
+        if escritor is not None:
+            escritor.close()
+        archivo.seek(0)
+    if escritor is None:
+        pq.write_table(pa.table({}), ruta)
+    return None
+
+
+# FUNCIÓN: Ruta del Parquet de un Excel; la conversión se hace una sola vez por huella
+def parquet_de_excel(archivo, huella):
+    """ Nunca hay más de FILAS_BLOQUE_EXCEL filas en memoria (salvo en .xls, que no admite lectura incremental). """
+    os.makedirs(DIR_CACHE_PARQUET, exist_ok=True)
+    ruta = os.path.join(DIR_CACHE_PARQUET, f"{huella}.parquet")
+    if os.path.exists(ruta):
+        os.utime(ruta)
+        return ruta
+    temporal = ruta + '.tmp'
+    tipos = {}
+    # Cada vuelta solo amplía tipos (nulo → entero → decimal → texto): casi siempre basta una
+    while (ampliados := _escribir_parquet_excel(archivo, temporal, tipos)) is not None:
+        tipos = ampliados
+    os.replace(temporal, ruta)
+    _limpiar_cache_parquet()
+    return ruta
+
+
+# FUNCIÓN: Leer un Excel a través de su Parquet en caché (solo las columnas pedidas)
+def leer_excel_cacheado(archivo, huella, columnas=None):
+    ruta = parquet_de_excel(archivo, huella)
+    return tabla_a_dataframe(pq.read_table(ruta, columns=list(columnas) if columnas else None))
+
+
+# FUNCIÓN: Nombres de columna de un CSV o Excel sin materializar los datos
+def leer_encabezado(archivo, nombre, huella):
+    if nombre.lower().endswith('.csv'):
+        return leer_encabezado_csv(archivo)
+    return pq.read_schema(parquet_de_excel(archivo, huella)).names
+
+
+# FUNCIÓN: Punto de entrada de la ingesta columnar para CSV y Excel
+def leer_datos(archivo, nombre, huella, columnas=None):
+    if nombre.lower().endswith('.csv'):
+        return leer_csv_arrow(archivo, columnas)
+    return leer_excel_cacheado(archivo, huella, columnas)
+
+
+# FUNCIÓN: Recorrer solo algunas columnas de un CSV o Excel en lotes de Arrow (memoria acotada)
+def iterar_lotes_datos(archivo, nombre, huella, columnas, tipos=None):
+    """ `tipos`: {columna: tipo de Arrow}; en CSV evita que un lote posterior contradiga la inferencia del primero. """
+    if not nombre.lower().endswith('.csv'):
+        for lote in pq.ParquetFile(parquet_de_excel(archivo, huella)).iter_batches(columns=list(columnas)):
+            yield tabla_a_dataframe(pa.Table.from_batches([lote]))
+        return
+    archivo.seek(0)
+    lector = pa_csv.open_csv(
+        archivo,
+        read_options=pa_csv.ReadOptions(use_threads=True, block_size=TAMANO_BLOQUE_ARROW),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=list(columnas), column_types=tipos, strings_can_be_null=True
+        ),
+    )
+    for lote in lector:
+        yield tabla_a_dataframe(pa.Table.from_batches([lote]))
+    archivo.seek(0)
@@ -0,0 +1,273 @@
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import contextmanager
+
+
+# Exportación de etapas: ruta del archivo (vacía = no se exporta) y formato ('jsonl' u 'otlp')
+RUTA_TRAZAS = os.getenv("DAX_TRAZAS_RUTA", "")
+FORMATO_TRAZAS = os.getenv("DAX_TRAZAS_FORMATO", "jsonl")
+
+# tracemalloc ralentiza las asignaciones de memoria: solo se activa si se pide
+MEDIR_MEMORIA_DEFECTO = os.getenv("DAX_TRACEMALLOC", "0") == "1"
+
+# Nombre del servicio en los spans OpenTelemetry
+NOMBRE_SERVICIO = "daxdesktop"
+
+# Traza activa y pila de etapas abiertas (por hilo/contexto: los hilos del lote heredan una copia)
+_traza_actual = contextvars.ContextVar('traza_actual', default=None)
+_pila_etapas = contextvars.ContextVar('pila_etapas', default=())
+
+# tracemalloc es global al proceso y cada etapa reinicia su pico (reset_peak): dos trazas midiendo a
+# la vez (dos sesiones de la app) se corromperían las cifras. Solo una traza mide memoria cada vez.
+_lock_memoria = threading.Lock()
+_traza_memoria = None
+
+
+# CLASE: Exportador de etapas a un archivo local (una línea por etapa)
+class ExportadorArchivo:
+    """ 'jsonl': el dict de la etapa tal cual; 'otlp': un ExportTraceServiceRequest OTLP/JSON por línea. """
+
+    def __init__(self, ruta, formato=FORMATO_TRAZAS):
+        if formato not in ('jsonl', 'otlp'):
+            raise ValueError(f"Formato de trazas desconocido: {formato}")
+        self.ruta = ruta
+        self.formato = formato
+        self._lock = threading.Lock()
+
+    def exportar(self, etapa):
+        registro = span_otlp(etapa) if self.formato == 'otlp' else etapa
+        linea = json.dumps(registro, ensure_ascii=False, default=str) + "\n"
+        with self._lock, open(self.ruta, 'a', encoding='utf-8') as f:
+            f.write(linea)
+
+
+# FUNCIÓN: Valor de atributo OTLP/JSON
+def _valor_otlp(valor):
+    if isinstance(valor, bool):
+        return {'boolValue': valor}
+    if isinstance(valor, int):
+        return {'intValue': str(valor)}
+    if isinstance(valor, float):
+        return {'doubleValue': valor}
+    return {'stringValue': str(valor)}
+
+
+# FUNCIÓN: Etapa convertida en un span OpenTelemetry (formato del exportador de archivo OTLP/JSON)
+def span_otlp(etapa):
+    atributos = dict(etapa['atributos'], segundos_cpu=etapa['segundos_cpu'])
+    if etapa['memoria_pico_mb'] is not None:
+        atributos['memoria_pico_mb'] = etapa['memoria_pico_mb']
+    span = {
+        'traceId': etapa['traza'],
+        'spanId': etapa['id'],
+        'name': etapa['nombre'],
+        'kind': 1,
+        'startTimeUnixNano': str(etapa['inicio_ns']),
+        'endTimeUnixNano': str(etapa['fin_ns']),
+        'attributes': [{'key': k, 'value': _valor_otlp(v)} for k, v in atributos.items()],
+        'status': {'code': 2, 'message': etapa['error']} if etapa['error'] else {'code': 1},
+    }
+    if etapa['padre']:
+        span['parentSpanId'] = etapa['padre']
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': NOMBRE_SERVICIO}}]},
+        'scopeSpans': [{'scope': {'name': 'daxdesktop.instrumentacion'}, 'spans': [span]}],
+    }]}
+
+
+# CLASE: Traza de una ejecución (un rerun de la app o una invocación de la CLI)
+class Traza:
+    """ Cada etapa terminada se entrega al momento a `destino` y al exportador: sobrevive a st.rerun(). """
+
+    def __init__(self, destino=None, exportador=None, medir_memoria=MEDIR_MEMORIA_DEFECTO, max_destino=None):
+        self.id = secrets.token_hex(16)
+        self.destino = destino if destino is not None else []
+        self.exportador = exportador
+        self.medir_memoria = medir_memoria and _reservar_memoria(self)
+        self.max_destino = max_destino
+        self._lock = threading.Lock()
+        # Libera la medición de memoria al terminar la traza o, si nadie la termina (un st.rerun()
+        # a mitad del script), cuando se recolecta
+        self._liberar = weakref.finalize(self, _liberar_memoria, self.id, self.medir_memoria and not tracemalloc.is_tracing())
+        if self.medir_memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def terminar(self):
+        """ Deja de medir memoria (y detiene tracemalloc si lo arrancó esta traza). """
+        self._liberar()
+
+    def entregar(self, etapa):
+        with self._lock:
+            self.destino.append(etapa)
+            if self.max_destino and len(self.destino) > self.max_destino:
+                del self.destino[:len(self.destino) - self.max_destino]
+        if self.exportador is not None:
+            try:
+                self.exportador.exportar(etapa)
+            except OSError:
+                # Un disco lleno o sin permisos no debe romper el análisis
+                pass
+
+
+# FUNCIÓN: Reservar la medición de memoria del proceso para una traza (False si ya la tiene otra)
+def _reservar_memoria(traza):
+    global _traza_memoria
+    with _lock_memoria:
+        if _traza_memoria is not None:
+            return False
+        _traza_memoria = traza.id
+        return True
+
+
+# FUNCIÓN: Liberar la medición de memoria reservada por la traza `id_traza`
+def _liberar_memoria(id_traza, detener):
+    global _traza_memoria
+    with _lock_memoria:
+        if _traza_memoria == id_traza:
+            _traza_memoria = None
+        if detener and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+# FUNCIÓN: Empezar una traza nueva en el contexto actual
+def iniciar_traza(destino=None, exportador=None, medir_memoria=MEDIR_MEMORIA_DEFECTO, max_destino=None):
+    """
+    Con `medir_memoria`, la traza mide la memoria solo si ninguna otra la está midiendo (si no,
+    traza.medir_memoria queda en False). Las etapas concurrentes de una misma traza (hilos del lote)
+    comparten el pico. Llame a traza.terminar() al acabar para detener tracemalloc.
+    """
+    traza = Traza(destino, exportador, medir_memoria, max_destino)
+    _traza_actual.set(traza)
+    _pila_etapas.set(())
+    return traza
+
+
+# FUNCIÓN: Exportador configurado por variables de entorno (None si no hay ruta)
+def exportador_por_defecto():
+    return ExportadorArchivo(RUTA_TRAZAS, FORMATO_TRAZAS) if RUTA_TRAZAS else None
+
+
+# FUNCIÓN: Abrir una etapa (None si no hay traza activa: fuera de la app medir no cuesta nada)
+def abrir_etapa(nombre, **atributos):
+    traza = _traza_actual.get()
+    if traza is None:
+        return None
+    pila = _pila_etapas.get()
+    memoria = traza.medir_memoria and tracemalloc.is_tracing()
+    registro = {
+        'traza': traza.id,
+        'id': secrets.token_hex(8),
+        'padre': pila[-1]['id'] if pila else None,
+        'nombre': nombre,
+        'atributos': dict(atributos),
+        'error': None,
+        '_traza': traza,
+        '_pila_previa': pila,
+        '_memoria': memoria,
+        '_pico_hijas': 0,
+    }
+    if memoria:
+        # El pico se reinicia por etapa; el de las etapas internas se sube al cerrar (ver cerrar_etapa)
+        actual, pico_previo = tracemalloc.get_traced_memory()
+        registro['_memoria_inicio'] = actual
+        if pila:
+            pila[-1]['_pico_hijas'] = max(pila[-1]['_pico_hijas'], pico_previo)
+        tracemalloc.reset_peak()
+    _pila_etapas.set(pila + (registro,))
+    registro['inicio_ns'] = time.time_ns()
+    registro['_inicio'] = time.perf_counter()
+    registro['_inicio_cpu'] = time.process_time()
+    return registro
+
+
+# FUNCIÓN: Cerrar una etapa abierta con abrir_etapa y entregarla a su traza
+def cerrar_etapa(registro, error=None):
+    if registro is None:
+        return None
+    segundos = time.perf_counter() - registro.pop('_inicio')
+    segundos_cpu = time.process_time() - registro.pop('_inicio_cpu')
+    pila_previa = registro.pop('_pila_previa')
+    pico_mb = None
+    if registro.pop('_memoria') and tracemalloc.is_tracing():
+        pico = max(tracemalloc.get_traced_memory()[1], registro['_pico_hijas'])
+        pico_mb = round(max(pico - registro.pop('_memoria_inicio'), 0) / 1024 ** 2, 3)
+        if pila_previa:
+            pila_previa[-1]['_pico_hijas'] = max(pila_previa[-1]['_pico_hijas'], pico)
+    registro.pop('_memoria_inicio', None)
+    registro.pop('_pico_hijas')
+    _pila_etapas.set(pila_previa)
+
+    traza = registro.pop('_traza')
+    registro.update(
+        fin_ns=time.time_ns(), segundos=round(segundos, 6), segundos_cpu=round(segundos_cpu, 6),
+        memoria_pico_mb=pico_mb, error=str(error) if error is not None else registro['error'],
+    )
+    traza.entregar(registro)
+    return registro
+
+
+# FUNCIÓN: Medir un bloque como etapa
+@contextmanager
+def etapa(nombre, **atributos):
+    registro = abrir_etapa(nombre, **atributos)
+    try:
+        yield registro
+    except Exception as e:
+        cerrar_etapa(registro, e)
+        raise
+    except BaseException:
+        # st.rerun() y st.stop() no son errores: la etapa termina con normalidad
+        cerrar_etapa(registro)
+        raise
+    cerrar_etapa(registro)
+
+
+# FUNCIÓN: Decorador que mide cada llamada a la función como una etapa
+def medir(nombre):
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with etapa(nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+# FUNCIÓN: Añadir atributos a la etapa abierta (los números se suman: tokens de varias llamadas)
+def anotar(**atributos):
+    pila = _pila_etapas.get()
+    if not pila:
+        return
+    destino = pila[-1]['atributos']
+    for clave, valor in atributos.items():
+        if valor is None:
+            continue
+        if isinstance(valor, (int, float)) and not isinstance(valor, bool) and isinstance(destino.get(clave), (int, float)):
+            destino[clave] += valor
+        else:
+            destino[clave] = valor
+
+
+# FUNCIÓN: Resumen por etapa de una lista de etapas (para el panel de la app)
+def resumir_etapas(etapas):
+    resumen = {}
+    for registro in etapas:
+        fila = resumen.setdefault(registro['nombre'], {
+            'etapa': registro['nombre'], 'llamadas': 0, 'segundos': 0.0, 'segundos_cpu': 0.0,
+            'memoria_pico_mb': None, 'tokens_entrada': 0, 'tokens_salida': 0,
+        })
+        fila['llamadas'] += 1
+        fila['segundos'] += registro['segundos']
+        fila['segundos_cpu'] += registro['segundos_cpu']
+        if registro['memoria_pico_mb'] is not None:
+            fila['memoria_pico_mb'] = max(fila['memoria_pico_mb'] or 0, registro['memoria_pico_mb'])
+        fila['tokens_entrada'] += registro['atributos'].get('tokens_entrada', 0)
+        fila['tokens_salida'] += registro['atributos'].get('tokens_salida', 0)
+    return sorted(resumen.values(), key=lambda f: -f['segundos'])
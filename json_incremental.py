@@ -0,0 +1,165 @@
+import codecs
+import io
+import json
+
+
+# Tamaño de lectura inicial; crece si un elemento no cabe en el buffer
+TAMANO_LECTURA_DEFECTO = 1 << 16
+
+_DECODIFICADOR = json.JSONDecoder()
+_ESPACIOS = ' \t\r\n'
+
+
+# CLASE: Lector JSON incremental sobre un flujo de texto
+class LectorJson:
+    """ Decodifica valores uno a uno con raw_decode; la memoria depende del elemento más grande, no del archivo. """
+
+    def __init__(self, flujo, tamano_lectura=TAMANO_LECTURA_DEFECTO):
+        self.flujo = flujo
+        self.tamano_lectura = tamano_lectura
+        self.buffer = ''
+        self.pos = 0
+        self.fin = False
+
+    def _leer_mas(self):
+        trozo = self.flujo.read(self.tamano_lectura)
+        if not trozo:
+            self.fin = True
+            return False
+        self.buffer = self.buffer[self.pos:] + trozo
+        self.pos = 0
+        return True
+
+    def siguiente_caracter(self):
+        """ Devuelve (sin consumir) el siguiente carácter que no es espacio, o '' al final. """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _ESPACIOS:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._leer_mas():
+                return ''
+
+    def consumir(self, esperado):
+        caracter = self.siguiente_caracter()
+        if caracter != esperado:
+            raise ValueError(f"JSON inválido: se esperaba '{esperado}' y se encontró '{caracter}'")
+        self.pos += 1
+
+    def valor(self):
+        """ Decodifica el siguiente valor completo, leyendo más datos mientras esté incompleto. """
+        self.siguiente_caracter()
+        tamano_original = self.tamano_lectura
+        try:
+            while True:
+                try:
+                    valor, fin = _DECODIFICADOR.raw_decode(self.buffer, self.pos)
+                    # Un número al final del buffer podría continuar en la siguiente lectura
+                    if fin < len(self.buffer) or self.fin:
+                        self.pos = fin
+                        return valor
+                except json.JSONDecodeError:
+                    if self.fin:
+                        raise
+                if not self._leer_mas():
+                    continue
+                self.tamano_lectura = min(self.tamano_lectura * 2, 1 << 26)
+        finally:
+            self.tamano_lectura = tamano_original
+
+    def elementos(self):
+        """ Itera los elementos del array que empieza en la posición actual. """
+        self.consumir('[')
+        if self.siguiente_caracter() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.valor()
+            caracter = self.siguiente_caracter()
+            self.pos += 1
+            if caracter == ']':
+                return
+            if caracter != ',':
+                raise ValueError(f"JSON inválido: se esperaba ',' o ']' y se encontró '{caracter}'")
+
+
+# CLASE: Flujo de texto sobre un iterable de trozos (p. ej. una respuesta de Gemini en streaming)
+class FlujoTrozos:
+    """
+    read() devuelve el siguiente trozo no vacío, así LectorJson decodifica cada valor en cuanto
+    llega su último carácter. Descarta lo anterior al primer '{' o '[' (vallas ```json del modelo).
+    """
+
+    def __init__(self, trozos):
+        self._trozos = iter(trozos)
+        self._previo = ''
+
+    def read(self, tamano=-1):
+        for trozo in self._trozos:
+            if not trozo:
+                continue
+            if self._previo is not None:
+                self._previo += trozo
+                inicio = min((i for i in (self._previo.find('{'), self._previo.find('[')) if i >= 0), default=-1)
+                if inicio < 0:
+                    continue
+                trozo, self._previo = self._previo[inicio:], None
+            return trozo
+        return ''
+
+
+# FUNCIÓN: Abrir un flujo binario como texto detectando BOM UTF-8 / UTF-16
+def abrir_texto(flujo_binario):
+    inicio = flujo_binario.peek(4)[:4] if hasattr(flujo_binario, 'peek') else b''
+    codificacion = 'utf-16' if inicio.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)) else 'utf-8-sig'
+    return io.TextIOWrapper(flujo_binario, encoding=codificacion)
+
+
+# FUNCIÓN: Decodificar los bytes subidos (vía memoryview) sin copias intermedias ni archivos temporales
+def decodificar_texto(buffer, errores='strict'):
+    vista = memoryview(buffer)
+    codificacion = 'utf-16' if bytes(vista[:2]) in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE) else 'utf-8-sig'
+    return str(vista, codificacion, errores)
+
+
+# FUNCIÓN: Lector de texto incremental sobre un buffer binario ya en memoria (no lo cierra ni lo copia)
+def lector_texto(flujo_binario):
+    flujo_binario.seek(0)
+    inicio = flujo_binario.read(2)
+    flujo_binario.seek(0)
+    codificacion = 'utf-16' if inicio in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE) else 'utf-8-sig'
+    return codecs.getreader(codificacion)(flujo_binario)
+
+
+# FUNCIÓN: Iterar los elementos de un array JSON de primer nivel
+def iterar_elementos_json(flujo, tamano_lectura=TAMANO_LECTURA_DEFECTO):
+    return LectorJson(flujo, tamano_lectura).elementos()
+
+
+# FUNCIÓN: Recorrer un objeto JSON de primer nivel clave a clave
+def iterar_arrays_json(flujo, claves, tamano_lectura=TAMANO_LECTURA_DEFECTO):
+    """
+    Produce (clave, elemento) por cada elemento de los arrays de `claves` y (clave, valor) para los escalares.
+    Los arrays de otras claves se recorren y descartan elemento a elemento.
+    """
+    lector = LectorJson(flujo, tamano_lectura)
+    lector.consumir('{')
+    if lector.siguiente_caracter() == '}':
+        return
+    while True:
+        clave = lector.valor()
+        lector.consumir(':')
+        if lector.siguiente_caracter() == '[':
+            for elemento in lector.elementos():
+                if clave in claves:
+                    yield clave, elemento
+        else:
+            valor = lector.valor()
+            if clave in claves:
+                yield clave, valor
+        caracter = lector.siguiente_caracter()
+        lector.pos += 1
+        if caracter == '}':
+            return
+        if caracter != ',':
+            raise ValueError(f"JSON inválido: se esperaba ',' o '}}' y se encontró '{caracter}'")
@@ -0,0 +1,151 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+# Valores por defecto del modo lote
+CONCURRENCIA_DEFECTO = 8
+TIMEOUT_DEFECTO_SEGUNDOS = 120
+INTERVALO_SONDEO_SEGUNDOS = 0.25
+
+
+# FUNCIÓN: Ejecutar una tarea registrando cuándo empezó realmente
+def _cronometrar(inicios, indice, funcion, args):
+    inicios[indice] = time.monotonic()
+    return funcion(*args)
+
+
+# FUNCIÓN: Ejecución concurrente con límite de concurrencia y timeout por petición
+def ejecutar_en_lote(tareas, concurrencia=CONCURRENCIA_DEFECTO, timeout=TIMEOUT_DEFECTO_SEGUNDOS, inicializador=None):
+    """
+    Recibe tareas (nombre, funcion, args) y produce (nombre, resultado, segundos) en orden de llegada.
+    Las excepciones y los timeouts se devuelven como {"error": ...}, igual que las funciones de análisis.
+    """
+    inicios = {}
+    ejecutor = ThreadPoolExecutor(max_workers=max(1, concurrencia), initializer=inicializador)
+    try:
+        pendientes = {
+            # Cada tarea hereda una copia del contexto (traza de instrumentación activa)
+            ejecutor.submit(contextvars.copy_context().run, _cronometrar, inicios, indice, funcion, tuple(args)): (indice, nombre)
+            for indice, (nombre, funcion, args) in enumerate(tareas)
+        }
+        while pendientes:
+            hechos, _ = wait(pendientes, timeout=INTERVALO_SONDEO_SEGUNDOS, return_when=FIRST_COMPLETED)
+            ahora = time.monotonic()
+            for futuro in hechos:
+                indice, nombre = pendientes.pop(futuro)
+                try:
+                    resultado = futuro.result()
+                except Exception as e:
+                    resultado = {"error": f"Error en el análisis de {nombre}: {e}"}
+                yield nombre, resultado, ahora - inicios.get(indice, ahora)
+
+            # El tiempo de espera cuenta desde que la tarea empieza, no desde que entra en la cola
+            for futuro, (indice, nombre) in list(pendientes.items()):
+                if indice in inicios and ahora - inicios[indice] > timeout:
+                    futuro.cancel()
+                    del pendientes[futuro]
+                    yield nombre, {"error": f"Tiempo de espera agotado ({timeout} s)"}, ahora - inicios[indice]
+    finally:
+        # Las llamadas que agotaron el tiempo siguen en su hilo; su resultado se descarta
+        ejecutor.shutdown(wait=False, cancel_futures=True)
+
+
+# FUNCIÓN: (tabla, columna) de una columna de un análisis; fuera de los análisis fusionados, (None, col)
+def origen_columna(analisis, col):
+    return tuple(analisis.get('origen_columnas', {}).get(col, (None, col)))
+
+
+# FUNCIÓN: Columna del análisis fusionado que corresponde a Tabla[Columna]
+def id_columna(analisis, tabla, col):
+    origenes = analisis.get('origen_columnas', {})
+    for candidata in (col, f'{col} ({tabla})'):
+        if tuple(origenes.get(candidata, ())) == (tabla, col):
+            return candidata
+    return col
+
+
+# FUNCIÓN: Fusionar los análisis de varias tablas en uno solo
+def fusionar_analisis(lista_analisis):
+    """
+    Une columnas, relaciones y métricas; 'tablas' conserva las columnas de cada tabla. Las columnas se
+    identifican por (tabla, columna): un nombre repetido en otra tabla que no es la principal se
+    califica con ella ('Nombre (Producto)') y 'origen_columnas' guarda la tabla y el nombre real.
+    """
+    fusion = {
+        'columnas': [],
+        'tipos': {},
+        'numericas': [],
+        'categoricas': [],
+        'fechas': [],
+        'nulls': {},
+        'nombre_tabla': lista_analisis[0].get('nombre_tabla', 'Tabla') if lista_analisis else 'Tabla',
+        'relaciones': [],
+        'metricas_clave': [],
+        'tablas': {},
+        'origen_columnas': {}
+    }
+
+    tablas_de_columna = {}
+    for analisis in lista_analisis:
+        for col in analisis['columnas']:
+            tablas_de_columna.setdefault(col, set()).add(analisis.get('nombre_tabla', 'Tabla'))
+
+    for analisis in lista_analisis:
+        tabla = analisis.get('nombre_tabla', 'Tabla')
+        fusion['tablas'].setdefault(tabla, [])
+        ids = {}
+        for col in analisis['columnas']:
+            if col not in fusion['tablas'][tabla]:
+                fusion['tablas'][tabla].append(col)
+            ids[col] = col if tabla == fusion['nombre_tabla'] or len(tablas_de_columna[col]) == 1 else f'{col} ({tabla})'
+            # La misma tabla puede llegar en varios análisis (varios archivos del lote): la primera manda
+            if ids[col] in fusion['tipos']:
+                continue
+            fusion['columnas'].append(ids[col])
+            fusion['origen_columnas'][ids[col]] = (tabla, col)
+            fusion['tipos'][ids[col]] = analisis['tipos'].get(col, '')
+            fusion['nulls'][ids[col]] = analisis['nulls'].get(col, 0)
+            for categoria in ('numericas', 'categoricas', 'fechas'):
+                if col in analisis[categoria]:
+                    fusion[categoria].append(ids[col])
+
+        for clave, destino in (('relaciones', 'relaciones'), ('relaciones_posibles', 'relaciones'),
+                               ('metricas_clave', 'metricas_clave')):
+            for elemento in analisis.get(clave, []):
+                if elemento not in fusion[destino]:
+                    fusion[destino].append(elemento)
+        # Descripciones y columnas del índice local: el índice aprende del análisis fusionado
+        for col, descripcion in analisis.get('descripciones', {}).items():
+            fusion.setdefault('descripciones', {}).setdefault(ids.get(col, col), descripcion)
+        for col in analisis.get('clasificadas_localmente', []):
+            if ids.get(col, col) not in fusion.setdefault('clasificadas_localmente', []):
+                fusion['clasificadas_localmente'].append(ids.get(col, col))
+
+    return fusion
+
+
+# FUNCIÓN: Fusionar respuestas parciales de Gemini (mosaicos o fragmentos del mismo modelo)
+def fusionar_resultados_gemini(resultados):
+    """
+    Une las columnas por (tabla, nombre) y deduplica relaciones y métricas, en formato de respuesta de
+    Gemini. Una columna sin 'tabla' es de la tabla del fragmento: Cliente[Nombre] y Producto[Nombre]
+    de dos fragmentos se conservan las dos, cada una con su 'tabla'.
+    """
+    fusion = {'nombre_tabla': None, 'columnas': [], 'relaciones_posibles': [], 'metricas_clave': []}
+    vistas = set()
+    for resultado in resultados:
+        if not fusion['nombre_tabla'] and resultado.get('nombre_tabla'):
+            fusion['nombre_tabla'] = resultado['nombre_tabla']
+        for col_info in resultado.get('columnas', []):
+            nombre = col_info.get('nombre')
+            tabla = col_info.get('tabla') or resultado.get('nombre_tabla')
+            if nombre and (tabla, nombre) not in vistas:
+                vistas.add((tabla, nombre))
+                fusion['columnas'].append(dict(col_info, tabla=tabla) if tabla else col_info)
+        for clave in ('relaciones_posibles', 'metricas_clave'):
+            for elemento in resultado.get(clave, []):
+                if elemento not in fusion[clave]:
+                    fusion[clave].append(elemento)
+    fusion['nombre_tabla'] = fusion['nombre_tabla'] or 'Tabla'
+    return fusion
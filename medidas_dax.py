@@ -0,0 +1,353 @@
+import itertools
+import re
+
+from lotes import id_columna, origen_columna
+
+
+# Por encima de esta cardinalidad una columna no sirve como eje de Top N, barras o cascada
+CARDINALIDAD_MAXIMA_EJE = 1000
+
+# Ventanas (en meses) de las medidas móviles
+VENTANAS_MOVILES = (3, 12)
+
+# Nombres de tabla que DAX acepta sin comillas simples
+_PATRON_TABLA_SIN_COMILLAS = re.compile(r'^[^\W\d]\w*$')
+
+# Registro de plantillas en orden de presentación: {'tipo', 'funcion', 'cantidad'}
+PLANTILLAS = []
+
+
+# FUNCIÓN: Elegir la columna categórica para Top N y gráficas según la cardinalidad conocida
+def columna_categorica_preferida(analisis):
+    """ Evita claves y textos de alta cardinalidad cuando el análisis trae 'cardinalidad' (vpax o perfilado). """
+    cardinalidad = analisis.get('cardinalidad', {})
+    for col in analisis['categoricas']:
+        if 1 < (cardinalidad.get(col) or 0) <= CARDINALIDAD_MAXIMA_EJE:
+            return col
+    return analisis['categoricas'][0]
+
+
+# FUNCIÓN: Nombre de tabla tal como se escribe en DAX ('Ventas 2024' lleva comillas; Ventas no)
+def tabla_dax(tabla):
+    if _PATRON_TABLA_SIN_COMILLAS.match(tabla):
+        return tabla
+    return "'" + tabla.replace("'", "''") + "'"
+
+
+# FUNCIÓN: Tabla DAX de una columna en análisis de varias tablas
+def tabla_de_columna(analisis, col, nombre_tabla):
+    """
+    La tabla principal (la primera) usa el nombre elegido por el usuario; el resto, su propio nombre.
+    Sin 'tablas' (respuestas de Gemini fusionadas) una columna de otra tabla usa la de su origen.
+    """
+    tablas = list(analisis.get('tablas', {}).items())
+    origen, col = origen_columna(analisis, col)
+    for i, (tabla, columnas) in enumerate(tablas):
+        if tabla == origen or (origen is None and col in columnas):
+            return tabla_dax(nombre_tabla if i == 0 else tabla)
+    if not tablas and origen not in (None, analisis.get('nombre_tabla')):
+        return tabla_dax(origen)
+    return tabla_dax(nombre_tabla)
+
+
+# FUNCIÓN: Nombre DAX de una tabla del modelo (la principal con el nombre elegido por el usuario)
+def referencia_tabla(analisis, tabla, nombre_tabla):
+    tablas = list(analisis.get('tablas', {}))
+    return tabla_dax(nombre_tabla if not tablas or tabla == tablas[0] else tabla)
+
+
+# FUNCIÓN: Columnas del análisis que participan en relaciones del modelo
+def columnas_de_relaciones(analisis):
+    return {
+        id_columna(analisis, tabla, col) for r in analisis.get('relaciones_modelo', [])
+        for tabla, col in ((r['desde_tabla'], r['desde_columna']), (r['hacia_tabla'], r['hacia_columna']))
+    }
+
+
+# FUNCIÓN: Fecha para inteligencia de tiempo (la de la tabla calendario si la tabla principal se relaciona con ella)
+def columna_fecha_preferida(analisis):
+    for r in analisis.get('relaciones_modelo', []):
+        desde = id_columna(analisis, r['desde_tabla'], r['desde_columna'])
+        hacia = id_columna(analisis, r['hacia_tabla'], r['hacia_columna'])
+        if r.get('activa', True) and desde in analisis['fechas'] and hacia in analisis['fechas']:
+            return hacia
+    return analisis['fechas'][0]
+
+
+# FUNCIÓN: Detectar columnas numéricas que son claves (enteros todos distintos o extremos de una relación) o constantes
+def es_columna_clave_o_constante(analisis, col):
+    """ Decide con las relaciones del modelo y las estadísticas del perfilado; sin ellas ninguna columna se descarta. """
+    if col in columnas_de_relaciones(analisis) or col in analisis.get('claves', ()):
+        return True
+    stats = analisis.get('estadisticas', {}).get(col)
+    distintos = analisis.get('cardinalidad', {}).get(col)
+    if stats is None or distintos is None:
+        return False
+    if stats['minimo'] == stats['maximo']:
+        return True
+    no_nulos = analisis.get('filas', 0) - analisis['nulls'].get(col, 0)
+    return 'int' in analisis['tipos'].get(col, '') and no_nulos > 1 and distintos >= no_nulos
+
+
+# FUNCIÓN: Columnas numéricas ordenadas para medidas y KPI (las claves y constantes al final)
+def columnas_numericas_preferidas(analisis):
+    return sorted(analisis['numericas'], key=lambda col: es_columna_clave_o_constante(analisis, col))
+
+
+# CLASE: Columnas ya clasificadas que comparten todas las plantillas
+class ContextoMedidas:
+    """ Se calcula una vez por análisis; las plantillas solo leen de aquí. """
+
+    def __init__(self, analisis, nombre_tabla):
+        self.analisis = analisis
+        self.nombre_tabla = nombre_tabla
+        numericas = columnas_numericas_preferidas(analisis)
+        self.claves = [col for col in numericas if es_columna_clave_o_constante(analisis, col)]
+        self.numericas = [col for col in numericas if col not in self.claves]
+        self.categoricas = list(analisis['categoricas'])
+        self.fechas = []
+        if analisis['fechas']:
+            preferida = columna_fecha_preferida(analisis)
+            self.fechas = [preferida] + [col for col in analisis['fechas'] if col != preferida]
+
+        # Ejes: categóricas de cardinalidad manejable (todas si no se conoce), la preferida primero
+        self.ejes = []
+        if self.categoricas:
+            cardinalidad = analisis.get('cardinalidad', {})
+            preferida = columna_categorica_preferida(analisis)
+            self.ejes = [preferida] + [
+                col for col in self.categoricas
+                if col != preferida and (cardinalidad.get(col) is None or 1 < cardinalidad[col] <= CARDINALIDAD_MAXIMA_EJE)
+            ]
+        self.relaciones = analisis.get('relaciones_modelo', [])
+
+    def ref(self, col):
+        """ Referencia calificada de una columna: Tabla[Columna] (con el nombre real en análisis fusionados). """
+        return f"{tabla_de_columna(self.analisis, col, self.nombre_tabla)}[{origen_columna(self.analisis, col)[1]}]"
+
+    def tabla(self, col):
+        return tabla_de_columna(self.analisis, col, self.nombre_tabla)
+
+    def tabla_modelo(self, tabla):
+        return referencia_tabla(self.analisis, tabla, self.nombre_tabla)
+
+    def sufijo_fecha(self, fecha):
+        """ La fecha principal no lleva sufijo; las demás se distinguen en el nombre de la medida. """
+        return '' if fecha == self.fechas[0] else f' ({fecha})'
+
+
+# FUNCIÓN: Registrar una plantilla de medidas (extensible desde otros módulos)
+def registrar_plantilla(tipo, cantidad=None):
+    """
+    La función recibe un ContextoMedidas y produce (nombre, expresión, descripción).
+    `cantidad(contexto)` devuelve cuántas medidas producirá sin generarlas (para paginar);
+    si se omite, se cuentan recorriendo la plantilla una vez.
+    """
+    def decorador(funcion):
+        PLANTILLAS.append({'tipo': tipo, 'funcion': funcion, 'cantidad': cantidad})
+        return funcion
+    return decorador
+
+
+# --- Plantillas ---
+
+@registrar_plantilla('Agregación básica', lambda ctx: len(ctx.numericas))
+def _totales(ctx):
+    for col in ctx.numericas:
+        yield f'Total {col}', f'SUM({ctx.ref(col)})', f'Suma total de {col}'
+
+
+@registrar_plantilla('Promedio', lambda ctx: len(ctx.numericas))
+def _promedios(ctx):
+    for col in ctx.numericas:
+        yield f'Promedio {col}', f'AVERAGE({ctx.ref(col)})', f'Valor medio por fila de {col}'
+
+
+@registrar_plantilla('Conteo', lambda ctx: len(ctx.analisis.get('tablas') or [ctx.nombre_tabla]) if ctx.analisis['columnas'] else 0)
+def _conteos(ctx):
+    if not ctx.analisis['columnas']:
+        return
+    yield 'Conteo Total Filas', f'COUNTROWS({tabla_dax(ctx.nombre_tabla)})', 'Cuenta todas las filas de la tabla'
+    for tabla in list(ctx.analisis.get('tablas', {}))[1:]:
+        yield f'Filas {tabla}', f'COUNTROWS({tabla_dax(tabla)})', f'Cuenta las filas de {tabla}'
+
+
+@registrar_plantilla('Conteo distinto', lambda ctx: len(ctx.claves) + len(ctx.categoricas))
+def _distintos(ctx):
+    for col in ctx.claves + ctx.categoricas:
+        yield f'Conteo Distinto {col}', f'DISTINCTCOUNT({ctx.ref(col)})', f'Valores distintos de {col}'
+
+
+@registrar_plantilla('Inteligencia de tiempo', lambda ctx: len(ctx.numericas) * len(ctx.fechas))
+def _acumulados(ctx):
+    for fecha, col in itertools.product(ctx.fechas, ctx.numericas):
+        yield (
+            f'{col} YTD{ctx.sufijo_fecha(fecha)}',
+            f'TOTALYTD([Total {col}], {ctx.ref(fecha)})',
+            f'Acumulado del año hasta la fecha para {col} según {fecha}'
+        )
+
+
+@registrar_plantilla('Análisis comparativo', lambda ctx: 4 * len(ctx.numericas) * len(ctx.fechas))
+def _comparativos(ctx):
+    for fecha, col in itertools.product(ctx.fechas, ctx.numericas):
+        sufijo, ref_fecha = ctx.sufijo_fecha(fecha), ctx.ref(fecha)
+        yield (
+            f'{col} Mes Anterior{sufijo}',
+            f'CALCULATE([Total {col}], PREVIOUSMONTH({ref_fecha}))',
+            f'{col} del mes anterior según {fecha}'
+        )
+        yield (
+            f'Variación % {col} vs Mes Anterior{sufijo}',
+            f'\nVAR Anterior = [{col} Mes Anterior{sufijo}]\nRETURN\n    DIVIDE([Total {col}] - Anterior, Anterior, 0)',
+            'Cambio porcentual vs mes anterior'
+        )
+        yield (
+            f'{col} Año Anterior{sufijo}',
+            f'CALCULATE([Total {col}], SAMEPERIODLASTYEAR({ref_fecha}))',
+            f'{col} del mismo periodo del año anterior según {fecha}'
+        )
+        yield (
+            f'Variación % {col} YoY{sufijo}',
+            f'\nVAR Anterior = [{col} Año Anterior{sufijo}]\nRETURN\n    DIVIDE([Total {col}] - Anterior, Anterior, 0)',
+            'Cambio porcentual vs el mismo periodo del año anterior'
+        )
+
+
+@registrar_plantilla('Ventana móvil', lambda ctx: len(VENTANAS_MOVILES) * len(ctx.numericas) * len(ctx.fechas))
+def _moviles(ctx):
+    for fecha, col, meses in itertools.product(ctx.fechas, ctx.numericas, VENTANAS_MOVILES):
+        ref_fecha = ctx.ref(fecha)
+        yield (
+            f'{col} Móvil {meses}M{ctx.sufijo_fecha(fecha)}',
+            f'CALCULATE([Total {col}], DATESINPERIOD({ref_fecha}, MAX({ref_fecha}), -{meses}, MONTH))',
+            f'{col} de los últimos {meses} meses según {fecha}'
+        )
+
+
+@registrar_plantilla('Filtrado avanzado', lambda ctx: len(ctx.numericas) * len(ctx.ejes))
+def _top_n(ctx):
+    for cat, col in itertools.product(ctx.ejes, ctx.numericas):
+        yield (
+            f'{col} Top 5 {cat}',
+            f'\nCALCULATE(\n    [Total {col}],\n    TOPN(5, ALL({ctx.ref(cat)}), [Total {col}])\n)',
+            f'Total de {col} solo para los 5 principales {cat}'
+        )
+
+
+@registrar_plantilla('Porcentaje del total', lambda ctx: len(ctx.numericas) * len(ctx.ejes))
+def _porcentajes(ctx):
+    for cat, col in itertools.product(ctx.ejes, ctx.numericas):
+        yield (
+            f'% {col} por {cat}',
+            f'DIVIDE([Total {col}], CALCULATE([Total {col}], ALL({ctx.ref(cat)})), 0)',
+            f'Participación de cada {cat} en el total de {col}'
+        )
+
+
+@registrar_plantilla('Ratio', lambda ctx: len(ctx.numericas) * (len(ctx.numericas) - 1) // 2)
+def _ratios(ctx):
+    for a, b in itertools.combinations(ctx.numericas, 2):
+        yield f'Ratio {a} vs {b}', f'DIVIDE([Total {a}], [Total {b}], 0)', f'Relación entre {a} y {b}'
+
+
+@registrar_plantilla('Relación inactiva')
+def _relaciones_inactivas(ctx):
+    # Relaciones inactivas (p. ej. una segunda fecha hacia el calendario) se activan solo en la medida
+    for r in ctx.relaciones:
+        if r.get('activa', True):
+            continue
+        desde, hacia = ctx.tabla_modelo(r['desde_tabla']), ctx.tabla_modelo(r['hacia_tabla'])
+        for col in ctx.numericas:
+            if ctx.tabla(col) != desde:
+                continue
+            yield (
+                f'Total {col} por {r["desde_columna"]}',
+                f'\nCALCULATE(\n    [Total {col}],\n'
+                f'    USERELATIONSHIP({desde}[{r["desde_columna"]}], {hacia}[{r["hacia_columna"]}])\n)',
+                f'{col} usando la relación {desde}[{r["desde_columna"]}] → {hacia}[{r["hacia_columna"]}]'
+            )
+
+
+@registrar_plantilla('Entre tablas')
+def _entre_tablas(ctx):
+    for r in ctx.relaciones:
+        if not r.get('activa', True):
+            continue
+        desde, hacia = ctx.tabla_modelo(r['desde_tabla']), ctx.tabla_modelo(r['hacia_tabla'])
+        hechos = [col for col in ctx.numericas if ctx.tabla(col) == desde]
+        if not hechos:
+            continue
+        # Un atributo numérico de la dimensión (precio, coste) se multiplica fila a fila con RELATED
+        dimension = [col for col in ctx.numericas if ctx.tabla(col) == hacia]
+        for col, dim_col in itertools.product(hechos, dimension):
+            yield (
+                f'{col} x {dim_col}',
+                f'SUMX({desde}, {ctx.ref(col)} * RELATED({ctx.ref(dim_col)}))',
+                f'{col} de cada fila de {r["desde_tabla"]} multiplicado por {dim_col} de {r["hacia_tabla"]}'
+            )
+        # Se reutiliza la medida de conteo distinto de la clave; sin ella (clave de fecha) no se genera
+        clave = id_columna(ctx.analisis, r['desde_tabla'], r['desde_columna'])
+        if clave not in ctx.claves + ctx.categoricas:
+            continue
+        yield (
+            f'{r["hacia_tabla"]} con {hechos[0]}',
+            f'CALCULATE([Conteo Distinto {clave}], {ctx.ref(hechos[0])} <> 0)',
+            f'Elementos de {r["hacia_tabla"]} con {hechos[0]} en el contexto actual'
+        )
+
+
+# CLASE: Catálogo perezoso de medidas DAX
+class CatalogoMedidas:
+    """ Iterable que genera las medidas bajo demanda; `pagina` solo construye las medidas que se muestran. """
+
+    def __init__(self, analisis, nombre_tabla, tipos=None, contexto=None):
+        self.contexto = contexto or ContextoMedidas(analisis, nombre_tabla)
+        self.plantillas = [p for p in PLANTILLAS if tipos is None or p['tipo'] in tipos]
+        self._cantidades = {}
+
+    def _medidas(self, plantilla):
+        for nombre, expresion, descripcion in plantilla['funcion'](self.contexto):
+            yield {'nombre': nombre, 'dax': f'{nombre} = {expresion}', 'tipo': plantilla['tipo'], 'descripcion': descripcion}
+
+    def _cantidad(self, plantilla):
+        indice = id(plantilla)
+        if indice not in self._cantidades:
+            if plantilla['cantidad'] is not None:
+                self._cantidades[indice] = plantilla['cantidad'](self.contexto)
+            else:
+                self._cantidades[indice] = sum(1 for _ in plantilla['funcion'](self.contexto))
+        return self._cantidades[indice]
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self._medidas(p) for p in self.plantillas)
+
+    def __len__(self):
+        return sum(self._cantidad(p) for p in self.plantillas)
+
+    def tipos(self):
+        """ Tipos con al menos una medida, en el orden del registro. """
+        return list(dict.fromkeys(p['tipo'] for p in self.plantillas if self._cantidad(p)))
+
+    def filtrar(self, tipos):
+        return CatalogoMedidas(None, None, tipos=set(tipos), contexto=self.contexto)
+
+    def pagina(self, numero, tamano):
+        """ Medidas de la página `numero` (desde 0); las plantillas anteriores se saltan por su cantidad. """
+        inicio, medidas = numero * tamano, []
+        for plantilla in self.plantillas:
+            cantidad = self._cantidad(plantilla)
+            if inicio >= cantidad:
+                inicio -= cantidad
+                continue
+            medidas.extend(itertools.islice(self._medidas(plantilla), inicio, inicio + tamano - len(medidas)))
+            inicio = 0
+            if len(medidas) >= tamano:
+                break
+        return medidas
+
+
+# FUNCIÓN: Generar Medidas DAX
+def generar_medidas_dax(analisis, nombre_tabla):
+    """ Devuelve un CatalogoMedidas: nada se genera hasta que se recorre o se pide una página. """
+    return CatalogoMedidas(analisis, nombre_tabla)
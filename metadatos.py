@@ -0,0 +1,264 @@
+import csv
+import itertools
+import re
+from functools import lru_cache
+
+from json_incremental import LectorJson
+from lotes import fusionar_analisis
+
+
+# Tipos de dato de TOM / DMV (nombre o código de ExplicitDataType); el resto se trata como categórico
+TIPOS_NUMERICOS = {'int64', 'double', 'decimal', 'currency', 'integer', 'wholenumber', 'number',
+                   'int', 'float', 'fixeddecimal', '6', '8', '10'}
+TIPOS_FECHA = {'datetime', 'date', 'time', '9'}
+
+# Nombres normalizados de los campos habituales en volcados DMV, INFO.* y DaxVpaView
+CLAVES_TABLA = ('tablename', 'table', 'tableid', 'dimensionname')
+CLAVES_COLUMNA = ('columnname', 'explicitname', 'name', 'attributename', 'inferredname')
+CLAVES_TIPO = ('datatype', 'explicitdatatype', 'inferreddatatype')
+
+_PATRON_NO_ALFANUMERICO = re.compile(r'[^a-z0-9]')
+
+# Tipo 3 de TMSCHEMA_COLUMNS: columna interna RowNumber
+TIPO_COLUMNA_ROWNUMBER = '3'
+
+
+# FUNCIÓN: Normalizar nombres de campo ("[ExplicitName]", "TABLE_NAME" -> "explicitname", "tablename")
+@lru_cache(maxsize=1024)
+def _normalizar_clave(clave):
+    return _PATRON_NO_ALFANUMERICO.sub('', str(clave).lower())
+
+
+# FUNCIÓN: Leer un nombre que puede venir como texto o como {"Name": ...}
+def nombre_referencia(valor):
+    if isinstance(valor, dict):
+        return valor.get('Name') or valor.get('name')
+    return None if valor is None else str(valor)
+
+
+# FUNCIÓN: Primer valor presente entre varias claves normalizadas
+def _valor(fila, claves):
+    for clave in claves:
+        if clave in fila and fila[clave] not in (None, ''):
+            return fila[clave]
+    return None
+
+
+# FUNCIÓN: Categoría lógica de un tipo de dato de Power BI
+def categoria_tipo_dato(tipo):
+    tipo = _normalizar_clave(tipo)
+    if tipo in TIPOS_NUMERICOS:
+        return 'numericas'
+    if tipo in TIPOS_FECHA:
+        return 'fechas'
+    return 'categoricas'
+
+
+# FUNCIÓN: Columnas internas que no deben aparecer en el análisis
+def es_columna_interna(nombre, tipo_columna=None):
+    return str(nombre).startswith('RowNumber-') or _normalizar_clave(tipo_columna or '') in ('rownumber', TIPO_COLUMNA_ROWNUMBER)
+
+
+# FUNCIÓN: Texto de una relación del modelo ("Ventas[ClienteID] → Clientes[ID]")
+def texto_relacion(r):
+    texto = f"{r['desde_tabla']}[{r['desde_columna']}] → {r['hacia_tabla']}[{r['hacia_columna']}]"
+    if 'contencion' in r:
+        texto += f" ({r['contencion']:.0%} de valores encontrados)"
+    return texto + ("" if r.get('activa', True) else " (inactiva)")
+
+
+# FUNCIÓN: Construir el análisis fusionado a partir de tablas, relaciones y medidas
+def construir_analisis(tablas, relaciones, medidas):
+    """ tablas: {tabla: [(columna, tipo), ...]}; relaciones: lista de dicts desde/hacia. """
+    if not tablas:
+        return None
+
+    # La tabla de hechos (más relaciones salientes, luego más columnas numéricas) va primero
+    salientes = {}
+    for rel in relaciones:
+        salientes[rel['desde_tabla']] = salientes.get(rel['desde_tabla'], 0) + 1
+
+    def peso(tabla):
+        numericas = sum(1 for _, tipo in tablas[tabla] if categoria_tipo_dato(tipo) == 'numericas')
+        return (salientes.get(tabla, 0), numericas)
+
+    lista = []
+    for tabla in sorted(tablas, key=peso, reverse=True):
+        analisis = {
+            'columnas': [], 'tipos': {}, 'numericas': [], 'categoricas': [], 'fechas': [], 'nulls': {},
+            'nombre_tabla': tabla
+        }
+        for columna, tipo in tablas[tabla]:
+            if columna in analisis['tipos']:
+                continue
+            analisis['columnas'].append(columna)
+            analisis['tipos'][columna] = str(tipo)
+            analisis['nulls'][columna] = 0
+            analisis[categoria_tipo_dato(tipo)].append(columna)
+        lista.append(analisis)
+
+    fusion = fusionar_analisis(lista)
+    fusion['relaciones'] = [texto_relacion(r) for r in relaciones]
+    fusion['relaciones_modelo'] = relaciones
+    fusion['metricas_clave'] = medidas
+    fusion['origen'] = 'metadatos locales'
+    return fusion
+
+
+# FUNCIÓN: TMSL / model.bim (también scripts createOrReplace y listas de tablas)
+def _parsear_tmsl(data):
+    if isinstance(data, dict) and isinstance(data.get('createOrReplace'), dict):
+        data = data['createOrReplace'].get('database', data['createOrReplace'])
+    modelo = data.get('model', data) if isinstance(data, dict) else {'tables': data}
+    # Un JSON ajeno con 'model' que no es un objeto no es TMSL: se prueba el siguiente parser
+    if not isinstance(modelo, dict):
+        return None
+    lista_tablas = modelo.get('tables')
+    if lista_tablas is None or isinstance(lista_tablas, (dict, str)):
+        return None
+
+    # 'tables' puede ser una lista o un iterador en streaming
+    tablas, medidas = {}, []
+    for tabla in lista_tablas:
+        if not isinstance(tabla, dict) or 'name' not in tabla:
+            return None
+        columnas = tablas.setdefault(tabla['name'], [])
+        for col in tabla.get('columns', []):
+            if 'name' in col and not es_columna_interna(col['name'], col.get('type')):
+                columnas.append((col['name'], col.get('dataType', 'string')))
+        medidas.extend(m['name'] for m in tabla.get('measures', []) if 'name' in m)
+
+    relaciones = [
+        {
+            'desde_tabla': r['fromTable'], 'desde_columna': r['fromColumn'],
+            'hacia_tabla': r['toTable'], 'hacia_columna': r['toColumn'],
+            'activa': r.get('isActive', True)
+        }
+        for r in modelo.get('relationships', [])
+        if all(k in r for k in ('fromTable', 'fromColumn', 'toTable', 'toColumn'))
+    ]
+    return construir_analisis(tablas, relaciones, medidas)
+
+
+# FUNCIÓN: DaxModel.json de DAX Studio / VertiPaq Analyzer (nombres como {"Name": ...})
+def _parsear_dax_model(data):
+    if not isinstance(data, dict) or not isinstance(data.get('Tables'), list):
+        return None
+    if not data['Tables'] or 'TableName' not in data['Tables'][0]:
+        return None
+
+    tablas, medidas = {}, []
+    for tabla in data['Tables']:
+        nombre_tabla = nombre_referencia(tabla.get('TableName'))
+        columnas = tablas.setdefault(nombre_tabla, [])
+        for col in tabla.get('Columns', []):
+            nombre = nombre_referencia(col.get('ColumnName'))
+            if nombre and not es_columna_interna(nombre, col.get('ColumnType')):
+                columnas.append((nombre, col.get('DataType', 'String')))
+        medidas.extend(nombre_referencia(m.get('MeasureName')) for m in tabla.get('Measures', []) if m.get('MeasureName'))
+
+    return construir_analisis(tablas, relaciones_vertipaq(data.get('Relationships', [])), medidas)
+
+
+# FUNCIÓN: Relaciones en el formato de VertiPaq Analyzer ('Tabla'[Columna] o nombres separados)
+def relaciones_vertipaq(lista):
+    patron = re.compile(r"^'?(.+?)'?\[(.+)\]$")
+    relaciones = []
+    for r in lista:
+        extremos = []
+        for lado in ('From', 'To'):
+            tabla = nombre_referencia(r.get(f'{lado}TableName'))
+            columna = nombre_referencia(r.get(f'{lado}ColumnName'))
+            completo = patron.match(str(r.get(f'{lado}FullColumnName', '')))
+            if completo and not (tabla and columna):
+                tabla, columna = completo.groups()
+            extremos.append((tabla, columna))
+        if all(all(extremo) for extremo in extremos):
+            relaciones.append({
+                'desde_tabla': extremos[0][0], 'desde_columna': extremos[0][1],
+                'hacia_tabla': extremos[1][0], 'hacia_columna': extremos[1][1],
+                'activa': r.get('IsActive', True)
+            })
+    return relaciones
+
+
+# FUNCIÓN: Volcados fila a fila (INFO.COLUMNS(), DMV $SYSTEM.*, DaxVpaView 'Columns')
+def _parsear_filas(filas, relaciones=()):
+    """ Una sola pasada sobre cualquier iterable de filas, para poder recibirlas en streaming. """
+    tablas = {}
+    con_tipo = False
+    for numero, fila in enumerate(filas):
+        if not isinstance(fila, dict):
+            return None
+        fila = {_normalizar_clave(k): v for k, v in fila.items()}
+        columna = nombre_referencia(_valor(fila, CLAVES_COLUMNA))
+        if numero == 0 and columna is None:
+            return None
+        if not columna or es_columna_interna(columna, fila.get('type') or fila.get('columntype')):
+            continue
+        clave_tabla = next((k for k in CLAVES_TABLA if fila.get(k) not in (None, '')), None)
+        tabla = nombre_referencia(fila[clave_tabla]) if clave_tabla else None
+        if clave_tabla == 'tableid':
+            # INFO.COLUMNS() solo trae el identificador numérico de la tabla
+            tabla = f'Tabla {tabla}'
+        tipo = _valor(fila, CLAVES_TIPO)
+        con_tipo = con_tipo or tipo is not None
+        tablas.setdefault(tabla or 'Tabla', []).append((columna, tipo if tipo is not None else 'String'))
+
+    # Sin ninguna información de tipo, el formato no se reconoce con seguridad
+    if not con_tipo:
+        return None
+    return construir_analisis(tablas, list(relaciones), [])
+
+
+# FUNCIÓN: Parser local de metadata (JSON ya cargado)
+def parsear_metadatos(data):
+    """ Devuelve el análisis si el formato es conocido (TMSL, DaxModel, DaxVpaView, DMV/INFO); si no, None. """
+    if isinstance(data, dict):
+        # DaxVpaView.json: columnas en una lista plana con TableName / ColumnName
+        if isinstance(data.get('Columns'), list):
+            return _parsear_filas(data['Columns'], relaciones_vertipaq(data.get('Relationships', [])))
+        for parser in (_parsear_tmsl, _parsear_dax_model):
+            analisis = parser(data)
+            if analisis:
+                return analisis
+        # Resultados de DAX Studio / REST executeQueries: {"results": [{"tables": [{"rows": [...]}]}]}
+        resultados = data.get('results')
+        if isinstance(resultados, list) and resultados:
+            filas = [f for r in resultados for t in r.get('tables', []) for f in t.get('rows', [])]
+            return _parsear_filas(filas)
+        return None
+
+    if isinstance(data, list) and data:
+        if all(isinstance(t, dict) and 'name' in t and 'columns' in t for t in data[:50]):
+            return _parsear_tmsl({'tables': data})
+        return _parsear_filas(data)
+    return None
+
+
+# FUNCIÓN: Parser local de volcados DMV en texto tabulado (TSV/CSV con cabecera)
+def parsear_texto_metadatos(texto):
+    lineas = texto.splitlines()
+    if len(lineas) < 2:
+        return None
+    try:
+        dialecto = csv.Sniffer().sniff('\n'.join(lineas[:50]), delimiters='\t;,|')
+    except csv.Error:
+        return None
+    return _parsear_filas(csv.DictReader(lineas, dialect=dialecto))
+
+
+# FUNCIÓN: Parser local en streaming para JSON grandes cuyo primer nivel es un array
+def parsear_json_incremental(flujo):
+    """ Lee filas DMV/INFO o tablas TMSL elemento a elemento; devuelve None si el JSON no es un array. """
+    lector = LectorJson(flujo)
+    if lector.siguiente_caracter() != '[':
+        return None
+    elementos = lector.elementos()
+    primero = next(elementos, None)
+    if not isinstance(primero, dict):
+        return None
+    if 'name' in primero and 'columns' in primero:
+        # Las tablas TMSL son pequeñas de una en una; solo se acumulan sus columnas
+        return _parsear_tmsl({'tables': itertools.chain([primero], elementos)})
+    return _parsear_filas(itertools.chain([primero], elementos))
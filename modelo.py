@@ -0,0 +1,183 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from lotes import fusionar_analisis, id_columna
+from metadatos import texto_relacion
+from perfilado import categoria_tipo
+
+
+# Tamaño de la firma KMV (k hashes más pequeños de los valores distintos de cada columna)
+TAMANO_FIRMA = 4096
+
+# Proporción mínima de valores de la columna de hechos presentes en la clave de la dimensión
+UMBRAL_CONTENCION = 0.95
+
+# Sin coincidencia de nombre, una columna de texto necesita al menos estos distintos para relacionarse
+MIN_DISTINTOS_SIN_NOMBRE = 20
+
+# Prefijos y sufijos habituales de claves que se ignoran al comparar nombres
+_PATRON_AFIJOS_CLAVE = re.compile(r'^(dim|fact|fct|tbl)_?|^(d|f|id|cod|fk|pk)_|_?(id|key|sk|fk|pk|clave|codigo|code)$|_(no|num|cod)$')
+_PATRON_NO_ALFANUMERICO = re.compile(r'[^a-z0-9_]')
+
+
+# FUNCIÓN: Valores distintos como texto comparable entre tablas (5 == 5.0, fecha == fecha a medianoche)
+def _distintos_normalizados(valores):
+    distintos = pd.Series(pd.unique(valores.to_numpy()))
+    categoria = categoria_tipo(str(valores.dtype))
+    if categoria == 'fechas':
+        distintos = pd.to_datetime(distintos).dt.strftime('%Y-%m-%d %H:%M:%S')
+    elif categoria == 'numericas' and not pd.api.types.is_integer_dtype(distintos):
+        # Columnas enteras con nulos se leen como float
+        distintos = distintos.astype(np.int64)
+    return distintos.astype(str)
+
+
+# CLASE: Firma de los valores distintos de una columna candidata a clave
+class FirmaClave:
+    """ Guarda los k hashes más pequeños (KMV): memoria fija aunque la columna tenga decenas de millones de filas. """
+
+    def __init__(self, serie, tamano=TAMANO_FIRMA):
+        valores = serie.dropna()
+        self.nulos = len(serie) - len(valores)
+        self.numerica = pd.api.types.is_numeric_dtype(valores)
+        hashes = np.unique(pd.util.hash_pandas_object(_distintos_normalizados(valores), index=False).to_numpy(dtype=np.uint64))
+        self.distintos = len(hashes)
+        self.completa = len(hashes) <= tamano
+        self.hashes = hashes[:tamano]
+        self.unica = self.nulos == 0 and self.distintos == len(serie) and self.distintos > 0
+
+    @property
+    def umbral(self):
+        """ Mayor hash guardado; por encima de él la firma no sabe qué valores contiene la columna. """
+        if self.completa or not len(self.hashes):
+            return np.iinfo(np.uint64).max
+        return self.hashes[-1]
+
+    def contencion_en(self, otra):
+        """ Proporción estimada de los valores distintos de esta columna que aparecen en `otra`. """
+        comparables = self.hashes[self.hashes <= otra.umbral]
+        if not len(comparables):
+            return 0.0
+        return float(np.isin(comparables, otra.hashes, assume_unique=True).mean())
+
+
+# FUNCIÓN: ¿Puede la columna ser clave o clave foránea? (enteros, texto, fechas o decimales enteros)
+def es_candidata_clave(serie):
+    categoria = categoria_tipo(str(serie.dtype))
+    if categoria in ('categoricas', 'fechas'):
+        return True
+    if categoria != 'numericas':
+        return False
+    if pd.api.types.is_integer_dtype(serie):
+        return True
+    valores = serie.dropna().to_numpy(dtype=np.float64)
+    return len(valores) > 0 and bool(np.all(valores == np.round(valores)))
+
+
+# FUNCIÓN: Firmas de todas las columnas candidatas de una tabla
+def firmas_tabla(df, tamano=TAMANO_FIRMA):
+    return {str(col): FirmaClave(df[col], tamano) for col in df.columns if es_candidata_clave(df[col])}
+
+
+# FUNCIÓN: Raíz comparable de un nombre ("CustomerKey", "ID_Cliente" -> "customer", "cliente")
+def _raiz_nombre(nombre):
+    nombre = _PATRON_NO_ALFANUMERICO.sub('', re.sub(r'(?<=[a-z])(?=[A-Z])', '_', str(nombre)).lower().replace(' ', '_'))
+    raiz = nombre
+    while True:
+        recortada = _PATRON_AFIJOS_CLAVE.sub('', raiz).strip('_')
+        if recortada == raiz or not recortada:
+            break
+        raiz = recortada
+    return raiz.replace('_', '')
+
+
+# FUNCIÓN: ¿El nombre de la columna de hechos apunta a la clave o a la tabla de la dimensión?
+def nombres_coinciden(columna, tabla_destino, columna_destino):
+    raiz = _raiz_nombre(columna)
+    if not raiz:
+        return False
+    raiz_tabla = _raiz_nombre(tabla_destino)
+    return raiz == _raiz_nombre(columna_destino) or (len(raiz) > 2 and raiz in raiz_tabla) or (len(raiz_tabla) > 2 and raiz_tabla in raiz)
+
+
+# FUNCIÓN: Inferir relaciones hechos -> dimensión por contención de conjuntos de valores
+def inferir_relaciones(firmas, filas, umbral=UMBRAL_CONTENCION):
+    """
+    firmas: {tabla: {columna: FirmaClave}}; filas: {tabla: número de filas}.
+    Cada columna se compara solo con las claves únicas de las otras tablas, usando sus firmas:
+    el coste depende del número de columnas, no del de filas.
+    """
+    claves = [(tabla, col, firma) for tabla, cols in firmas.items() for col, firma in cols.items() if firma.unica]
+    mejores = []
+    for tabla, cols in firmas.items():
+        for col, firma in cols.items():
+            if firma.distintos < 2:
+                continue
+            candidatas = []
+            for tabla_dim, col_dim, firma_dim in claves:
+                if tabla_dim == tabla or firma.distintos * umbral > firma_dim.distintos:
+                    continue
+                # Dos claves únicas con los mismos valores (1:1): se relaciona la tabla mayor con la menor
+                if firma.unica and filas.get(tabla, 0) <= filas.get(tabla_dim, 0):
+                    continue
+                coincide = nombres_coinciden(col, tabla_dim, col_dim)
+                # Sin pista en el nombre, los enteros pequeños (cantidades, códigos) contienen cualquier clave 1..N
+                if not coincide and (firma.numerica or firma.distintos < MIN_DISTINTOS_SIN_NOMBRE):
+                    continue
+                contencion = firma.contencion_en(firma_dim)
+                if contencion >= umbral:
+                    candidatas.append((coincide, contencion, -abs(firma_dim.distintos - firma.distintos), tabla_dim, col_dim))
+            if candidatas:
+                coincide, contencion, _, tabla_dim, col_dim = max(candidatas)
+                mejores.append({
+                    'desde_tabla': tabla, 'desde_columna': col,
+                    'hacia_tabla': tabla_dim, 'hacia_columna': col_dim,
+                    'contencion': round(contencion, 4), 'por_nombre': coincide,
+                })
+
+    # Power BI admite una sola relación activa entre dos tablas: las demás quedan para USERELATIONSHIP
+    mejores.sort(key=lambda r: (not r['por_nombre'], -r['contencion']))
+    pares_activos = set()
+    for rel in mejores:
+        par = frozenset((rel['desde_tabla'], rel['hacia_tabla']))
+        rel['activa'] = par not in pares_activos
+        pares_activos.add(par)
+    return mejores
+
+
+# FUNCIÓN: Análisis de modelo (varias tablas) con relaciones inferidas
+def analizar_modelo(tablas):
+    """ tablas: {nombre: (analisis, firmas, filas)}. La tabla de hechos (más relaciones salientes) va primero. """
+    firmas = {nombre: datos[1] for nombre, datos in tablas.items()}
+    filas = {nombre: datos[2] for nombre, datos in tablas.items()}
+    relaciones = inferir_relaciones(firmas, filas)
+
+    salientes = {}
+    for rel in relaciones:
+        salientes[rel['desde_tabla']] = salientes.get(rel['desde_tabla'], 0) + 1
+    orden = sorted(tablas, key=lambda t: (salientes.get(t, 0), filas[t]), reverse=True)
+
+    lista = []
+    for nombre in orden:
+        analisis = dict(tablas[nombre][0], nombre_tabla=nombre)
+        lista.append(analisis)
+    fusion = fusionar_analisis(lista)
+
+    # Estadísticas de cada (tabla, columna) bajo su columna del análisis fusionado
+    for clave in ('cardinalidad', 'estadisticas'):
+        fusion[clave] = {}
+        for analisis in lista:
+            for col, valor in analisis.get(clave, {}).items():
+                fusion[clave].setdefault(id_columna(fusion, analisis['nombre_tabla'], col), valor)
+    # Columnas de valores únicos (identificadores) en cualquier tabla
+    fusion['claves'] = sorted({
+        id_columna(fusion, nombre, col) for nombre in orden for col, firma in firmas[nombre].items() if firma.unica
+    })
+
+    fusion['relaciones'] = [texto_relacion(r) for r in relaciones]
+    fusion['relaciones_modelo'] = relaciones
+    fusion['filas_por_tabla'] = {nombre: filas[nombre] for nombre in orden}
+    fusion['origen'] = 'modelo'
+    return fusion
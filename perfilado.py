@@ -0,0 +1,503 @@
+import io
+import math
+import random
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# Tamaño de bloque por defecto: la memoria pico depende de este valor, no del tamaño del archivo
+TAMANO_BLOQUE_DEFECTO = 100_000
+
+# Proporción mínima de valores convertibles para tratar una columna de texto como fecha
+UMBRAL_FECHA = 0.9
+
+# Filas de la muestra estratificada (un tercio cabeza, un tercio cola, un tercio aleatorias)
+TAMANO_MUESTRA_DEFECTO = 3_000
+
+# Valor z para intervalos de confianza al 95%
+Z_95 = 1.96
+
+# Percentiles calculados para las columnas numéricas
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Hasta este número de filas los valores distintos se cuentan exactos; por encima, con HyperLogLog
+UMBRAL_CARDINALIDAD_EXACTA = 1_000_000
+
+# Valores de texto examinados para decidir si una columna de fechas lleva el día o el mes primero
+MUESTRA_ORDEN_FECHA = 1000
+
+# Fechas numéricas con el día o el mes delante: 03/04/2024, 3-4-24, 03.04.2024 (las ISO aaaa-mm-dd no)
+_PATRON_DIA_MES = re.compile(r'^\s*(\d{1,2})[/.-](\d{1,2})[/.-]\d{2,4}(?!\d)')
+
+
+# CLASE: Boceto de cardinalidad (HyperLogLog)
+class BocetoCardinalidad:
+    """ Estimador HyperLogLog de valores distintos con memoria fija (2**precision bytes). """
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registros = np.zeros(self.m, dtype=np.uint8)
+
+    def agregar(self, serie):
+        valores = serie.dropna()
+        if valores.empty:
+            return
+        # El mismo número tiene otro hash como int64 que como float64: un bloque con NaN pasa a float
+        # y contaría sus valores dos veces. Los numéricos se hashean siempre como float64.
+        if pd.api.types.is_numeric_dtype(valores.dtype):
+            valores = valores.astype(np.float64)
+        hashes = pd.util.hash_pandas_object(valores, index=False).to_numpy(dtype=np.uint64)
+        bits_resto = 64 - self.precision
+        indices = (hashes >> np.uint64(bits_resto)).astype(np.int64)
+        resto = hashes & np.uint64((1 << bits_resto) - 1)
+        # Posición del primer bit a 1 dentro de los bits restantes
+        _, exponente = np.frexp(resto.astype(np.float64))
+        rango = np.where(resto == 0, bits_resto + 1, bits_resto - exponente + 1).astype(np.uint8)
+        np.maximum.at(self.registros, indices, rango)
+
+    def fusionar(self, otro):
+        np.maximum(self.registros, otro.registros, out=self.registros)
+
+    def estimar(self):
+        alfa = 0.7213 / (1 + 1.079 / self.m)
+        estimacion = alfa * self.m ** 2 / np.sum(np.power(2.0, -self.registros.astype(np.float64)))
+        vacios = int(np.count_nonzero(self.registros == 0))
+        if estimacion <= 2.5 * self.m and vacios:
+            estimacion = self.m * np.log(self.m / vacios)
+        return int(round(estimacion))
+
+
+# FUNCIÓN: Tipo lógico de una columna a partir de su dtype (NumPy o respaldado por Arrow)
+def categoria_tipo(tipo):
+    if 'datetime' in tipo or 'timestamp' in tipo or 'date32' in tipo or 'date64' in tipo:
+        return 'fechas'
+    # Antes que los numéricos: 'dictionary<values=string, indices=int32>' contiene 'int'
+    if 'object' in tipo or 'category' in tipo or 'string' in tipo or 'dictionary' in tipo:
+        return 'categoricas'
+    if 'int' in tipo or 'float' in tipo or 'double' in tipo or 'decimal' in tipo:
+        return 'numericas'
+    return None
+
+
+# FUNCIÓN: Combinar el dtype observado en dos bloques distintos
+def _combinar_tipos(anterior, nuevo):
+    if anterior is None or anterior == nuevo:
+        return nuevo
+    numericos = ('int', 'float')
+    if any(n in anterior for n in numericos) and any(n in nuevo for n in numericos):
+        return 'float64'
+    return 'object'
+
+
+# FUNCIÓN: ¿Las fechas de texto llevan el día primero (dd/mm/aaaa)?
+def detectar_dia_primero(valores):
+    """
+    Un primer campo mayor que 12 solo puede ser el día y un segundo campo mayor que 12 solo el mes.
+    Si la muestra no lo decide (todo ≤ 12), se asume dd/mm: el orden de los usuarios de la app.
+    """
+    dia = mes = 0
+    for valor in valores:
+        coincidencia = _PATRON_DIA_MES.match(str(valor))
+        if coincidencia:
+            dia += int(coincidencia[1]) > 12
+            mes += int(coincidencia[2]) > 12
+    return dia >= mes
+
+
+# FUNCIÓN: Convertir texto a fechas con un mismo orden día/mes para todos los valores
+def convertir_fechas(valores, dia_primero=None):
+    """
+    Sin `dayfirst`, format='mixed' decide valor a valor: 03/04/2024 sería 4 de marzo y 13/04/2024
+    13 de abril en la misma columna. El orden se detecta con una muestra si no se indica.
+    """
+    valores = pd.Series(valores)
+    if dia_primero is None:
+        dia_primero = detectar_dia_primero(valores.dropna().iloc[:MUESTRA_ORDEN_FECHA])
+    return pd.to_datetime(valores, errors='coerce', format='mixed', dayfirst=dia_primero)
+
+
+# FUNCIÓN: Detectar columnas de texto (object, string de Arrow o category) que contienen fechas
+def es_columna_fecha(serie, umbral=UMBRAL_FECHA):
+    valores = serie.dropna()
+    if valores.empty or not (pd.api.types.is_object_dtype(valores) or pd.api.types.is_string_dtype(valores)):
+        return False
+    muestra = valores.head(1000).astype(str)
+    # Se parsea cada valor distinto una sola vez (las columnas categóricas repiten mucho)
+    unicos = muestra.unique()
+    convertidas = convertir_fechas(unicos)
+    validos = unicos[convertidas.notna().to_numpy()]
+    return muestra.isin(validos).mean() >= umbral
+
+
+# FUNCIÓN: Nombres de columna únicos como los de pandas ('Nombre', 'Nombre.1', ...)
+def _encabezado_unico(encabezado):
+    usados, repeticiones, unico = set(), {}, []
+    for col in encabezado:
+        nuevo = col
+        while nuevo in usados:
+            repeticiones[col] = repeticiones.get(col, 0) + 1
+            nuevo = f'{col}.{repeticiones[col]}'
+        usados.add(nuevo)
+        unico.append(nuevo)
+    return unico
+
+
+# FUNCIÓN: Iterar un .xlsx en bloques con openpyxl en modo solo lectura
+def _iterar_bloques_excel(archivo, tamano_bloque):
+    from openpyxl import load_workbook
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        encabezado = next(filas, None)
+        if encabezado is None:
+            return
+        encabezado = _encabezado_unico([str(c) if c is not None else f'Unnamed: {i}' for i, c in enumerate(encabezado)])
+        bloque = []
+        vacias = 0
+        for fila in filas:
+            if all(v is None for v in fila):
+                # Como pd.read_excel: las filas vacías intermedias se conservan y las del final no
+                vacias += 1
+                continue
+            if vacias:
+                bloque.extend([(None,) * len(fila)] * vacias)
+                vacias = 0
+            bloque.append(fila)
+            if len(bloque) >= tamano_bloque:
+                yield pd.DataFrame(bloque, columns=encabezado).infer_objects()
+                bloque = []
+        if bloque:
+            yield pd.DataFrame(bloque, columns=encabezado).infer_objects()
+    finally:
+        libro.close()
+
+
+# FUNCIÓN: Iterar cualquier archivo de datos soportado en bloques
+def iterar_bloques(archivo, nombre, tamano_bloque=TAMANO_BLOQUE_DEFECTO):
+    """ Devuelve un iterador de DataFrames de como máximo `tamano_bloque` filas. """
+    nombre = nombre.lower()
+    if nombre.endswith('.csv'):
+        return pd.read_csv(archivo, chunksize=tamano_bloque)
+    if nombre.endswith('.xlsx'):
+        return _iterar_bloques_excel(archivo, tamano_bloque)
+    # .xls (xlrd) no admite lectura incremental: se lee completo como un único bloque
+    return iter([pd.read_excel(archivo)])
+
+
+# FUNCIÓN: Perfilado en streaming de archivos grandes
+def perfilar_por_bloques(archivo, nombre, tamano_bloque=TAMANO_BLOQUE_DEFECTO, progreso=None):
+    """ Perfila el archivo bloque a bloque y devuelve un `analisis` con la misma forma que analizar_estructura. """
+    inicio = time.perf_counter()
+    columnas = []
+    tipos = {}
+    nulls = {}
+    bocetos = {}
+    minimos = {}
+    maximos = {}
+    columnas_fecha, dia_primero = set(), {}
+    filas = 0
+
+    for numero, bloque in enumerate(iterar_bloques(archivo, nombre, tamano_bloque)):
+        if numero == 0:
+            columnas = [str(c) for c in bloque.columns]
+            columnas_fecha = {c for c in bloque.columns if es_columna_fecha(bloque[c])}
+            # El orden día/mes se fija con el primer bloque para que todos los bloques se lean igual
+            dia_primero = {c: detectar_dia_primero(bloque[c].dropna().astype(str).iloc[:MUESTRA_ORDEN_FECHA])
+                           for c in columnas_fecha}
+            for col in columnas:
+                nulls[col] = 0
+                bocetos[col] = BocetoCardinalidad()
+
+        for col in bloque.columns:
+            serie = bloque[col]
+            clave = str(col)
+            nulls[clave] += int(serie.isnull().sum())
+            bocetos[clave].agregar(serie)
+
+            if col in columnas_fecha:
+                serie = convertir_fechas(serie, dia_primero[col])
+            if serie.isnull().all():
+                continue
+
+            tipos[clave] = _combinar_tipos(tipos.get(clave), str(serie.dtype))
+            if 'datetime' in str(serie.dtype):
+                minimo, maximo = serie.min(), serie.max()
+                minimos[clave] = minimo if clave not in minimos else min(minimos[clave], minimo)
+                maximos[clave] = maximo if clave not in maximos else max(maximos[clave], maximo)
+
+        filas += len(bloque)
+        if progreso:
+            progreso(filas, time.perf_counter() - inicio)
+
+    segundos = time.perf_counter() - inicio
+    analisis = {
+        'columnas': columnas,
+        'tipos': {},
+        'numericas': [],
+        'categoricas': [],
+        'fechas': [],
+        'nulls': nulls,
+        'cardinalidad': {col: boceto.estimar() for col, boceto in bocetos.items()},
+        'rango_fechas': {col: (str(minimos[col]), str(maximos[col])) for col in minimos},
+        'filas': filas,
+        'rendimiento': {
+            'segundos': segundos,
+            'filas_por_segundo': filas / segundos if segundos > 0 else float(filas),
+        },
+    }
+
+    for col in columnas:
+        # Una columna completamente vacía se reporta como object, igual que pandas
+        tipo = tipos.get(col, 'object')
+        analisis['tipos'][col] = tipo
+        categoria = categoria_tipo(tipo)
+        if categoria:
+            analisis[categoria].append(col)
+
+    return analisis
+
+
+# FUNCIÓN: Distintos, mínimo, máximo, media y percentiles de las columnas numéricas, columna a columna
+def _estadisticas_numericas(df, columnas, percentiles=PERCENTILES):
+    """
+    Cada columna se copia sola a float64 y se ordena en su sitio: la memoria extra es la de una
+    columna, no la de la tabla. Los distintos, extremos y percentiles salen de la copia ordenada.
+    """
+    estadisticas, distintos = {}, {}
+    fracciones = np.asarray(percentiles, dtype=np.float64) / 100
+    for col in columnas:
+        valores = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+        # La máscara devuelve una copia: ordenarla no toca el DataFrame
+        valores = valores[~np.isnan(valores)]
+        valores.sort()
+        n_validos = len(valores)
+        distintos[col] = int(np.count_nonzero(valores[1:] != valores[:-1])) + (n_validos > 0)
+        if not n_validos:
+            continue
+
+        # Percentiles por interpolación lineal (igual que np.percentile)
+        posiciones = fracciones * (n_validos - 1)
+        bajo = np.floor(posiciones).astype(np.int64)
+        alto = np.ceil(posiciones).astype(np.int64)
+        peso = posiciones - bajo
+        cuantiles = valores[bajo] * (1 - peso) + valores[alto] * peso
+        estadisticas[col] = {
+            'minimo': float(valores[0]),
+            'maximo': float(valores[-1]),
+            'media': float(valores.mean()),
+            'percentiles': {p: float(cuantiles[j]) for j, p in enumerate(percentiles)},
+        }
+    return estadisticas, distintos
+
+
+# FUNCIÓN: Perfilado vectorizado de un DataFrame en memoria
+def perfilar_dataframe(df):
+    """ Tipos, nulos, distintos, rangos y percentiles de todas las columnas con operaciones por bloque. """
+    inicio = time.perf_counter()
+    columnas = list(df.columns)
+    tipos = {col: str(tipo) for col, tipo in df.dtypes.items()}
+    categorias = {col: categoria_tipo(tipo) for col, tipo in tipos.items()}
+
+    # Las fechas guardadas como texto se tratan como fechas (necesario para TOTALYTD / PREVIOUSMONTH)
+    fechas_texto = [col for col in columnas if categorias[col] == 'categoricas' and es_columna_fecha(df[col])]
+    for col in fechas_texto:
+        tipos[col] = 'datetime64[ns]'
+        categorias[col] = 'fechas'
+
+    numericas = [col for col in columnas if categorias[col] == 'numericas']
+    estadisticas, distintos_numericas = _estadisticas_numericas(df, numericas)
+
+    # Las numéricas ya traen sus distintos exactos; el resto se cuenta exacto o con HyperLogLog
+    otras = [col for col in columnas if categorias[col] != 'numericas']
+    if len(df) <= UMBRAL_CARDINALIDAD_EXACTA:
+        cardinalidad = {col: int(n) for col, n in df[otras].nunique().items()}
+    else:
+        cardinalidad = {}
+        for col in otras:
+            boceto = BocetoCardinalidad()
+            boceto.agregar(df[col])
+            cardinalidad[col] = boceto.estimar()
+    cardinalidad.update(distintos_numericas)
+
+    rango_fechas = {}
+    nativas = [col for col in columnas if categorias[col] == 'fechas' and col not in fechas_texto]
+    if nativas:
+        minimos, maximos = df[nativas].min(), df[nativas].max()
+        rango_fechas = {col: (str(minimos[col]), str(maximos[col])) for col in nativas if pd.notna(minimos[col])}
+    for col in fechas_texto:
+        serie = convertir_fechas(df[col].dropna().astype(str).unique())
+        if serie.notna().any():
+            rango_fechas[col] = (str(serie.min()), str(serie.max()))
+
+    analisis = {
+        'columnas': columnas,
+        'tipos': tipos,
+        'numericas': numericas,
+        'categoricas': [col for col in columnas if categorias[col] == 'categoricas'],
+        'fechas': [col for col in columnas if categorias[col] == 'fechas'],
+        'nulls': {col: int(n) for col, n in df.isna().sum().items()},
+        'cardinalidad': {col: cardinalidad[col] for col in columnas},
+        'rango_fechas': rango_fechas,
+        'estadisticas': estadisticas,
+        'filas': len(df),
+    }
+    segundos = time.perf_counter() - inicio
+    analisis['rendimiento'] = {
+        'segundos': segundos,
+        'filas_por_segundo': len(df) / segundos if segundos > 0 else float(len(df)),
+    }
+    return analisis
+
+
+# FUNCIÓN: Intervalo de confianza de Wilson para una proporción
+def intervalo_wilson(exitos, total, z=Z_95):
+    if total == 0:
+        return (0.0, 1.0)
+    p = exitos / total
+    denominador = 1 + z ** 2 / total
+    centro = (p + z ** 2 / (2 * total)) / denominador
+    margen = z * math.sqrt(p * (1 - p) / total + z ** 2 / (4 * total ** 2)) / denominador
+    return (max(0.0, centro - margen), min(1.0, centro + margen))
+
+
+# FUNCIÓN: Muestra estratificada de un DataFrame ya cargado
+def muestra_estratificada(df, tamano=TAMANO_MUESTRA_DEFECTO, semilla=0):
+    """ Cabeza, cola y filas aleatorias del medio, sin duplicados y en el orden original. """
+    if len(df) <= tamano:
+        return df
+    tercio = tamano // 3
+    medio = df.iloc[tercio:len(df) - tercio]
+    aleatorias = medio.sample(n=min(len(medio), tamano - 2 * tercio), random_state=semilla)
+    return pd.concat([df.head(tercio), aleatorias.sort_index(), df.tail(tercio)])
+
+
+# FUNCIÓN: Muestra de un CSV por desplazamientos de bytes, sin parsear el archivo completo
+def muestra_csv(archivo, tamano=TAMANO_MUESTRA_DEFECTO, semilla=0):
+    """ Devuelve (muestra, filas_estimadas) leyendo solo las líneas muestreadas. """
+    archivo.seek(0, io.SEEK_END)
+    total_bytes = archivo.tell()
+    archivo.seek(0)
+    encabezado = archivo.readline()
+    inicio_datos = archivo.tell()
+    tercio = tamano // 3
+
+    lineas = []
+    for _ in range(tercio):
+        linea = archivo.readline()
+        if not linea:
+            break
+        lineas.append(linea)
+    fin_cabeza = archivo.tell()
+
+    if fin_cabeza < total_bytes:
+        # Filas aleatorias: se salta la línea parcial tras cada desplazamiento
+        generador = random.Random(semilla)
+        desplazamientos = sorted(generador.randrange(fin_cabeza, total_bytes) for _ in range(tamano - 2 * tercio))
+        vistos = set()
+        for desplazamiento in desplazamientos:
+            archivo.seek(max(desplazamiento - 1, fin_cabeza - 1))
+            archivo.readline()
+            posicion = archivo.tell()
+            linea = archivo.readline()
+            if linea and posicion not in vistos:
+                vistos.add(posicion)
+                lineas.append(linea)
+
+        # Cola: se retrocede lo suficiente para cubrir `tercio` líneas de longitud media
+        longitud_media = max(1, (fin_cabeza - inicio_datos) // max(len(lineas[:tercio]), 1))
+        archivo.seek(max(fin_cabeza, total_bytes - longitud_media * (tercio + 1)))
+        if archivo.tell() > fin_cabeza:
+            archivo.readline()
+        cola = archivo.read().splitlines(keepends=True)[-tercio:]
+        lineas.extend(l if l.endswith(b'\n') else l + b'\n' for l in cola)
+
+    archivo.seek(0)
+    longitud_media = (fin_cabeza - inicio_datos) / max(len(lineas[:tercio]), 1)
+    filas_estimadas = int((total_bytes - inicio_datos) / longitud_media) if longitud_media else 0
+    muestra = pd.read_csv(io.BytesIO(encabezado + b''.join(lineas)), on_bad_lines='skip')
+    return muestra, max(filas_estimadas, len(muestra))
+
+
+# FUNCIÓN: Muestra de cualquier archivo de datos soportado
+def muestrear_archivo(archivo, nombre, tamano=TAMANO_MUESTRA_DEFECTO, semilla=0):
+    """ CSV por desplazamientos de bytes; Excel solo permite leer la cabeza sin recorrer el libro. """
+    if nombre.lower().endswith('.csv'):
+        return muestra_csv(archivo, tamano, semilla)
+    muestra = pd.read_excel(archivo, nrows=tamano)
+    archivo.seek(0)
+    return muestra, len(muestra)
+
+
+# FUNCIÓN: Leer una sola columna del archivo completo (escalado de columnas ambiguas)
+def leer_columna(archivo, nombre, columna):
+    archivo.seek(0)
+    if nombre.lower().endswith('.csv'):
+        serie = pd.read_csv(archivo, usecols=[columna])[columna]
+    else:
+        serie = pd.read_excel(archivo, usecols=[columna])[columna]
+    archivo.seek(0)
+    return serie
+
+
+# FUNCIÓN: Clasificar una columna de la muestra; devuelve (tipo, ambigua)
+def _clasificar_muestra(serie):
+    valores = serie.dropna()
+    if valores.empty:
+        return 'object', True
+    tipo = str(serie.dtype)
+    if not pd.api.types.is_object_dtype(serie):
+        return tipo, False
+    convertidas = convertir_fechas(valores.astype(str))
+    proporcion = convertidas.notna().mean()
+    if proporcion >= UMBRAL_FECHA:
+        return 'datetime64[ns]', False
+    # Entre ambos umbrales la muestra no permite decidir
+    return 'object', proporcion > 1 - UMBRAL_FECHA
+
+
+# FUNCIÓN: Inferencia de tipos por muestreo con intervalos de confianza
+def inferir_tipos_por_muestra(muestra, filas_totales=None, escalar=None):
+    """ Clasifica columnas a partir de una muestra; las ambiguas se resuelven con `escalar(col)` si se indica. """
+    inicio = time.perf_counter()
+    filas_totales = filas_totales or len(muestra)
+    n = len(muestra)
+    analisis = {
+        'columnas': list(muestra.columns),
+        'tipos': {},
+        'numericas': [],
+        'categoricas': [],
+        'fechas': [],
+        'nulls': {},
+        'nulls_ic': {},
+        'filas': filas_totales,
+        'muestra': {'filas': n, 'escaladas': []},
+    }
+
+    for col in muestra.columns:
+        serie = muestra[col]
+        tipo, ambigua = _clasificar_muestra(serie)
+        nulos = int(serie.isnull().sum())
+
+        if ambigua and escalar is not None:
+            completa = escalar(col)
+            nulos_totales = int(completa.isnull().sum())
+            tipo = 'datetime64[ns]' if es_columna_fecha(completa) else str(completa.dtype)
+            analisis['nulls'][col] = nulos_totales
+            analisis['nulls_ic'][col] = (nulos_totales / max(len(completa), 1),) * 2
+            analisis['muestra']['escaladas'].append(col)
+        else:
+            analisis['nulls'][col] = int(round(nulos / max(n, 1) * filas_totales))
+            analisis['nulls_ic'][col] = intervalo_wilson(nulos, n)
+
+        analisis['tipos'][col] = tipo
+        categoria = categoria_tipo(tipo)
+        if categoria:
+            analisis[categoria].append(col)
+
+    analisis['muestra']['segundos'] = time.perf_counter() - inicio
+    return analisis
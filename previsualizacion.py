@@ -0,0 +1,210 @@
+import numpy as np
+import pandas as pd
+
+from perfilado import convertir_fechas
+
+# Vistas previas de las gráficas recomendadas a partir de datos reales: cada agrupación se calcula
+# una sola vez (bloque a bloque en archivos grandes) y al navegador solo llegan agregados reducidos.
+
+# Puntos máximos de una serie temporal tras la reducción (LTTB)
+MAX_PUNTOS_SERIE = 1_500
+
+# Por encima de PREREDUCCION_MIN_MAX × MAX_PUNTOS_SERIE puntos, un min-max vectorizado acota el trabajo de LTTB
+PREREDUCCION_MIN_MAX = 4
+
+# Filas muestreadas para los gráficos de dispersión
+MAX_PUNTOS_DISPERSION = 2_000
+
+# Categorías mostradas en barras y cascada; el resto se agrupa en "Otros"
+MAX_CATEGORIAS = 20
+
+# Tipo de vista previa de cada recomendación de recomendar_graficas
+TIPOS_PREVIA = {
+    'Gráfico de Líneas': 'lineas',
+    'Gráfico de Cascada (Waterfall)': 'cascada',
+    'Gráfico de Barras/Columnas': 'barras',
+    'Gráfico de Dispersión': 'dispersion',
+    'Tarjeta de KPI con Tendencia': 'kpi',
+    'Gráfico de Medidor (Gauge)': 'medidor',
+}
+
+
+# FUNCIÓN: Índices que conservan mínimo y máximo de cada cubo (reducción vectorizada previa a LTTB)
+def reducir_min_max(y, cubos):
+    n = len(y)
+    tamano = n // cubos
+    if tamano < 2:
+        return np.arange(n)
+    bloques = y[:tamano * cubos].reshape(cubos, tamano)
+    desplazamientos = np.arange(cubos) * tamano
+    indices = [np.array([0, n - 1]), desplazamientos + bloques.argmin(axis=1), desplazamientos + bloques.argmax(axis=1)]
+    if n > tamano * cubos:
+        cola = y[tamano * cubos:]
+        indices.append(tamano * cubos + np.array([cola.argmin(), cola.argmax()]))
+    return np.unique(np.concatenate(indices))
+
+
+# FUNCIÓN: Largest-Triangle-Three-Buckets: `puntos` índices que conservan la forma visual de la serie
+def lttb(x, y, puntos):
+    n = len(x)
+    if puntos >= n or puntos < 3:
+        return np.arange(n)
+    indices = np.empty(puntos, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    # Cubos de los puntos intermedios; el del último punto es el propio último punto
+    limites = np.linspace(1, n - 1, puntos - 1).astype(np.int64)
+    anterior = 0
+    for i in range(puntos - 2):
+        inicio, fin = limites[i], limites[i + 1]
+        siguiente_fin = limites[i + 2] if i + 2 < len(limites) else n
+        media_x, media_y = x[fin:siguiente_fin].mean(), y[fin:siguiente_fin].mean()
+        # Área del triángulo (punto elegido antes, candidato, media del cubo siguiente)
+        areas = np.abs(
+            (x[anterior] - media_x) * (y[inicio:fin] - y[anterior])
+            - (x[anterior] - x[inicio:fin]) * (media_y - y[anterior])
+        )
+        anterior = inicio + int(areas.argmax())
+        indices[i + 1] = anterior
+    return indices
+
+
+# FUNCIÓN: Reducir una serie (x creciente) a como mucho `puntos` puntos
+def reducir_serie(x, y, puntos=MAX_PUNTOS_SERIE):
+    """ Devuelve los índices conservados; x e y son arrays float64. """
+    indices = np.arange(len(x))
+    if len(x) > PREREDUCCION_MIN_MAX * puntos:
+        indices = reducir_min_max(y, 2 * puntos)
+    return indices[lttb(x[indices], y[indices], puntos)]
+
+
+# FUNCIÓN: Serie agregada por valor bruto → serie por fecha ordenada (cada valor distinto se parsea una vez)
+def _serie_por_fecha(parcial):
+    indice = parcial.index
+    if not pd.api.types.is_datetime64_any_dtype(indice):
+        indice = convertir_fechas(indice.astype(str))
+    serie = pd.Series(parcial.to_numpy(dtype='float64'), index=pd.DatetimeIndex(indice))
+    serie = serie[serie.index.notna()]
+    return serie.groupby(level=0).sum().sort_index()
+
+
+# FUNCIÓN: Top de categorías por valor con el resto agrupado en "Otros"
+def _top_categorias(parcial, columna, valor):
+    serie = pd.Series(parcial.to_numpy(dtype='float64'), index=parcial.index.astype(str))
+    serie = serie.groupby(level=0).sum().sort_values(ascending=False)
+    if len(serie) > MAX_CATEGORIAS:
+        resto = serie.iloc[MAX_CATEGORIAS - 1:].sum()
+        serie = pd.concat([serie.iloc[:MAX_CATEGORIAS - 1], pd.Series({'Otros': resto})])
+    return pd.DataFrame({columna: serie.index, valor: serie.to_numpy()})
+
+
+# FUNCIÓN: Filas con las MAX_PUNTOS_DISPERSION claves aleatorias más bajas
+def _recortar_muestra(datos, azar):
+    if len(datos) <= MAX_PUNTOS_DISPERSION:
+        return datos, azar
+    elegidas = np.argpartition(azar, MAX_PUNTOS_DISPERSION)[:MAX_PUNTOS_DISPERSION]
+    return datos.iloc[elegidas], azar[elegidas]
+
+
+# FUNCIÓN: Agrupación que necesita cada recomendación (las que coinciden se calculan una sola vez)
+def clave_agregado(grafica, fechas):
+    tipo = TIPOS_PREVIA.get(grafica['tipo'])
+    columnas = grafica['columnas']
+    if tipo == 'lineas':
+        return ('serie', columnas[0], columnas[1])
+    if tipo in ('cascada', 'barras'):
+        return ('categorias', columnas[0], columnas[1])
+    if tipo == 'dispersion':
+        return ('dispersion', columnas[0], columnas[1])
+    if tipo in ('kpi', 'medidor'):
+        # La tendencia y la meta se calculan por mes sobre la misma serie que el gráfico de líneas
+        return ('serie', fechas[0], columnas[0]) if fechas else ('total', columnas[0])
+    return None
+
+
+# CLASE: Agregados de las vistas previas acumulados bloque a bloque
+class AgregadorGraficas:
+    """ agregar(df) con cada bloque (o el DataFrame completo) y resultado() al final. """
+
+    def __init__(self, graficas, fechas=(), semilla=0):
+        self.graficas = graficas
+        self.claves = [clave_agregado(g, list(fechas)) for g in graficas]
+        self.filas = 0
+        self._parciales = {}
+        self._rng = np.random.default_rng(semilla)
+
+    def columnas(self):
+        """ {columna: 'numerica' | 'clave'}: lo único que hay que leer del archivo. """
+        roles = {}
+        for clave in filter(None, set(self.claves)):
+            if clave[0] == 'dispersion':
+                roles.update({clave[1]: 'numerica', clave[2]: 'numerica'})
+            elif clave[0] == 'total':
+                roles[clave[1]] = 'numerica'
+            else:
+                roles.setdefault(clave[1], 'clave')
+                roles[clave[2]] = 'numerica'
+        return roles
+
+    def agregar(self, df):
+        self.filas += len(df)
+        for clave in filter(None, set(self.claves)):
+            if clave[0] in ('serie', 'categorias'):
+                parcial = df.groupby(df[clave[1]], observed=True, sort=False)[clave[2]].sum()
+                previo = self._parciales.get(clave)
+                self._parciales[clave] = parcial if previo is None else previo.add(parcial, fill_value=0)
+            elif clave[0] == 'total':
+                suma, conteo = self._parciales.get(clave, (0.0, 0))
+                serie = df[clave[1]]
+                self._parciales[clave] = (suma + float(serie.sum()), conteo + int(serie.count()))
+            else:
+                self._muestrear(clave, df[[clave[1], clave[2]]].dropna())
+
+    def _muestrear(self, clave, datos):
+        # Muestra uniforme en streaming: se conservan las filas con las claves aleatorias más bajas.
+        # El bloque se recorta antes de unirlo a la muestra previa para no copiarlo entero.
+        previo_azar, previos, vistas = self._parciales.get(clave, (np.empty(0), datos.iloc[:0], 0))
+        recortados, azar = _recortar_muestra(datos, self._rng.random(len(datos)))
+        muestra, azar = _recortar_muestra(pd.concat([previos, recortados]), np.concatenate([previo_azar, azar]))
+        self._parciales[clave] = (azar, muestra, vistas + len(datos))
+
+    def resultado(self):
+        """ Una vista previa por recomendación (None si no tiene datos); todo listo para pintar. """
+        finales = {}
+        for clave in filter(None, set(self.claves)):
+            parcial = self._parciales.get(clave)
+            if parcial is None:
+                continue
+            if clave[0] == 'serie':
+                finales[clave] = _serie_por_fecha(parcial)
+            elif clave[0] == 'categorias':
+                finales[clave] = _top_categorias(parcial, clave[1], clave[2])
+            else:
+                finales[clave] = parcial
+        return {'filas': self.filas, 'graficas': [self._previa(g, c, finales.get(c)) for g, c in zip(self.graficas, self.claves)]}
+
+    def _previa(self, grafica, clave, agregado):
+        if agregado is None or (hasattr(agregado, 'empty') and agregado.empty):
+            return None
+        tipo = TIPOS_PREVIA[grafica['tipo']]
+        if tipo == 'lineas':
+            x = agregado.index.to_numpy(dtype='datetime64[ns]').astype('int64').astype('float64')
+            indices = reducir_serie(x, agregado.to_numpy())
+            datos = pd.DataFrame({clave[1]: agregado.index[indices], clave[2]: agregado.to_numpy()[indices]})
+            return {'tipo': tipo, 'x': clave[1], 'y': clave[2], 'datos': datos, 'puntos_originales': len(agregado)}
+        if tipo in ('cascada', 'barras'):
+            return {'tipo': tipo, 'x': clave[1], 'y': clave[2], 'datos': agregado}
+        if tipo == 'dispersion':
+            _, datos, vistas = agregado
+            datos = pd.DataFrame({c: datos[c].to_numpy(dtype='float64') for c in clave[1:]})
+            return {'tipo': tipo, 'x': clave[1], 'y': clave[2], 'datos': datos, 'filas': vistas}
+        if clave[0] == 'total':
+            return {'tipo': tipo, 'valor': agregado[0], 'filas': agregado[1]}
+        # KPI y medidor con fecha: último mes frente al anterior y frente al mejor mes
+        meses = agregado.resample('MS').sum()
+        previa = {
+            'tipo': tipo, 'valor': float(meses.iloc[-1]), 'periodo': meses.index[-1].strftime('%Y-%m'),
+            'anterior': float(meses.iloc[-2]) if len(meses) > 1 else None, 'maximo': float(meses.max()),
+        }
+        if tipo == 'kpi':
+            previa['datos'] = pd.DataFrame({'Mes': meses.index[-24:], grafica['columnas'][0]: meses.to_numpy()[-24:]})
+        return previa
@@ -0,0 +1,419 @@
+import re
+import unicodedata
+from collections import Counter, namedtuple
+
+from medidas_dax import tabla_dax
+
+
+# Funciones que recorren una tabla fila a fila (contexto de fila)
+ITERADORES = frozenset({
+    'SUMX', 'AVERAGEX', 'MINX', 'MAXX', 'COUNTX', 'COUNTAX', 'PRODUCTX', 'CONCATENATEX',
+    'RANKX', 'FILTER', 'ADDCOLUMNS', 'GENERATE', 'GENERATEALL', 'SELECTCOLUMNS',
+})
+
+# Agregaciones simples que suelen tener ya una medida equivalente
+AGREGACIONES = frozenset({'SUM', 'AVERAGE', 'MIN', 'MAX', 'COUNT', 'COUNTA', 'DISTINCTCOUNT', 'COUNTROWS'})
+
+# Palabras reservadas que se escriben como identificadores pero no son tablas
+PALABRAS_CLAVE = frozenset({'VAR', 'RETURN', 'TRUE', 'FALSE', 'IN', 'NOT', 'AND', 'OR', 'ASC', 'DESC', 'BLANK'})
+
+# Argumentos de intervalo de DATESINPERIOD, DATEADD, etc.
+INTERVALOS = frozenset({'DAY', 'MONTH', 'QUARTER', 'YEAR'})
+
+# Funciones escalares que no cambian el contexto de filtro: una VAR declarada fuera vale lo mismo dentro
+FUNCIONES_SIN_CONTEXTO = frozenset({
+    'DIVIDE', 'IF', 'IFERROR', 'SWITCH', 'COALESCE', 'ISBLANK', 'ABS', 'ROUND', 'ROUNDUP', 'ROUNDDOWN',
+    'INT', 'SQRT', 'POWER', 'AND', 'OR', 'NOT', 'FORMAT',
+})
+
+# Severidades en orden de gravedad
+SEVERIDADES = ('error', 'aviso')
+
+# Descripción de cada regla para el resumen de la interfaz
+REGLAS = {
+    'referencia_sin_resolver': "Referencia a una medida o columna que no existe",
+    'tabla_sin_comillas': "Nombre de tabla con espacios o símbolos sin comillas simples",
+    'filtro_tabla_completa': "FILTER sobre una tabla completa como filtro de CALCULATE",
+    'iteradores_anidados': "Iterador dentro de otro iterador",
+    'topn_sin_medida': "TOPN ordenado por una agregación en lugar de una medida",
+    'agregacion_repetida': "Agregación repetida en lugar de la medida que ya la calcula",
+    'var_no_reutilizada': "Subexpresión repetida sin VAR",
+}
+
+_PATRON_TOKENS = re.compile(r"""
+    (?P<comentario>//[^\n]*|--[^\n]*|/\*.*?\*/)
+  | (?P<texto>"(?:[^"]|"")*")
+  | (?P<referencia>(?:'(?:[^']|'')+'|[^\W\d]\w*)?\[(?:[^\]]|\]\])*\])
+  | (?P<tabla>'(?:[^']|'')+')
+  | (?P<numero>\d+(?:\.\d+)?)
+  | (?P<identificador>[^\W\d]\w*)
+  | (?P<abre>\()
+  | (?P<cierra>\))
+  | (?P<coma>,)
+  | (?P<espacio>\s+)
+  | (?P<operador><>|<=|>=|&&|\|\||==|.)
+""", re.VERBOSE | re.DOTALL)
+
+_PATRON_AGREGACION_SIMPLE = re.compile(r'^\s*(?:' + '|'.join(sorted(AGREGACIONES)) + r')\s*\([^()]*\)\s*$', re.IGNORECASE)
+
+Token = namedtuple('Token', 'tipo texto inicio fin')
+Llamada = namedtuple('Llamada', 'nombre argumentos inicio fin')
+Argumento = namedtuple('Argumento', 'nodos inicio fin')
+Grupo = namedtuple('Grupo', 'nodos inicio fin')
+
+
+# FUNCIÓN: Dividir una expresión DAX en tokens (sin espacios ni comentarios)
+def tokenizar(expresion):
+    return [
+        Token(m.lastgroup, m.group(), m.start(), m.end())
+        for m in _PATRON_TOKENS.finditer(expresion)
+        if m.lastgroup not in ('espacio', 'comentario')
+    ]
+
+
+# FUNCIÓN: Árbol de llamadas a partir de los tokens
+def _analizar(tokens, i, texto, cierre):
+    """ Devuelve (nodos, posición); con `cierre` se detiene en el paréntesis que cierra el nivel. """
+    nodos = []
+    while i < len(tokens):
+        token = tokens[i]
+        if token.tipo == 'cierra':
+            if cierre:
+                return nodos, i
+            i += 1
+            continue
+        if token.tipo == 'identificador' and i + 1 < len(tokens) and tokens[i + 1].tipo == 'abre':
+            argumentos, i = _argumentos(tokens, i + 2, texto)
+            fin = tokens[i].fin if i < len(tokens) else len(texto)
+            nodos.append(Llamada(token.texto.upper(), argumentos, token.inicio, fin))
+        elif token.tipo == 'abre':
+            internos, i = _analizar(tokens, i + 1, texto, True)
+            fin = tokens[i].fin if i < len(tokens) else len(texto)
+            nodos.append(Grupo(internos, token.inicio, fin))
+        elif token.tipo == 'coma' and cierre:
+            return nodos, i
+        else:
+            nodos.append(token)
+        i += 1
+    return nodos, i
+
+
+def _argumentos(tokens, i, texto):
+    argumentos = []
+    while i < len(tokens):
+        inicio = tokens[i].inicio
+        nodos, i = _analizar(tokens, i, texto, True)
+        fin = tokens[i - 1].fin if nodos else inicio
+        # Una llamada sin argumentos (TODAY()) no tiene ningún argumento vacío
+        if nodos or argumentos or (i < len(tokens) and tokens[i].tipo == 'coma'):
+            argumentos.append(Argumento(nodos, inicio, fin))
+        if i >= len(tokens) or tokens[i].tipo == 'cierra':
+            break
+        i += 1
+    return argumentos, i
+
+
+# FUNCIÓN: Separar "Nombre = expresión" (formato de las medidas generadas)
+def separar_medida(dax):
+    nombre, separador, expresion = dax.partition(' = ')
+    if not separador:
+        return None, dax
+    return nombre.strip(), expresion
+
+
+# FUNCIÓN: Partes (tabla, columna) de un token de referencia
+def partes_referencia(texto):
+    corchete = texto.index('[')
+    tabla = texto[:corchete]
+    if tabla.startswith("'"):
+        tabla = tabla[1:-1].replace("''", "'")
+    return tabla or None, texto[corchete + 1:-1].replace(']]', ']')
+
+
+# FUNCIÓN: Nombre de variable DAX derivado de una medida ("Ventas Mes Anterior" -> "__Ventas_Mes_Anterior")
+def nombre_variable(texto, usados):
+    base = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode()
+    base = '__' + (re.sub(r'\W+', '_', base).strip('_')[:40] or 'valor')
+    nombre, n = base, 2
+    while nombre in usados:
+        nombre, n = f'{base}_{n}', n + 1
+    usados.add(nombre)
+    return nombre
+
+
+# FUNCIÓN: Recorrer el árbol con la pila de llamadas que contienen a cada nodo
+def _recorrer(nodos, ancestros=()):
+    for nodo in nodos:
+        yield nodo, ancestros
+        if isinstance(nodo, Llamada):
+            dentro = ancestros + (nodo,)
+            for argumento in nodo.argumentos:
+                yield from _recorrer(argumento.nodos, dentro)
+        elif isinstance(nodo, Grupo):
+            yield from _recorrer(nodo.nodos, ancestros)
+
+
+# FUNCIÓN: Aplicar reemplazos (inicio, fin, texto) sobre una expresión
+def _reemplazar(expresion, reemplazos):
+    for inicio, fin, nuevo in sorted(reemplazos, reverse=True):
+        expresion = expresion[:inicio] + nuevo + expresion[fin:]
+    return expresion
+
+
+def _normalizar(texto):
+    return re.sub(r'\s+', '', texto).upper()
+
+
+# CLASE: Revisor de medidas DAX sin conexión
+class RevisorDax:
+    """
+    Conoce los nombres de todas las medidas generadas y las columnas del análisis para
+    resolver referencias, y detecta patrones lentos con una reescritura equivalente.
+    """
+
+    def __init__(self, medidas, analisis, nombre_tabla):
+        self.medidas = set()
+        # Expresión normalizada de cada medida simple ("SUM(T[c])") -> nombre de la medida
+        self.agregaciones = {}
+        for medida in medidas:
+            nombre, expresion = separar_medida(medida['dax'])
+            if nombre is None:
+                continue
+            self.medidas.add(nombre)
+            if _PATRON_AGREGACION_SIMPLE.match(expresion):
+                self.agregaciones.setdefault(_normalizar(expresion), nombre)
+
+        tablas = analisis.get('tablas') or {}
+        if tablas:
+            # La primera tabla se publica con el nombre elegido por el usuario
+            self.tablas = {(nombre_tabla if i == 0 else t): set(cols) for i, (t, cols) in enumerate(tablas.items())}
+        else:
+            self.tablas = {nombre_tabla: set(analisis.get('columnas', []))}
+        self.columnas = set().union(*self.tablas.values()) if self.tablas else set()
+        self.tablas_con_espacios = sorted((t for t in self.tablas if tabla_dax(t) != t), key=len, reverse=True)
+
+    # --- Reglas: cada una añade hallazgos y, si puede, reemplazos sobre la expresión ---
+
+    def _referencias(self, arbol, variables, hallazgos):
+        for nodo, ancestros in _recorrer(arbol):
+            if not isinstance(nodo, Token):
+                continue
+            if nodo.tipo == 'referencia':
+                tabla, columna = partes_referencia(nodo.texto)
+                if tabla is None:
+                    if columna in self.medidas:
+                        continue
+                    if columna in self.columnas and any(a.nombre in ITERADORES for a in ancestros):
+                        continue
+                    hallazgos.append(self._hallazgo(
+                        'referencia_sin_resolver', 'error',
+                        f"[{columna}] no es ninguna medida generada" + (" (es una columna: califíquela con su tabla)" if columna in self.columnas else "")
+                    ))
+                elif tabla in self.tablas and columna not in self.tablas[tabla]:
+                    hallazgos.append(self._hallazgo('referencia_sin_resolver', 'error', f"La tabla {tabla} no tiene la columna [{columna}]"))
+            elif nodo.tipo in ('identificador', 'tabla'):
+                nombre = partes_referencia(nodo.texto + '[]')[0] if nodo.tipo == 'tabla' else nodo.texto
+                if nombre.upper() in PALABRAS_CLAVE or nombre.upper() in INTERVALOS or nombre in variables or nombre in self.tablas:
+                    continue
+                hallazgos.append(self._hallazgo('referencia_sin_resolver', 'error', f"{nombre} no es ninguna tabla ni variable conocida"))
+
+    def _tablas_sin_comillas(self, expresion, hallazgos):
+        reemplazos = []
+        for tabla in self.tablas_con_espacios:
+            patron = re.compile(r"(?<!['\w])" + re.escape(tabla) + r"(?=\s*[\[\),])")
+            ocupados = [(a, b) for a, b, _ in reemplazos]
+            coincidencias = [m for m in patron.finditer(expresion) if not any(a <= m.start() < b for a, b in ocupados)]
+            if coincidencias:
+                hallazgos.append(self._hallazgo(
+                    'tabla_sin_comillas', 'error', f"La tabla {tabla} debe escribirse {tabla_dax(tabla)}"
+                ))
+                reemplazos.extend((m.start(), m.end(), tabla_dax(tabla)) for m in coincidencias)
+        return reemplazos
+
+    def _es_tabla(self, argumento):
+        """ ¿El argumento es una tabla completa (Tabla o ALL(Tabla))? """
+        if len(argumento.nodos) != 1:
+            return False
+        nodo = argumento.nodos[0]
+        if isinstance(nodo, Token):
+            return nodo.tipo == 'tabla' or (nodo.tipo == 'identificador' and nodo.texto.upper() not in PALABRAS_CLAVE)
+        if isinstance(nodo, Llamada) and nodo.nombre in ('ALL', 'ALLNOBLANKROW') and len(nodo.argumentos) == 1:
+            return self._es_tabla(nodo.argumentos[0])
+        return False
+
+    def _filtros(self, arbol, expresion, hallazgos):
+        reemplazos = []
+        for nodo, ancestros in _recorrer(arbol):
+            if not isinstance(nodo, Llamada):
+                continue
+            if nodo.nombre == 'FILTER' and len(nodo.argumentos) == 2 and self._es_tabla(nodo.argumentos[0]):
+                padre = ancestros[-1] if ancestros else None
+                # Solo como argumento de filtro de CALCULATE se puede cambiar por un predicado de columnas
+                como_filtro = padre is not None and padre.nombre in ('CALCULATE', 'CALCULATETABLE') and any(
+                    a.inicio == nodo.inicio for a in padre.argumentos[1:]
+                )
+                predicado = nodo.argumentos[1]
+                tablas_predicado = {
+                    partes_referencia(t.texto)[0] for t, _ in _recorrer(predicado.nodos)
+                    if isinstance(t, Token) and t.tipo == 'referencia'
+                }
+                sin_medidas = None not in tablas_predicado and len(tablas_predicado) == 1
+                reescribible = como_filtro and sin_medidas
+                hallazgos.append(self._hallazgo(
+                    'filtro_tabla_completa', 'aviso',
+                    "FILTER recorre todas las filas de la tabla; un predicado sobre columnas filtra solo sus valores distintos"
+                    if reescribible else
+                    "FILTER recorre todas las filas de la tabla; filtre solo las columnas necesarias (VALUES/ALL de la columna)"
+                ))
+                if reescribible:
+                    reemplazos.append((nodo.inicio, nodo.fin, f'KEEPFILTERS({expresion[predicado.inicio:predicado.fin]})'))
+        return reemplazos
+
+    def _iteradores(self, arbol, hallazgos):
+        for nodo, ancestros in _recorrer(arbol):
+            if isinstance(nodo, Llamada) and nodo.nombre in ITERADORES:
+                externos = [a.nombre for a in ancestros if a.nombre in ITERADORES]
+                if externos:
+                    hallazgos.append(self._hallazgo(
+                        'iteradores_anidados', 'aviso',
+                        f"{nodo.nombre} dentro de {externos[-1]}: el coste crece con el producto de ambas tablas; "
+                        "precalcule con una medida o SUMMARIZE sobre las columnas necesarias"
+                    ))
+
+    def _agregaciones(self, arbol, expresion, nombre, hallazgos):
+        reemplazos = []
+        for nodo, ancestros in _recorrer(arbol):
+            if not isinstance(nodo, Llamada) or nodo.nombre not in AGREGACIONES:
+                continue
+            medida = self.agregaciones.get(_normalizar(expresion[nodo.inicio:nodo.fin]))
+            if medida is None or medida == nombre:
+                continue
+            topn = ancestros and ancestros[-1].nombre == 'TOPN'
+            # En contexto de fila la medida añade transición de contexto: el resultado cambiaría
+            if not topn and any(a.nombre in ITERADORES for a in ancestros):
+                continue
+            if topn:
+                hallazgos.append(self._hallazgo(
+                    'topn_sin_medida', 'aviso',
+                    "TOPN evalúa la agregación en contexto de fila sin transición de contexto: "
+                    f"todas las filas empatan; ordene por [{medida}]"
+                ))
+            else:
+                hallazgos.append(self._hallazgo(
+                    'agregacion_repetida', 'aviso', f"{expresion[nodo.inicio:nodo.fin]} repite la medida [{medida}]"
+                ))
+            reemplazos.append((nodo.inicio, nodo.fin, f'[{medida}]'))
+        return reemplazos
+
+    def _variables(self, arbol, expresion, tokens, hallazgos):
+        """
+        Subexpresiones (medidas o llamadas) que aparecen más de una vez se calculan una sola vez con VAR.
+        Solo cuentan las apariciones fuera de CALCULATE, iteradores y demás funciones que cambian el
+        contexto: ahí la VAR (evaluada una vez fuera) no valdría lo mismo.
+        """
+        if any(t.tipo == 'identificador' and t.texto.upper() == 'VAR' for t in tokens):
+            return None
+        candidatos = []
+        for nodo, ancestros in _recorrer(arbol):
+            if any(a.nombre not in FUNCIONES_SIN_CONTEXTO for a in ancestros):
+                continue
+            if isinstance(nodo, Llamada) and nodo.nombre not in ('BLANK', 'TODAY', 'NOW'):
+                candidatos.append((nodo.inicio, nodo.fin))
+            elif isinstance(nodo, Token) and nodo.tipo == 'referencia' and partes_referencia(nodo.texto)[0] is None:
+                candidatos.append((nodo.inicio, nodo.fin))
+        repeticiones = Counter(_normalizar(expresion[a:b]) for a, b in candidatos)
+        repetidas = {texto for texto, n in repeticiones.items() if n > 1}
+        if not repetidas:
+            return None
+
+        # Las apariciones más externas: lo que está dentro de otra repetida ya queda en su VAR
+        elegidas = []
+        for inicio, fin in sorted(candidatos, key=lambda c: (c[0], -c[1])):
+            if _normalizar(expresion[inicio:fin]) in repetidas and not any(a <= inicio and fin <= b for a, b in elegidas):
+                elegidas.append((inicio, fin))
+        usados, nombres, reemplazos = set(), {}, []
+        for inicio, fin in elegidas:
+            texto = expresion[inicio:fin]
+            clave = _normalizar(texto)
+            if clave not in nombres:
+                nombres[clave] = (nombre_variable(texto.strip('[]'), usados), texto)
+            reemplazos.append((inicio, fin, nombres[clave][0]))
+        if len(reemplazos) == len(nombres):
+            return None
+
+        for variable, texto in nombres.values():
+            hallazgos.append(self._hallazgo(
+                'var_no_reutilizada', 'aviso', f"{texto} se calcula {repeticiones[_normalizar(texto)]} veces; guárdelo en una VAR"
+            ))
+        cuerpo = _reemplazar(expresion, reemplazos).strip()
+        declaraciones = "".join(f"    VAR {variable} = {texto}\n" for variable, texto in nombres.values())
+        return f"\n{declaraciones}    RETURN\n        {cuerpo}"
+
+    @staticmethod
+    def _hallazgo(regla, severidad, mensaje):
+        return {'regla': regla, 'severidad': severidad, 'mensaje': mensaje}
+
+    # --- API ---
+
+    def revisar_expresion(self, expresion, nombre=None):
+        """ Devuelve (hallazgos, expresión optimizada o None si no hay nada que reescribir). """
+        hallazgos = []
+        # Primero las comillas: sin ellas "Mi Tabla[Col]" se leería como dos tokens sin sentido
+        reemplazos = self._tablas_sin_comillas(expresion, hallazgos)
+        optimizada = _reemplazar(expresion, reemplazos) if reemplazos else expresion
+
+        tokens = tokenizar(optimizada)
+        arbol, _ = _analizar(tokens, 0, optimizada, False)
+        variables = {
+            tokens[i + 1].texto for i, t in enumerate(tokens[:-1])
+            if t.tipo == 'identificador' and t.texto.upper() == 'VAR'
+        }
+        self._referencias(arbol, variables, hallazgos)
+        self._iteradores(arbol, hallazgos)
+
+        # Las reescrituras se encadenan: cada paso vuelve a analizar la expresión anterior
+        reemplazos = self._agregaciones(arbol, optimizada, nombre, hallazgos)
+        if reemplazos:
+            optimizada = _reemplazar(optimizada, reemplazos)
+            arbol = _analizar(tokenizar(optimizada), 0, optimizada, False)[0]
+        reemplazos = self._filtros(arbol, optimizada, hallazgos)
+        if reemplazos:
+            optimizada = _reemplazar(optimizada, reemplazos)
+        tokens = tokenizar(optimizada)
+        con_variables = self._variables(_analizar(tokens, 0, optimizada, False)[0], optimizada, tokens, hallazgos)
+        if con_variables is not None:
+            optimizada = con_variables
+
+        # Una misma referencia rota repetida se informa una vez
+        hallazgos = list({(h['regla'], h['mensaje']): h for h in hallazgos}.values())
+        hallazgos.sort(key=lambda h: SEVERIDADES.index(h['severidad']))
+        return hallazgos, (optimizada if optimizada != expresion else None)
+
+    def revisar(self, medida):
+        """ Revisa una medida {'dax': 'Nombre = expresión', ...} o una sugerencia {'nombre', 'dax_base'}. """
+        if 'dax' in medida:
+            nombre, expresion = separar_medida(medida['dax'])
+        else:
+            nombre, expresion = medida.get('nombre'), medida['dax_base']
+        hallazgos, optimizada = self.revisar_expresion(expresion, nombre)
+        return {
+            'nombre': nombre,
+            'hallazgos': hallazgos,
+            'optimizada': f'{nombre} = {optimizada}' if optimizada is not None and 'dax' in medida else optimizada,
+        }
+
+    def revisar_todas(self, medidas):
+        """ Generador: solo devuelve las medidas con algún hallazgo. """
+        for medida in medidas:
+            revision = self.revisar(medida)
+            if revision['hallazgos']:
+                yield revision
+
+
+# FUNCIÓN: Resumen de hallazgos por regla
+def resumir_revisiones(revisiones):
+    resumen = Counter()
+    for revision in revisiones:
+        for hallazgo in revision['hallazgos']:
+            resumen[hallazgo['regla']] += 1
+    return resumen
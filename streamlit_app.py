@@ -1,20 +1,75 @@
 import streamlit as st
 import pandas as pd
+import io
 import json
 import base64
-from io import BytesIO
-from PIL import Image
+import copy
+import hashlib
 import os
-import tempfile
-from google import genai
-from google.genai.errors import APIError
-from langchain_core.messages import SystemMessage, HumanMessage
+import threading
+import time
+from perfilado import (
+    perfilar_por_bloques, TAMANO_BLOQUE_DEFECTO,
+    muestrear_archivo, inferir_tipos_por_muestra, leer_columna
+)
+from ingesta import leer_datos, leer_encabezado
+from analizador import (
+    crear_cliente_gemini, crear_cache_gemini, crear_indice_columnas, analizar_estructura, analizar_imagen_con_gemini,
+    analizar_texto_con_gemini, convertir_analisis_imagen, analizar_archivo, sugerir_kpi_okr,
+    recomendar_graficas, previsualizar_graficas, MODELO_GEMINI, UMBRAL_STREAMING_BYTES
+)
+from lotes import ejecutar_en_lote, fusionar_analisis, CONCURRENCIA_DEFECTO, TIMEOUT_DEFECTO_SEGUNDOS
+from metadatos import parsear_metadatos, parsear_texto_metadatos, parsear_json_incremental
+from json_incremental import decodificar_texto, lector_texto
+from vpax import leer_vpax
+from modelo import firmas_tabla, analizar_modelo
+from medidas_dax import generar_medidas_dax
+from exportacion import exportar_modelo, FORMATOS_EXPORTACION
+from revision_dax import RevisorDax, REGLAS, resumir_revisiones
+from incremental import huellas_analisis, comparar_huellas, resumir_diferencias
+from instrumentacion import (
+    iniciar_traza, etapa, medir, anotar, abrir_etapa, cerrar_etapa, resumir_etapas,
+    exportador_por_defecto, MEDIR_MEMORIA_DEFECTO
+)
+from tokens import contar_tokens, estimar_coste, dividir_por_tablas, PRESUPUESTO_TOKENS_DEFECTO
+
+# Archivos de datos (y sus análisis) que se conservan en caché entre reruns
+MAX_ARCHIVOS_EN_CACHE = 4
+
+# JSON por encima de este tamaño se intentan parsear en streaming antes de cargarlos completos
+UMBRAL_JSON_INCREMENTAL_BYTES = 20 * 1024 * 1024
+
+# Altura (px) de las vistas previas de las gráficas recomendadas
+ALTO_PREVIA = 220
+
+# Medidas DAX mostradas por página
+TAMANO_PAGINA_MEDIDAS = 50
+
+# Etapas instrumentadas que se conservan por sesión para el panel de rendimiento
+MAX_ETAPAS_HISTORIAL = 300
 
 # --- Configuración Inicial ---
 st.set_page_config(page_title="Analizador DAX y KPI con Visión para Power BI", layout="wide")
 st.title("👁️ Analizador DAX y Gráficas Power BI (Visión Ampliada)")
 st.markdown("Sube la estructura de tus datos o capturas de pantalla para obtener medidas DAX, KPI y recomendaciones.")
 
+
+# Un exportador por proceso (escrituras serializadas entre sesiones); None sin DAX_TRAZAS_RUTA
+@st.cache_resource(show_spinner=False)
+def obtener_exportador_trazas():
+    return exportador_por_defecto()
+
+
+# Cada rerun es una traza; las etapas terminadas se acumulan en la sesión aunque haya st.rerun()
+if 'etapas' not in st.session_state:
+    st.session_state['etapas'] = []
+traza = iniciar_traza(
+    destino=st.session_state['etapas'],
+    exportador=obtener_exportador_trazas(),
+    medir_memoria=st.session_state.get('medir_memoria', MEDIR_MEMORIA_DEFECTO),
+    max_destino=MAX_ETAPAS_HISTORIAL,
+)
+
 # ----------------------------------------------------
 # PASO 0: Configuración de la API de Gemini (Seguridad)
 # ----------------------------------------------------
@@ -32,131 +87,178 @@ if not api_key:
         st.stop()
 
 os.environ["GOOGLE_API_KEY"] = api_key
+
+
+# Un cliente por proceso y clave: conserva sus conexiones HTTP, el limitador y el cortacircuitos entre reruns y sesiones.
+# google-genai se importa con la primera petición: las sesiones de CSV/Excel no lo cargan nunca.
+@st.cache_resource(show_spinner=False)
+def obtener_cliente_gemini(api_key):
+    return crear_cliente_gemini(api_key, MODELO_GEMINI)
+
+
 try:
-    client = genai.Client(api_key=api_key)
+    client = obtener_cliente_gemini(api_key)
 except Exception as e:
     st.error(f"Error al inicializar el cliente de Gemini: {e}")
     st.stop()
 
-# --- Funciones de Análisis ---
 
-# FUNCIÓN: Análisis de Estructura de Datos (desde DataFrame)
-def analizar_estructura(df):
-    """ Función que analiza un DataFrame para extraer tipos de columnas. """
-    analisis = {
-        'columnas': list(df.columns),
-        'tipos': {},
-        'numericas': [],
-        'categoricas': [],
-        'fechas': [],
-        'nulls': {}
-    }
-    
-    for col in df.columns:
-        tipo = str(df[col].dtype)
-        analisis['tipos'][col] = tipo
-        analisis['nulls'][col] = df[col].isnull().sum()
-        
-        if 'datetime' in tipo:
-            analisis['fechas'].append(col)
-        elif 'object' in tipo or 'category' in tipo:
-            analisis['categoricas'].append(col)
-        elif 'int' in tipo or 'float' in tipo:
-            analisis['numericas'].append(col)
-    
-    return analisis
+# Una sola caché por proceso, compartida por todas las sesiones
+@st.cache_resource
+def obtener_cache_gemini():
+    return crear_cache_gemini()
 
 
-# FUNCIÓN: Análisis de Imagen con Gemini Vision (CORREGIDA PARA ROBUSTEZ)
-def analizar_imagen_con_gemini(imagen_data):
-    system_prompt = (
-        "Eres un experto en Power BI y análisis de modelos de datos. Tu tarea es analizar la imagen "
-        "que contiene una tabla, datos, o una vista del modelo de datos de Power BI. "
-        "Devuelve **SOLO** un objeto JSON con la estructura exacta definida a continuación. "
-        "Identifica los nombres de las columnas, su tipo lógico (numerico/categorico/fecha), "
-        "y sugiere métricas clave y relaciones. No incluyas texto explicativo."
-    )
-    
-    json_structure = {
-        "nombre_tabla": "nombre sugerido para la tabla",
-        "columnas": [
-            {"nombre": "nombre_columna", "tipo": "numerico/categorico/fecha", "descripcion": "breve descripción"},
-        ],
-        "relaciones_posibles": ["descripción de posibles relaciones con otras tablas (si aplica)"],
-        "metricas_clave": ["lista de métricas importantes identificadas"]
-    }
-    
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=[
-            "Analiza esta imagen y devuelve la información de la tabla usando el siguiente esquema JSON.",
-            "Esquema JSON Requerido: " + json.dumps(json_structure, indent=2)
-        ]),
-        imagen_data
-    ]
+# Índice de columnas por proceso: se carga de disco una vez y aprende de cada análisis de cualquier sesión
+@st.cache_resource
+def obtener_indice_columnas():
+    return crear_indice_columnas()
 
-    try:
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=messages,
-            config={'response_mime_type': 'application/json'}
+
+with st.sidebar:
+    with st.expander("🗄️ Caché de Gemini"):
+        stats_cache = obtener_cache_gemini().estadisticas()
+        st.text(
+            f"Aciertos (memoria/disco): {stats_cache['aciertos_memoria']}/{stats_cache['aciertos_disco']}\n"
+            f"Fallos: {stats_cache['fallos']} | Expulsiones: {stats_cache['expulsiones']}\n"
+            f"Entradas en disco: {stats_cache['entradas_disco']} ({stats_cache['bytes_disco'] / 1024:.0f} KB)"
+        )
+        if st.button("🧹 Vaciar caché"):
+            obtener_cache_gemini().limpiar()
+            st.rerun()
+    with st.expander("🗂️ Índice de columnas"):
+        stats_indice = obtener_indice_columnas().estadisticas()
+        st.text(
+            f"Columnas conocidas: {stats_indice['entradas']}\n"
+            f"Clasificadas (exactas/parecidas/por tokens): {stats_indice['exactas']}/"
+            f"{stats_indice['aproximadas']}/{stats_indice['por_tokens']}\n"
+            f"Enviadas a Gemini: {stats_indice['desconocidas']}"
+        )
+        if st.button("🧹 Vaciar índice"):
+            obtener_indice_columnas().limpiar()
+            st.rerun()
+    with st.expander("🔌 Conexión con Gemini"):
+        stats_cliente = client.estadisticas()
+        st.text(
+            f"Llamadas: {stats_cliente['llamadas']} | Reintentos: {stats_cliente['reintentos']}\n"
+            f"Fallos: {stats_cliente['fallos']} | Rechazadas: {stats_cliente['rechazadas']}\n"
+            f"Espera por cuota: {stats_cliente['segundos_espera_cuota']:.1f} s | Circuito: {stats_cliente['circuito']}"
         )
-        
-        texto_limpio = response.text.strip()
-        
-        # 1. VERIFICACIÓN DE SANIDAD DE RESPUESTA (Solución a errores de MIME/Respuesta vacía)
-        if not texto_limpio or 'error' in texto_limpio.lower():
-             return {"error": "El servidor de Gemini devolvió una respuesta no válida o vacía. Intente de nuevo."}
-            
-        # 2. LIMPIEZA Y PARSING DE JSON
-        if texto_limpio.startswith("```json"):
-            texto_limpio = texto_limpio.split("```json")[1].strip()
-        if texto_limpio.endswith("```"):
-            texto_limpio = texto_limpio.split("```")[0].strip()
 
-        return json.loads(texto_limpio)
-        
-    except APIError as e:
-        return {"error": f"Error de API de Gemini: {e}. Revise la clave o el uso."}
-    except json.JSONDecodeError as e:
-         return {"error": f"El modelo no devolvió JSON válido. El texto devuelto era: {texto_limpio[:100]}..."}
-    except Exception as e:
-         return {"error": f"Error de procesamiento de Visión: {e}. Intente con una imagen más clara."}
+# --- Caché de archivos de datos entre reruns ---
+
+# FUNCIÓN: Huella de contenido de una subida (se calcula una sola vez por archivo subido)
+@medir('huella_subida')
+def huella_subida(archivo):
+    huellas = st.session_state.setdefault('huellas_subidas', {})
+    if archivo.file_id not in huellas:
+        huellas[archivo.file_id] = hashlib.sha256(archivo.getvalue()).hexdigest()
+    return huellas[archivo.file_id]
+
+
+# FUNCIÓN: DataFrame leído una vez por huella (compartido sin copias; no debe modificarse)
+@st.cache_resource(max_entries=MAX_ARCHIVOS_EN_CACHE, show_spinner=False)
+@medir('lectura_datos')
+def cargar_dataframe(huella, nombre, _archivo, filas=None, columnas=None):
+    """ Carga completa con pyarrow (Excel vía Parquet en caché); `columnas` es una tupla para la proyección. """
+    if filas is None:
+        return leer_datos(_archivo, nombre, huella, columnas)
+    # Vista previa de archivos grandes: pandas solo lee las primeras filas
+    _archivo.seek(0)
+    if nombre.endswith('.csv'):
+        df = pd.read_csv(_archivo, nrows=filas)
+    else:
+        df = pd.read_excel(_archivo, nrows=filas)
+    _archivo.seek(0)
+    return df
+
+
+# FUNCIÓN: Columnas de una subida sin cargar los datos (para elegir la proyección)
+@st.cache_data(max_entries=MAX_ARCHIVOS_EN_CACHE, show_spinner=False)
+def columnas_subida(huella, nombre, _archivo):
+    return leer_encabezado(_archivo, nombre, huella)
+
+
+# FUNCIÓN: Muestra estratificada leída una vez por huella
+@st.cache_resource(max_entries=MAX_ARCHIVOS_EN_CACHE, show_spinner=False)
+def cargar_muestra(huella, nombre, _archivo):
+    return muestrear_archivo(_archivo, nombre)
+
+
+# FUNCIÓN: Tokens y fragmentos de un archivo de estructura, contados una vez por huella
+@st.cache_data(max_entries=MAX_ARCHIVOS_EN_CACHE, show_spinner=False)
+@medir('presupuesto_tokens')
+def presupuesto_subida(huella, _archivo):
+    texto = decodificar_texto(_archivo.getvalue(), errores='replace')
+    tokens_archivo = contar_tokens(texto)
+    return tokens_archivo, len(dividir_por_tablas(texto)) if tokens_archivo > PRESUPUESTO_TOKENS_DEFECTO else 1
+
+
+# FUNCIÓN: Análisis memorizado por huella, modo (completo, streaming o muestreo) y columnas proyectadas
+def perfilar_subida(huella, nombre, modo, archivo, df, progreso=None, columnas=None):
+    """
+    Se memoriza en la sesión y no con st.cache_data: `progreso` escribe en un elemento creado fuera
+    y un acierto de caché intentaría repetir esa escritura (CacheReplayClosureError).
+    """
+    perfiles = st.session_state.setdefault('perfiles_subidas', {})
+    clave = (huella, nombre, modo, columnas)
+    if clave not in perfiles:
+        perfiles[clave] = _perfilar_subida(nombre, modo, archivo, df, huella, progreso)
+        while len(perfiles) > MAX_ARCHIVOS_EN_CACHE * 3:
+            perfiles.pop(next(iter(perfiles)))
+    # Copia, como devolvía st.cache_data: quien recibe el análisis puede modificarlo
+    return copy.deepcopy(perfiles[clave])
+
+
+@medir('perfilado')
+def _perfilar_subida(nombre, modo, archivo, df, huella, progreso):
+    if modo == 'rapido':
+        return inferir_tipos_por_muestra(
+            df, cargar_muestra(huella, nombre, archivo)[1],
+            escalar=lambda col: leer_columna(archivo, nombre, col)
+        )
+    if modo == 'streaming':
+        archivo.seek(0)
+        return perfilar_por_bloques(archivo, nombre, TAMANO_BLOQUE_DEFECTO, progreso=progreso)
+    return analizar_estructura(df)
 
 
-# FUNCIÓN: Convertir Análisis de Imagen a formato estándar
-def convertir_analisis_imagen(analisis_gemini):
-    # ... (lógica sin cambios) ...
-    analisis = {
-        'columnas': [],
-        'tipos': {},
-        'numericas': [],
-        'categoricas': [],
-        'fechas': [],
-        'nulls': {},
-        'nombre_tabla': analisis_gemini.get('nombre_tabla', 'Tabla'),
-        'relaciones': analisis_gemini.get('relaciones_posibles', []),
-        'metricas_clave': analisis_gemini.get('metricas_clave', [])
-    }
-    
-    for col_info in analisis_gemini.get('columnas', []):
-        nombre = col_info.get('nombre')
-        tipo = col_info.get('tipo', '').lower()
-        
-        if not nombre: continue
+# FUNCIÓN: Vistas previas de las gráficas memorizadas por huella, modo y recomendaciones
+@st.cache_data(max_entries=MAX_ARCHIVOS_EN_CACHE * 3, show_spinner=False)
+def previsualizar_subida(huella, nombre, modo, _archivo, _df, graficas, fechas):
+    """ En streaming se recorren solo las columnas de las gráficas; si no, se agrega el DataFrame cargado. """
+    return previsualizar_graficas(nombre, _archivo, huella, graficas, fechas, None if modo == 'streaming' else _df)
+
+
+# FUNCIÓN: Perfil y firmas de claves de una tabla del modelo (memorizado por huella)
+@st.cache_data(max_entries=64, show_spinner=False)
+@medir('perfilado_tabla_modelo')
+def perfilar_tabla_modelo(huella, nombre, _archivo):
+    """ El DataFrame no se conserva: con una docena de tablas solo se guarda el perfil y firmas de tamaño fijo. """
+    df = leer_datos(_archivo, nombre, huella)
+    return analizar_estructura(df), firmas_tabla(df), len(df)
 
-        analisis['columnas'].append(nombre)
-        analisis['tipos'][nombre] = tipo
-        analisis['nulls'][nombre] = 0
-        
-        if tipo == 'numerico':
-            analisis['numericas'].append(nombre)
-        elif tipo == 'fecha':
-            analisis['fechas'].append(nombre)
-        else:
-            analisis['categoricas'].append(nombre)
-    
-    return analisis
+
+# --- Funciones de Análisis ---
+
+# FUNCIÓN: Panel en la columna de resultados que pinta cada columna en cuanto Gemini la devuelve
+def vista_columnas_en_vivo():
+    """ Devuelve el callback `al_recibir(clave, valor)` para consultar_gemini_json. """
+    panel = col2.container()
+    panel.markdown("### 📋 Estructura de Datos (recibiendo de Gemini…)")
+    estado = panel.empty()
+    inicio = time.perf_counter()
+    recibidas = []
+
+    def al_recibir(clave, valor):
+        if clave != 'columnas' or not isinstance(valor, dict):
+            return
+        recibidas.append(time.perf_counter() - inicio)
+        descripcion = valor.get('descripcion')
+        panel.text(f"{valor.get('nombre', '?')}: {valor.get('tipo', 'N/A')}" + (f" | {descripcion}" if descripcion else ""))
+        estado.caption(f"⚡ {len(recibidas)} columnas recibidas; la primera a los {recibidas[0]:.1f} s")
+
+    return al_recibir
 
 
 # FUNCIÓN: Manejar Análisis de Archivo de Estructura (TXT, JSON, VSPAX, OSPAX)
@@ -165,49 +267,74 @@ def manejar_analisis_archivo(archivo, tipo_archivo):
     nombre_tabla = st.text_input("Nombre de la tabla en Power BI:", archivo.name.split('.')[0])
     analisis = None
     
-    if tipo_archivo in ['vspax', 'ovpax']:
-        st.warning(
-            f"El archivo .{tipo_archivo} es un formato binario comprimido y no puede ser leído directamente por Python."
-        )
-        st.info(
-            "Para obtener el análisis, por favor usa **DAX Studio** (herramienta externa) para **Exportar la Metadata** "
-            "del modelo a un archivo **JSON** o **TXT** y cárgalo."
-        )
-        return False, None, nombre_tabla
+    if tipo_archivo in ['vpax', 'vspax', 'ovpax']:
+        # Un .vpax es un zip: las partes JSON se leen en streaming, sin archivos temporales
+        try:
+            analisis = leer_vpax(archivo)
+        except Exception as e:
+            st.error(f"Error al leer el archivo .{tipo_archivo}: {e}")
+            return False, None, nombre_tabla
+        if not analisis:
+            st.warning(
+                f"El archivo .{tipo_archivo} no contiene DaxVpaView.json ni DaxModel.json. "
+                "Exporta la metadata con **DAX Studio** a **JSON** o **TXT** y cárgala."
+            )
+            return False, None, nombre_tabla
+        st.success(f"✅ VertiPaq Analyzer: {len(analisis['tablas'])} tablas, {len(analisis['columnas'])} columnas.")
+        return True, analisis, nombre_tabla
 
     try:
         if tipo_archivo in ['txt', 'json']:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{tipo_archivo}') as tmp_file:
-                tmp_file.write(archivo.getvalue())
-                temp_file_path = tmp_file.name
-
-            with open(temp_file_path, 'r', encoding='utf-8') as f:
-                contenido = f.read()
-            
-            os.remove(temp_file_path)
+            # JSON grandes en forma de array: se parsean en streaming sobre el buffer de la subida
+            if tipo_archivo == 'json' and archivo.size > UMBRAL_JSON_INCREMENTAL_BYTES:
+                analisis = parsear_json_incremental(lector_texto(archivo))
+                if analisis:
+                    st.info(f"⚡ Metadata leída en streaming: {len(analisis['tablas'])} tablas, {len(analisis['columnas'])} columnas.")
+                    st.success("✅ Estructura de datos procesada correctamente.")
+                    return True, analisis, nombre_tabla
+
+            # Decodificación directa del buffer en memoria, sin archivos temporales
+            with etapa('decodificar_subida', bytes=archivo.size):
+                contenido = decodificar_texto(archivo.getvalue())
 
             if tipo_archivo == 'json':
                 data = json.loads(contenido)
                 
+                # TMSL/model.bim, DAX Studio y volcados DMV/INFO.* se leen localmente, sin Gemini
+                analisis_local = None if isinstance(data, dict) and 'columnas' in data else parsear_metadatos(data)
+
                 if isinstance(data, dict) and 'columnas' in data:
                     analisis = convertir_analisis_imagen(data)
+                elif analisis_local:
+                    analisis = analisis_local
+                    st.info(f"⚡ Metadata reconocida y leída localmente: {len(analisis['tablas'])} tablas, {len(analisis['columnas'])} columnas.")
                 elif isinstance(data, list) and data and 'name' in data[0]: 
-                    st.info("El JSON se analizará como texto debido a su estructura compleja.")
-                    analisis_gemini = analizar_texto_con_gemini(contenido)
+                    st.info("Formato JSON no reconocido localmente; se analizará como texto con Gemini.")
+                    analisis_gemini = analizar_texto_con_gemini(client, obtener_cache_gemini(), contenido, vista_columnas_en_vivo(), obtener_indice_columnas())
                     if 'error' in analisis_gemini:
                          st.error(f"Error de análisis JSON/Gemini: {analisis_gemini['error']}")
                          return False, None, nombre_tabla
                     analisis = convertir_analisis_imagen(analisis_gemini)
+                    if analisis_gemini.get('fragmentos_con_error'):
+                        st.warning(f"⚠️ {analisis_gemini['fragmentos_con_error']} fragmentos no se pudieron analizar; el resultado es parcial.")
                 else:
                     st.warning("Estructura JSON no reconocida. Por favor, asegúrate de que contenga nombres de columnas.")
                     return False, None, nombre_tabla
 
             elif tipo_archivo == 'txt':
-                 analisis_gemini = analizar_texto_con_gemini(contenido)
+                 analisis = parsear_texto_metadatos(contenido)
+                 if analisis:
+                    st.info(f"⚡ Volcado de metadata leído localmente: {len(analisis['tablas'])} tablas, {len(analisis['columnas'])} columnas.")
+                    st.success("✅ Estructura de datos procesada correctamente.")
+                    return True, analisis, nombre_tabla
+
+                 analisis_gemini = analizar_texto_con_gemini(client, obtener_cache_gemini(), contenido, vista_columnas_en_vivo(), obtener_indice_columnas())
                  if 'error' in analisis_gemini:
                     st.error(f"Error de análisis TXT/Gemini: {analisis_gemini['error']}")
                     return False, None, nombre_tabla
                  analisis = convertir_analisis_imagen(analisis_gemini)
+                 if analisis_gemini.get('fragmentos_con_error'):
+                    st.warning(f"⚠️ {analisis_gemini['fragmentos_con_error']} fragmentos no se pudieron analizar; el resultado es parcial.")
             
             st.success("✅ Estructura de datos procesada correctamente.")
             return True, analisis, nombre_tabla
@@ -217,214 +344,147 @@ def manejar_analisis_archivo(archivo, tipo_archivo):
 
     except Exception as e:
         st.error(f"Error al leer/procesar el archivo {tipo_archivo}: {e}")
-        if os.path.exists(temp_file_path): os.remove(temp_file_path)
         return False, None, nombre_tabla
 
 
-# FUNCIÓN: Analizar Texto con Gemini
-def analizar_texto_con_gemini(texto_datos):
-    # ... (lógica sin cambios) ...
-    system_prompt = (
-        "Eres un experto en Power BI. Analiza el siguiente texto que contiene la estructura de un modelo de datos (nombres de tablas, columnas y tipos). "
-        "Devuelve SOLO un objeto JSON con la estructura solicitada, extrayendo los nombres de las columnas, su tipo lógico (numerico/categorico/fecha) y sugiriendo métricas clave."
+# FUNCIÓN: Guardar un análisis en la sesión, con el diff de esquema respecto al anterior
+def guardar_analisis(analisis, nombre_tabla):
+    """ Si el esquema no cambió se conservan las medidas, su revisión y las gráficas ya generadas. """
+    huellas = huellas_analisis(analisis)
+    diferencias = comparar_huellas(st.session_state.get('huellas_analisis'), huellas)
+    conservar = (
+        diferencias is not None and not diferencias['hay_cambios']
+        and st.session_state.get('nombre_tabla') == nombre_tabla and 'medidas' in st.session_state
     )
-    json_structure = {
-        "nombre_tabla": "nombre_principal",
-        "columnas": [
-            {"nombre": "nombre_columna", "tipo": "numerico/categorico/fecha", "descripcion": ""},
-        ],
-        "relaciones_posibles": ["descripción de relaciones"],
-        "metricas_clave": ["métricas importantes"]
-    }
-
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=[
-            "Analiza la estructura de datos a continuación. Usa este Esquema JSON Requerido: " + json.dumps(json_structure, indent=2),
-            f"Datos: \n{texto_datos}"
-        ]),
-    ]
-    
-    try:
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=messages,
-            config={'response_mime_type': 'application/json'}
+    # Cada análisis correcto alimenta el índice de columnas (datos, metadatos locales o Gemini)
+    obtener_indice_columnas().aprender_analisis(analisis)
+    # Las vistas previas son del análisis anterior; solo el camino de CSV/Excel las vuelve a calcular
+    st.session_state.pop('previas_graficas', None)
+    st.session_state['huellas_analisis'] = huellas
+    st.session_state['diferencias'] = diferencias
+    st.session_state['analisis'] = analisis
+    st.session_state['nombre_tabla'] = nombre_tabla
+    if conservar:
+        return
+    st.session_state['medidas'] = generar_medidas_dax(analisis, nombre_tabla)
+    st.session_state['graficas'] = recomendar_graficas(analisis)
+    st.session_state['kpi_okr'] = sugerir_kpi_okr(analisis, nombre_tabla)
+
+
+# FUNCIÓN: Zip de exportación de las medidas filtradas, las bases de los KPI y las relaciones
+def archivo_exportacion(tipos, formato):
+    """ Se reconstruye solo si cambian las medidas (nuevo análisis), el filtro o el formato. """
+    medidas, kpi_okr = st.session_state['medidas'], st.session_state.get('kpi_okr')
+    clave = (tuple(tipos), formato)
+    previa = st.session_state.get('exportacion')
+    if previa and previa['medidas'] is medidas and previa['kpi_okr'] is kpi_okr and previa['clave'] == clave:
+        return previa['datos']
+    # El análisis y el nombre de tabla son los del catálogo: las referencias de las medidas coinciden con el modelo
+    contexto = medidas.contexto
+    with etapa('exportacion_modelo', formato=formato):
+        datos = exportar_modelo(
+            contexto.analisis, contexto.nombre_tabla, medidas.filtrar(tipos), kpi_okr, formato, io.BytesIO()
+        ).getvalue()
+        anotar(bytes=len(datos))
+    st.session_state['exportacion'] = {'medidas': medidas, 'kpi_okr': kpi_okr, 'clave': clave, 'datos': datos}
+    return datos
+
+
+# FUNCIÓN: Gráfico de cascada (Altair) a partir de la contribución de cada categoría
+def grafico_cascada(previa):
+    import altair as alt
+
+    datos = previa['datos'].rename(columns={previa['x']: 'categoria', previa['y']: 'valor'})
+    datos['fin'] = datos['valor'].cumsum()
+    datos['inicio'] = datos['fin'] - datos['valor']
+    total = datos['valor'].sum()
+    datos = pd.concat([datos, pd.DataFrame({'categoria': ['Total'], 'valor': [total], 'inicio': [0.0], 'fin': [total]})],
+                      ignore_index=True)
+    return alt.Chart(datos).mark_bar().encode(
+        x=alt.X('categoria:N', sort=None, title=previa['x']),
+        y=alt.Y('inicio:Q', title=previa['y']),
+        y2='fin:Q',
+        color=alt.condition(alt.datum.categoria == 'Total', alt.value('#1f77b4'), alt.value('#7fb3d5')),
+        tooltip=['categoria', 'valor'],
+    ).properties(height=ALTO_PREVIA)
+
+
+# FUNCIÓN: Pintar la vista previa de una gráfica recomendada (solo agregados o una muestra)
+def mostrar_previa_grafica(previa):
+    tipo = previa['tipo']
+    if tipo == 'lineas':
+        st.line_chart(previa['datos'], x=previa['x'], y=previa['y'], height=ALTO_PREVIA)
+        if previa['puntos_originales'] > len(previa['datos']):
+            st.caption(f"{len(previa['datos']):,} de {previa['puntos_originales']:,} puntos (reducción LTTB).")
+    elif tipo == 'barras':
+        st.bar_chart(previa['datos'], x=previa['x'], y=previa['y'], height=ALTO_PREVIA)
+    elif tipo == 'cascada':
+        st.altair_chart(grafico_cascada(previa), use_container_width=True)
+    elif tipo == 'dispersion':
+        st.scatter_chart(previa['datos'], x=previa['x'], y=previa['y'], height=ALTO_PREVIA)
+        st.caption(f"Muestra aleatoria de {len(previa['datos']):,} de {previa['filas']:,} filas.")
+    elif 'periodo' not in previa:
+        st.metric("Total", f"{previa['valor']:,.2f}")
+        st.caption("Sin columna de fecha: no hay tendencia ni meta de referencia.")
+    elif tipo == 'kpi':
+        delta = previa['valor'] - previa['anterior'] if previa['anterior'] is not None else None
+        st.metric(f"Último mes ({previa['periodo']})", f"{previa['valor']:,.2f}",
+                  f"{delta:,.2f}" if delta is not None else None)
+        st.line_chart(previa['datos'], x='Mes', y=previa['datos'].columns[1], height=120)
+    else:
+        avance = previa['valor'] / previa['maximo'] if previa['maximo'] > 0 else 0.0
+        st.metric(f"Último mes ({previa['periodo']})", f"{previa['valor']:,.2f}")
+        st.progress(min(max(avance, 0.0), 1.0), text=f"{avance:.0%} del mejor mes ({previa['maximo']:,.2f})")
+
+
+# FUNCIÓN: Mostrar el diff de esquema del último re-análisis
+def mostrar_diferencias(diferencias):
+    if not diferencias['hay_cambios']:
+        st.caption("🔄 Sin cambios de esquema respecto al análisis anterior: se conservan las medidas generadas.")
+        return
+    totales = resumir_diferencias(diferencias)
+    with st.expander(
+        f"🔄 Cambios respecto al análisis anterior: {totales['tablas_cambiadas']} tablas cambiadas, "
+        f"{totales['tablas_sin_cambios']} sin cambios"
+    ):
+        st.text(
+            f"Columnas añadidas: {totales['añadidas']} | Eliminadas: {totales['eliminadas']} | "
+            f"Retipadas: {totales['retipadas']} | Con datos distintos: {totales['modificadas']}"
         )
-        
-        texto_limpio = response.text.strip()
-        if texto_limpio.startswith("```json"):
-            texto_limpio = texto_limpio.split("```json")[1].strip()
-        if texto_limpio.endswith("```"):
-            texto_limpio = texto_limpio.split("```")[0].strip()
-
-        return json.loads(texto_limpio)
-        
-    except Exception as e:
-         return {"error": f"Error de análisis de texto con Gemini: {e}"}
-
-# FUNCIÓN: Generar Medidas DAX
-def generar_medidas_dax(analisis, nombre_tabla):
-    # ... (lógica sin cambios) ...
-    medidas = []
-    
-    for col in analisis['numericas']:
-        medidas.append({
-            'nombre': f'Total {col}',
-            'dax': f'Total {col} = SUM({nombre_tabla}[{col}])',
-            'tipo': 'Agregación básica',
-            'descripcion': f'Suma total de {col}'
-        })
-        # ... (otras medidas de agregación y tiempo) ...
-
-    if analisis['columnas']:
-        medidas.append({
-            'nombre': 'Conteo Total Filas',
-            'dax': f'Conteo Total Filas = COUNTROWS({nombre_tabla})',
-            'tipo': 'Conteo',
-            'descripcion': 'Cuenta todas las filas de la tabla'
-        })
-    
-    if analisis['fechas'] and analisis['numericas']:
-        fecha_col = analisis['fechas'][0]
-        num_col = analisis['numericas'][0]
-        
-        medidas.append({
-            'nombre': f'{num_col} YTD',
-            'dax': f'{num_col} YTD = TOTALYTD(SUM({nombre_tabla}[{num_col}]), {nombre_tabla}[{fecha_col}])',
-            'tipo': 'Inteligencia de tiempo',
-            'descripcion': f'Acumulado del año hasta la fecha para {num_col}'
-        })
-        
-        medidas.append({
-            'nombre': f'Variación % {num_col} vs Mes Anterior',
-            'dax': f'''Variación % {num_col} vs Mes Anterior = 
-VAR CurrentValue = SUM({nombre_tabla}[{num_col}])
-VAR PreviousValue = CALCULATE(SUM({nombre_tabla}[{num_col}]), PREVIOUSMONTH({nombre_tabla}[{fecha_col}]))
-RETURN
-DIVIDE(CurrentValue - PreviousValue, PreviousValue, 0)''',
-            'tipo': 'Análisis comparativo',
-            'descripcion': f'Cambio porcentual vs mes anterior'
-        })
-
-    if len(analisis['numericas']) >= 1 and len(analisis['categoricas']) >= 1:
-        num_col = analisis['numericas'][0]
-        cat_col = analisis['categoricas'][0]
-        
-        medidas.append({
-            'nombre': f'{num_col} Top 5 {cat_col}',
-            'dax': f'''Top 5 {cat_col} = 
-CALCULATE(
-    SUM({nombre_tabla}[{num_col}]),
-    TOPN(5, ALL({nombre_tabla}[{cat_col}]), SUM({nombre_tabla}[{num_col}]))
-)''',
-            'tipo': 'Filtrado avanzado',
-            'descripcion': f'Total solo para los 5 principales {cat_col}'
-        })
-    
-    return medidas
-
-# FUNCIÓN: Sugerir KPI/OKR
-def sugerir_kpi_okr(analisis, nombre_tabla):
-    # ... (lógica sin cambios) ...
-    sugerencias = []
-    
-    if analisis['numericas']:
-        num_col = analisis['numericas'][0]
-        
-        sugerencias.append({
-            'nombre': f'KPI: Tasa de {num_col}',
-            'objetivo': f'Monitorear la suma promedio o total de `{num_col}` por entidad/tiempo.',
-            'dax_base': f'SUM({nombre_tabla}[{num_col}])',
-            'tipo': 'Monitoreo de Volumen',
-            'visualizacion': 'Tarjeta o Medidor'
-        })
-        
-        if analisis['fechas']:
-            sugerencias.append({
-                'nombre': f'KPI: Crecimiento de {num_col} (MoM)',
-                'objetivo': f'Medir la variación porcentual de `{num_col}` respecto al mes anterior (Month-over-Month).',
-                'dax_base': f'DIVIDE([Total {num_col}] - [{num_col} Mes Anterior], [{num_col} Mes Anterior], 0)',
-                'tipo': 'Rendimiento y Crecimiento',
-                'visualizacion': 'Flechas Condicionales o Gráfico de Área'
-            })
-
-    if len(analisis['numericas']) >= 2:
-        num_col_1 = analisis['numericas'][0]
-        num_col_2 = analisis['numericas'][1]
-        
-        sugerencias.append({
-            'nombre': f'KPI: Ratio de {num_col_1} vs {num_col_2}',
-            'objetivo': f'Medir la eficiencia o relación entre `{num_col_1}` y `{num_col_2}` (Ej: Ingreso/Costo).',
-            'dax_base': f'DIVIDE([Total {num_col_1}], [Total {num_col_2}], 0)',
-            'tipo': 'Eficiencia/Razón',
-            'visualizacion': 'Tarjeta o Gráfico de Dispersión'
-        })
-        
-    if analisis['categoricas'] and analisis['numericas']:
-        num_col = analisis['numericas'][0]
-        cat_col = analisis['categoricas'][0]
-        
-        sugerencias.append({
-            'nombre': f'OKR: Top {cat_col} Contribuyentes',
-            'objetivo': f'Identificar y aumentar el porcentaje de `{num_col}` aportado por el Top 5 de `{cat_col}`.',
-            'dax_base': f'DIVIDE([{num_col} Top 5 {cat_col}], [Total {num_col}], 0)',
-            'tipo': 'Foco Estratégico',
-            'visualizacion': 'Gráfico de Barras con Pareto'
-        })
-
-    return sugerencias
-
-# FUNCIÓN: Recomendar Gráficas
-def recomendar_graficas(analisis):
-    # ... (lógica sin cambios) ...
-    recomendaciones = []
-    
-    if analisis['fechas'] and analisis['numericas']:
-        recomendaciones.append({
-            'tipo': 'Gráfico de Líneas',
-            'uso': f'Tendencia temporal de {analisis["numericas"][0]} a lo largo del tiempo (KPIs de crecimiento)',
-            'columnas': [analisis['fechas'][0], analisis['numericas'][0]],
-            'icono': '📈'
-        })
-        
-    if analisis['categoricas'] and analisis['numericas']:
-        recomendaciones.append({
-            'tipo': 'Gráfico de Cascada (Waterfall)',
-            'uso': 'Mostrar la contribución o descomposición de una métrica por categoría o estado (ideal para demostrar el impacto en un OKR).',
-            'columnas': [analisis['categoricas'][0], analisis['numericas'][0]],
-            'icono': '🌊'
-        })
-        recomendaciones.append({
-            'tipo': 'Gráfico de Barras/Columnas',
-            'uso': f'Comparar {analisis["numericas"][0]} por {analisis["categoricas"][0]}',
-            'columnas': [analisis['categoricas'][0], analisis['numericas'][0]],
-            'icono': '📊'
-        })
-        
-    if len(analisis['numericas']) >= 2:
-        recomendaciones.append({
-            'tipo': 'Gráfico de Dispersión',
-            'uso': f'Analizar correlación entre {analisis["numericas"][0]} y {analisis["numericas"][1]} (KPIs de Eficiencia)',
-            'columnas': analisis["numericas"][:2],
-            'icono': '📊'
-        })
-
-    if analisis['numericas']:
-        recomendaciones.append({
-            'tipo': 'Tarjeta de KPI con Tendencia',
-            'uso': f'Visualizar métrica clave ({analisis["numericas"][0]}) con comparación de período anterior (MoM o YoY)',
-            'columnas': [analisis['numericas'][0]],
-            'icono': '🎯'
-        })
-        recomendaciones.append({
-            'tipo': 'Gráfico de Medidor (Gauge)',
-            'uso': f'Visualizar progreso de {analisis["numericas"][0]} hacia una meta (Objetivos)',
-            'columnas': [analisis['numericas'][0]],
-            'icono': '🎚️'
-        })
-
-    return recomendaciones
+        for tabla, cambios in diferencias['tablas'].items():
+            lineas = [f"**{tabla}** ({cambios['estado']})"]
+            if cambios['añadidas']:
+                lineas.append("➕ " + ", ".join(cambios['añadidas']))
+            if cambios['eliminadas']:
+                lineas.append("➖ " + ", ".join(cambios['eliminadas']))
+            for r in cambios['retipadas']:
+                lineas.append(f"🔁 {r['columna']}: {r['antes']} → {r['despues']}")
+            if cambios['modificadas']:
+                lineas.append("✏️ " + ", ".join(cambios['modificadas']))
+            st.markdown("  \n".join(lineas))
+        for texto in diferencias['relaciones_añadidas']:
+            st.markdown(f"➕ Relación: {texto}")
+        for texto in diferencias['relaciones_eliminadas']:
+            st.markdown(f"➖ Relación: {texto}")
+
+
+# FUNCIÓN: Revisor DAX del catálogo actual (se construye una vez por catálogo, no en cada rerun)
+def revisor_medidas(medidas):
+    guardado = st.session_state.get('revisor_dax')
+    if guardado is None or guardado[0] is not medidas:
+        revisor = RevisorDax(medidas, st.session_state.get('analisis') or {}, st.session_state.get('nombre_tabla', 'Tabla'))
+        guardado = (medidas, revisor)
+        st.session_state['revisor_dax'] = guardado
+    return guardado[1]
+
+# FUNCIÓN: Mostrar los hallazgos de una medida y su versión optimizada
+def mostrar_revision(revision):
+    for hallazgo in revision['hallazgos']:
+        aviso = st.error if hallazgo['severidad'] == 'error' else st.warning
+        aviso(f"**{REGLAS[hallazgo['regla']]}:** {hallazgo['mensaje']}")
+    if revision['optimizada']:
+        st.markdown("**Versión optimizada:**")
+        st.code(revision['optimizada'], language='dax')
 
 
 # --- UI Principal ---
@@ -436,7 +496,8 @@ with col1:
     # Separación de Entradas
     tipo_entrada = st.radio(
         "Tipo de entrada:", 
-        ["1. Excel/CSV (Datos)", "2. Archivo (Estructura)", "3. Imagen (Visión)"]
+        ["1. Excel/CSV (Datos)", "2. Archivo (Estructura)", "3. Imagen (Visión)", "4. Lote (Varios archivos)",
+         "5. Modelo (Varias tablas)"]
     )
     
     # ----------------------------------------------------
@@ -446,13 +507,34 @@ with col1:
         archivo = st.file_uploader("Sube tu archivo (Excel o CSV)", type=['xlsx', 'xls', 'csv'])
         
         if archivo:
+            modo_rapido = st.checkbox(
+                "⚡ Inferencia rápida por muestreo (cabeza, cola y filas aleatorias)",
+                help="Clasifica las columnas a partir de una muestra; solo las columnas ambiguas se leen completas."
+            )
             try:
-                if archivo.name.endswith('.csv'):
-                    df = pd.read_csv(archivo)
+                # La lectura y el análisis se memorizan por huella de contenido: los reruns no releen el archivo
+                huella = huella_subida(archivo)
+                if modo_rapido:
+                    modo = 'rapido'
+                    muestra, filas_estimadas = cargar_muestra(huella, archivo.name, archivo)
+                    df = muestra
+
+                    st.success(f"✅ Muestra de {len(muestra):,} filas (~{filas_estimadas:,} filas estimadas), {len(muestra.columns)} columnas")
+                elif archivo.size > UMBRAL_STREAMING_BYTES:
+                    # Modo streaming: solo se lee una vista previa; el perfilado recorre el archivo por bloques
+                    modo = 'streaming'
+                    df = cargar_dataframe(huella, archivo.name, archivo, filas=10)
+
+                    st.success(f"✅ Archivo grande detectado ({archivo.size / 1024 ** 2:.0f} MB): se analizará en bloques")
                 else:
-                    df = pd.read_excel(archivo)
-                
-                st.success(f"✅ Archivo cargado: {len(df)} filas, {len(df.columns)} columnas")
+                    modo = 'completo'
+                    # Proyección: solo se materializan las columnas elegidas (vacío = todas)
+                    seleccion = st.multiselect(
+                        "Columnas a cargar (vacío = todas):", columnas_subida(huella, archivo.name, archivo)
+                    )
+                    df = cargar_dataframe(huella, archivo.name, archivo, columnas=tuple(seleccion) or None)
+
+                    st.success(f"✅ Archivo cargado: {len(df)} filas, {len(df.columns)} columnas")
                 
                 with st.expander("👀 Vista previa de datos"):
                     st.dataframe(df.head(10))
@@ -461,13 +543,34 @@ with col1:
                 
                 if st.button("🚀 Analizar y Generar Soluciones"):
                     with st.spinner("Analizando datos y generando sugerencias..."):
-                        analisis = analizar_estructura(df) 
-                        st.session_state['analisis'] = analisis
-                        st.session_state['medidas'] = generar_medidas_dax(analisis, nombre_tabla)
-                        st.session_state['graficas'] = recomendar_graficas(analisis)
-                        st.session_state['kpi_okr'] = sugerir_kpi_okr(analisis, nombre_tabla)
-                        st.session_state['nombre_tabla'] = nombre_tabla
+                        barra = st.empty()
+                        analisis = perfilar_subida(
+                            huella, archivo.name, modo, archivo, df,
+                            lambda filas, seg: barra.text(f"{filas:,} filas leídas ({filas / max(seg, 1e-9):,.0f} filas/s)"),
+                            columnas=tuple(df.columns)
+                        )
+                        guardar_analisis(analisis, nombre_tabla)
+                        st.session_state['huella'] = huella
+                        barra.text("Calculando las vistas previas de las gráficas...")
+                        try:
+                            previas = previsualizar_subida(
+                                huella, archivo.name, modo, archivo, df,
+                                st.session_state['graficas'], tuple(analisis['fechas'])
+                            )
+                            st.session_state['previas_graficas'] = dict(previas, modo=modo)
+                        except Exception as e:
+                            st.session_state['previas_graficas'] = {'error': str(e)}
                         st.rerun()
+                elif (
+                    st.session_state.get('huella') == huella
+                    and st.session_state.get('analisis')
+                    and st.session_state.get('nombre_tabla') != nombre_tabla
+                ):
+                    # Cambiar el nombre de la tabla solo regenera el texto DAX; los datos no se vuelven a leer
+                    analisis = st.session_state['analisis']
+                    st.session_state['medidas'] = generar_medidas_dax(analisis, nombre_tabla)
+                    st.session_state['kpi_okr'] = sugerir_kpi_okr(analisis, nombre_tabla)
+                    st.session_state['nombre_tabla'] = nombre_tabla
                 
             except Exception as e:
                 st.error(f"Error al cargar archivo: {str(e)}")
@@ -477,23 +580,27 @@ with col1:
     # ----------------------------------------------------
     elif tipo_entrada == "2. Archivo (Estructura)":
         archivo = st.file_uploader(
-            "Sube archivo de estructura o binario (TXT, JSON, VSPAX, OPAX)", 
-            type=['txt', 'json', 'vspax', 'ovpax']
+            "Sube archivo de estructura o binario (TXT, JSON, VPAX, OVPAX)", 
+            type=['txt', 'json', 'vpax', 'vspax', 'ovpax']
         )
         
         if archivo:
             file_extension = archivo.name.split('.')[-1].lower()
 
+            if file_extension in ['txt', 'json']:
+                # Presupuesto de tokens visible antes de enviar nada a Gemini (cada rerun lo lee de la caché)
+                tokens_archivo, n_fragmentos = presupuesto_subida(huella_subida(archivo), archivo)
+                col_t1, col_t2, col_t3 = st.columns(3)
+                col_t1.metric("Tokens (aprox.)", f"{tokens_archivo:,}")
+                col_t2.metric("Fragmentos", n_fragmentos)
+                col_t3.metric("Coste estimado", f"${estimar_coste(tokens_archivo):.4f}")
+
             if st.button("🚀 Analizar Estructura Cargada"):
                 with st.spinner(f"Analizando archivo .{file_extension}..."):
                     procesado, analisis, nombre_tabla = manejar_analisis_archivo(archivo, file_extension)
                     
                     if procesado:
-                        st.session_state['analisis'] = analisis
-                        st.session_state['medidas'] = generar_medidas_dax(analisis, nombre_tabla)
-                        st.session_state['graficas'] = recomendar_graficas(analisis)
-                        st.session_state['kpi_okr'] = sugerir_kpi_okr(analisis, nombre_tabla)
-                        st.session_state['nombre_tabla'] = nombre_tabla
+                        guardar_analisis(analisis, nombre_tabla)
                         st.rerun()
                     elif analisis is not None:
                          st.error("Fallo al procesar el archivo.")
@@ -507,6 +614,9 @@ with col1:
         imagen_cargada = st.file_uploader("Sube imagen de tabla o modelo", type=['png', 'jpg', 'jpeg']) 
         
         if imagen_cargada:
+            # Pillow solo se importa en el camino de imágenes
+            from PIL import Image
+
             # CORRECCIÓN DE ERROR 1: Manejo defensivo de la imagen cargada
             try:
                 img = Image.open(imagen_cargada)
@@ -520,7 +630,10 @@ with col1:
             if st.button("🔍 Analizar Imagen con Gemini"):
                 with st.spinner("Analizando imagen y extrayendo estructura con Gemini Vision..."):
                     
-                    analisis_gemini = analizar_imagen_con_gemini(img) 
+                    informe_imagen = {}
+                    analisis_gemini = analizar_imagen_con_gemini(client, obtener_cache_gemini(), img, imagen_cargada.size, informe_imagen, vista_columnas_en_vivo())
+                    if informe_imagen:
+                        st.session_state['informe_imagen'] = informe_imagen
                     
                     # CORRECCIÓN DE ERROR 2: Manejo de error de estado (No hacer rerun si falla)
                     if 'error' in analisis_gemini:
@@ -528,17 +641,110 @@ with col1:
                         st.session_state['analisis'] = None # Limpiar estado para evitar errores en col2
                     else:
                         analisis = convertir_analisis_imagen(analisis_gemini)
-                        st.session_state['analisis'] = analisis
-                        st.session_state['medidas'] = generar_medidas_dax(analisis, nombre_tabla)
-                        st.session_state['graficas'] = recomendar_graficas(analisis)
-                        st.session_state['kpi_okr'] = sugerir_kpi_okr(analisis, nombre_tabla)
-                        st.session_state['nombre_tabla'] = nombre_tabla
+                        guardar_analisis(analisis, nombre_tabla)
                         st.success("¡Estructura de datos extraída por Gemini!")
                         st.rerun()
 
+    # ----------------------------------------------------
+    # 4. Lote (Varias imágenes / estructuras en paralelo)
+    # ----------------------------------------------------
+    elif tipo_entrada == "4. Lote (Varios archivos)":
+        st.info("📚 Sube varias capturas o exportaciones de metadata; se analizan en paralelo y se fusionan en un solo análisis.")
+        archivos_lote = st.file_uploader(
+            "Sube imágenes o archivos de estructura (PNG, JPG, TXT, JSON)",
+            type=['png', 'jpg', 'jpeg', 'txt', 'json'],
+            accept_multiple_files=True
+        )
+
+        col_conc, col_timeout = st.columns(2)
+        concurrencia = col_conc.number_input("Peticiones simultáneas", 1, 32, CONCURRENCIA_DEFECTO)
+        timeout_lote = col_timeout.number_input("Timeout por petición (s)", 5, 600, TIMEOUT_DEFECTO_SEGUNDOS)
+        nombre_tabla = st.text_input("Nombre de la tabla en Power BI:", "Modelo")
+
+        if archivos_lote and st.button(f"🚀 Analizar {len(archivos_lote)} archivos"):
+            # Los hilos del pool necesitan el contexto de la sesión para usar st.cache_resource
+            from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+            contexto = get_script_run_ctx()
+
+            # Los resultados se pintan en el panel de resultados a medida que llegan
+            panel_lote = col2.container()
+            panel_lote.markdown("### 📚 Progreso del lote")
+            barra = panel_lote.progress(0.0)
+            cache, indice = obtener_cache_gemini(), obtener_indice_columnas()
+            tareas = [(a.name, analizar_archivo, (a.name, a.getvalue(), client, cache, indice)) for a in archivos_lote]
+            resultados_lote = []
+            analisis_lote = []
+            inicio_lote = time.perf_counter()
+
+            for nombre, resultado, segundos in ejecutar_en_lote(
+                tareas, concurrencia, timeout_lote,
+                inicializador=lambda: add_script_run_ctx(threading.current_thread(), contexto)
+            ):
+                if 'error' in resultado:
+                    panel_lote.error(f"❌ {nombre} ({segundos:.1f} s): {resultado['error']}")
+                    resultados_lote.append({'archivo': nombre, 'segundos': segundos, 'error': resultado['error']})
+                else:
+                    panel_lote.success(f"✅ {nombre} ({segundos:.1f} s): {len(resultado['columnas'])} columnas")
+                    resultados_lote.append({'archivo': nombre, 'segundos': segundos, 'columnas': len(resultado['columnas'])})
+                    analisis_lote.append(resultado)
+                barra.progress(len(resultados_lote) / len(tareas))
+
+            st.session_state['lote'] = {'archivos': resultados_lote, 'segundos': time.perf_counter() - inicio_lote}
+            if analisis_lote:
+                analisis = fusionar_analisis(analisis_lote)
+                guardar_analisis(analisis, nombre_tabla)
+                st.rerun()
+
+
+    # ----------------------------------------------------
+    # 5. Modelo (Varias tablas de datos con relaciones inferidas)
+    # ----------------------------------------------------
+    elif tipo_entrada == "5. Modelo (Varias tablas)":
+        st.info("🧩 Sube las tablas de un modelo en estrella (hechos y dimensiones); las relaciones se infieren por los valores de las claves.")
+        archivos_modelo = st.file_uploader(
+            "Sube las tablas del modelo (Excel o CSV)", type=['xlsx', 'xls', 'csv'], accept_multiple_files=True
+        )
+
+        if archivos_modelo and st.button(f"🚀 Analizar modelo de {len(archivos_modelo)} tablas"):
+            tablas_modelo = {}
+            barra = st.progress(0.0)
+            try:
+                for i, archivo in enumerate(archivos_modelo):
+                    barra.progress(i / len(archivos_modelo), text=f"Perfilando {archivo.name}...")
+                    tablas_modelo[archivo.name.rsplit('.', 1)[0]] = perfilar_tabla_modelo(
+                        huella_subida(archivo), archivo.name, archivo
+                    )
+                barra.progress(1.0, text="Infiriendo relaciones...")
+                analisis = analizar_modelo(tablas_modelo)
+                nombre_tabla = analisis['nombre_tabla']
+                guardar_analisis(analisis, nombre_tabla)
+                st.rerun()
+            except Exception as e:
+                st.error(f"Error al analizar el modelo: {str(e)}")
+
 
 with col2:
     st.subheader("📊 Resultados del Análisis")
+
+    if 'informe_imagen' in st.session_state:
+        inf = st.session_state['informe_imagen']
+        with st.expander(
+            f"🖼️ Preprocesado: {inf['bytes_antes'] / 1024:,.0f} KB → {inf['bytes_despues'] / 1024:,.0f} KB"
+        ):
+            st.text(
+                f"Dimensiones: {inf['dimensiones_antes']} → {', '.join(map(str, inf['dimensiones_despues']))}\n"
+                f"Mosaicos enviados: {inf['mosaicos']}\n"
+                f"Tokens de imagen estimados: {inf['tokens_antes']:,} → {inf['tokens_despues']:,}\n"
+                f"Preprocesado: {inf['segundos_preprocesado']:.2f} s | Análisis total: {inf['segundos_total']:.1f} s\n"
+                f"Subida ahorrada (estimada a 10 Mbit/s): {inf['segundos_subida_ahorrados']:.2f} s"
+            )
+
+    if 'lote' in st.session_state:
+        lote = st.session_state['lote']
+        with st.expander(f"📚 Último lote: {len(lote['archivos'])} archivos en {lote['segundos']:.1f} s"):
+            for r in lote['archivos']:
+                estado = f"❌ {r['error']}" if 'error' in r else f"✅ {r['columnas']} columnas"
+                st.text(f"{r['archivo']} ({r['segundos']:.1f} s): {estado}")
     
     if 'analisis' in st.session_state:
         analisis = st.session_state['analisis']
@@ -549,12 +755,81 @@ with col2:
         col_a.metric("Columnas Numéricas", len(analisis['numericas']))
         col_b.metric("Columnas Categóricas", len(analisis['categoricas']))
         col_c.metric("Columnas Fecha", len(analisis['fechas']))
+
+        if st.session_state.get('diferencias'):
+            mostrar_diferencias(st.session_state['diferencias'])
+
+        if analisis.get('fragmentos_reutilizados'):
+            st.caption(
+                f"♻️ {analisis['fragmentos_reutilizados']} de {analisis['fragmentos']} fragmentos reutilizados "
+                "del análisis anterior: solo se consultó a Gemini lo que cambió."
+            )
+
+        if analisis.get('clasificadas_localmente'):
+            st.caption(
+                f"🗂️ {len(analisis['clasificadas_localmente'])} de {len(analisis['columnas'])} columnas "
+                "clasificadas con el índice local; solo las desconocidas se enviaron a Gemini."
+            )
+
+        if analisis.get('truncado'):
+            st.warning(
+                f"⚠️ La respuesta de Gemini se cortó: se muestran las {len(analisis['columnas'])} columnas "
+                "que llegaron completas. Vuelve a analizar para obtener el resto."
+            )
+
+        if 'muestra' in analisis:
+            escaladas = analisis['muestra']['escaladas']
+            st.caption(
+                f"⚡ Tipos inferidos de una muestra de {analisis['muestra']['filas']:,} filas "
+                f"en {analisis['muestra']['segundos']:.2f} s"
+                + (f"; columnas ambiguas leídas completas: {', '.join(map(str, escaladas))}" if escaladas else "")
+            )
+
+        if 'rendimiento' in analisis:
+            st.caption(
+                f"⚡ {analisis['filas']:,} filas perfiladas en {analisis['rendimiento']['segundos']:.1f} s "
+                f"({analisis['rendimiento']['filas_por_segundo']:,.0f} filas/s)"
+            )
         
         with st.expander("🔍 Detalle de columnas"):
             for col in analisis['columnas']:
                 tipo_col = analisis['tipos'].get(col, 'N/A')
                 nulls = analisis['nulls'].get(col, 0)
-                st.text(f"{col}: {tipo_col} | Nulos: {nulls}")
+                texto = f"{col}: {tipo_col} | Nulos: {nulls}"
+                if col in analisis.get('cardinalidad', {}):
+                    texto += f" | Distintos (aprox.): {analisis['cardinalidad'][col]:,}"
+                if col in analisis.get('rango_fechas', {}):
+                    texto += " | Rango: {} → {}".format(*analisis['rango_fechas'][col])
+                if col in analisis.get('estadisticas', {}):
+                    stats = analisis['estadisticas'][col]
+                    texto += f" | Mín/Mediana/Máx: {stats['minimo']:,.2f} / {stats['percentiles'][50]:,.2f} / {stats['maximo']:,.2f}"
+                if col in analisis.get('nulls_ic', {}):
+                    bajo, alto = analisis['nulls_ic'][col]
+                    texto += f" | % Nulos IC95%: {bajo:.1%}–{alto:.1%}"
+                st.text(texto)
+
+        if analisis.get('tablas'):
+            with st.expander(f"🗂️ Tablas fusionadas ({len(analisis['tablas'])})"):
+                for tabla, columnas_tabla in analisis['tablas'].items():
+                    filas_tabla = analisis.get('filas_por_tabla', {}).get(tabla)
+                    detalle_filas = f" ({filas_tabla:,} filas)" if filas_tabla is not None else ""
+                    st.markdown(f"- **{tabla}**{detalle_filas}: {', '.join(map(str, columnas_tabla))}")
+
+        if analisis.get('filas_tablas'):
+            with st.expander("📦 Tamaño del modelo (VertiPaq)"):
+                for tabla, filas_tabla in sorted(analisis['filas_tablas'].items(), key=lambda t: -(t[1] or 0)):
+                    st.markdown(f"- **{tabla}**: {filas_tabla or 0:,} filas")
+                columnas_stats = [
+                    (tabla, col, stats)
+                    for tabla, cols in analisis.get('estadisticas_columnas', {}).items()
+                    for col, stats in cols.items()
+                ]
+                st.markdown("**Columnas más pesadas:**")
+                for tabla, col, stats in sorted(columnas_stats, key=lambda c: -(c[2]['total'] or 0))[:15]:
+                    st.text(
+                        f"{tabla}[{col}]: {stats['cardinalidad'] or 0:,} valores | "
+                        f"diccionario {(stats['diccionario'] or 0) / 1024:,.0f} KB | {stats['codificacion'] or 'N/A'}"
+                    )
 
         if 'relaciones' in analisis and analisis['relaciones']:
             with st.expander("🔗 Relaciones sugeridas"):
@@ -568,15 +843,21 @@ with col2:
 
 
 # --- Sección de KPI y OKR ---
+# Desde aquí hasta el panel de rendimiento, el tiempo es el de pintar los resultados
+etapa_render = abrir_etapa('render_resultados')
 if 'kpi_okr' in st.session_state:
     st.markdown("---")
     st.markdown("## 🎯 Sugerencias de KPI y OKR")
     
+    revisor = revisor_medidas(st.session_state['medidas']) if 'medidas' in st.session_state else None
     for sugerencia in st.session_state['kpi_okr']:
         with st.expander(f"🏅 {sugerencia['nombre']} ({sugerencia['tipo']})"):
             st.markdown(f"**Objetivo/Enfoque:** {sugerencia['objetivo']}")
             st.markdown(f"**Medida DAX base:**")
             st.code(sugerencia['dax_base'], language='dax')
+            if revisor is not None:
+                # Las referencias [..] de la sugerencia deben existir entre las medidas generadas
+                mostrar_revision(revisor.revisar(sugerencia))
             st.markdown(f"**Visualización Clave:** {sugerencia['visualizacion']}")
 
 # --- Sección de Medidas DAX ---
@@ -586,24 +867,59 @@ if 'medidas' in st.session_state:
     
     medidas = st.session_state['medidas']
     
-    tipos = list(set([m['tipo'] for m in medidas]))
+    tipos = medidas.tipos()
     tipo_filtro = st.multiselect("Filtrar por tipo de medida:", tipos, default=tipos)
     
-    medidas_filtradas = [m for m in medidas if m['tipo'] in tipo_filtro]
+    # Las medidas se generan bajo demanda: solo se construyen las de la página visible
+    medidas_filtradas = medidas.filtrar(tipo_filtro)
+    total_medidas = len(medidas_filtradas)
     
-    if st.button("📥 Descargar medidas DAX filtradas"):
-        contenido = "\n\n".join([f"// {m['nombre']}\n// {m['descripcion']}\n{m['dax']}" for m in medidas_filtradas])
-        st.download_button(
-            label="💾 Descargar archivo DAX",
-            data=contenido,
-            file_name=f"medidas_dax_{st.session_state.get('nombre_tabla', 'tabla')}.txt",
-            mime="text/plain"
-        )
+    # Un solo clic: el zip se construye al cambiar medidas, filtro o formato y se reutiliza en cada rerun
+    etiqueta_exportacion = st.radio("Formato de exportación:", list(FORMATOS_EXPORTACION), horizontal=True)
+    formato_exportacion = FORMATOS_EXPORTACION[etiqueta_exportacion]
+    st.download_button(
+        label=f"📥 Descargar {total_medidas:,} medidas, KPI y relaciones ({etiqueta_exportacion})",
+        data=archivo_exportacion(tipo_filtro, formato_exportacion),
+        file_name=f"modelo_{st.session_state.get('nombre_tabla', 'tabla')}_{formato_exportacion}.zip",
+        mime="application/zip"
+    )
     
-    for i, medida in enumerate(medidas_filtradas):
-        with st.expander(f"📊 {medida['nombre']} ({medida['tipo']})"):
+    paginas = max(1, -(-total_medidas // TAMANO_PAGINA_MEDIDAS))
+    # La clave depende del total para que la página vuelva a 1 al cambiar el filtro
+    pagina = st.number_input(
+        f"Página (de {paginas})", min_value=1, max_value=paginas, value=1, key=f"pagina_medidas_{total_medidas}"
+    ) - 1
+    st.caption(
+        f"{total_medidas:,} medidas; mostrando {min(pagina * TAMANO_PAGINA_MEDIDAS + 1, total_medidas):,}"
+        f"–{min((pagina + 1) * TAMANO_PAGINA_MEDIDAS, total_medidas):,}"
+    )
+
+    revisor = revisor_medidas(medidas)
+    if st.button("🩺 Revisar rendimiento de las medidas filtradas"):
+        inicio_revision = time.perf_counter()
+        revisiones = list(revisor.revisar_todas(medidas_filtradas))
+        segundos_revision = time.perf_counter() - inicio_revision
+        resumen = resumir_revisiones(revisiones)
+        st.caption(
+            f"{total_medidas:,} medidas revisadas en {segundos_revision:.2f} s "
+            f"({total_medidas / max(segundos_revision, 1e-9):,.0f} medidas/s)"
+        )
+        if resumen:
+            st.dataframe(
+                pd.DataFrame([{'Regla': REGLAS[r], 'Hallazgos': n} for r, n in resumen.most_common()]),
+                hide_index=True
+            )
+            st.caption(f"{len(revisiones):,} medidas con hallazgos; cada una muestra su versión optimizada en la lista.")
+        else:
+            st.success("Ninguna medida con referencias sin resolver ni patrones lentos conocidos.")
+
+    for medida in medidas_filtradas.pagina(pagina, TAMANO_PAGINA_MEDIDAS):
+        revision = revisor.revisar(medida)
+        icono = "🩺" if revision['hallazgos'] else "📊"
+        with st.expander(f"{icono} {medida['nombre']} ({medida['tipo']})"):
             st.markdown(f"**Descripción:** {medida.get('descripcion', 'N/A')}")
             st.code(medida['dax'], language='dax')
+            mostrar_revision(revision)
 
 # --- Sección de Gráficas Recomendadas ---
 if 'graficas' in st.session_state:
@@ -611,8 +927,14 @@ if 'graficas' in st.session_state:
     st.markdown("## 📈 Gráficas Recomendadas")
     
     graficas = st.session_state['graficas']
-    
-    for grafica in graficas:
+    previas = st.session_state.get('previas_graficas')
+    if previas and 'error' in previas:
+        st.caption(f"No se pudieron calcular las vistas previas: {previas['error']}")
+    elif previas:
+        origen = "la muestra" if previas['modo'] == 'rapido' else "los datos cargados"
+        st.caption(f"Vistas previas calculadas sobre {origen} ({previas['filas']:,} filas); al navegador solo llegan agregados.")
+
+    for i, grafica in enumerate(graficas):
         with st.container():
             col_g1, col_g2 = st.columns([2, 3])
             
@@ -624,9 +946,56 @@ if 'graficas' in st.session_state:
                 st.markdown("**Columnas sugeridas:**")
                 for col in grafica['columnas']:
                     st.markdown(f"- `{col}`")
+
+            previa = previas['graficas'][i] if previas and 'graficas' in previas and i < len(previas['graficas']) else None
+            if previa:
+                mostrar_previa_grafica(previa)
             
             st.markdown("---")
 
 # Footer
 st.markdown("---")
 st.markdown("💡 **Tip:** Ajusta las medidas según tu modelo de datos y relaciones en Power BI")
+cerrar_etapa(etapa_render)
+
+# --- Panel de rendimiento (al final: incluye las etapas de esta ejecución) ---
+with st.sidebar:
+    with st.expander("⏱️ Rendimiento"):
+        st.checkbox(
+            "Medir memoria pico (tracemalloc; ralentiza el análisis)", key='medir_memoria', value=MEDIR_MEMORIA_DEFECTO
+        )
+        if st.session_state.get('medir_memoria') and not traza.medir_memoria:
+            st.caption("tracemalloc es global al proceso: otra sesión está midiendo la memoria y esta ejecución no la mide.")
+        etapas = st.session_state['etapas']
+        if not etapas:
+            st.caption("Todavía no hay etapas medidas.")
+        else:
+            # Un análisis termina con st.rerun(): sus etapas están en la ejecución anterior a la actual
+            trabajo = [e['traza'] for e in etapas if e['nombre'] != 'render_resultados']
+            ultimas = {trabajo[-1] if trabajo else None, traza.id}
+            trazas = list(dict.fromkeys(e['traza'] for e in etapas))
+            ver_todas = st.toggle(f"Acumulado de las últimas {len(trazas)} ejecuciones", value=False)
+            filas = resumir_etapas(etapas if ver_todas else [e for e in etapas if e['traza'] in ultimas])
+            if not ver_todas:
+                st.caption("Último análisis y pintado de esta ejecución.")
+            st.dataframe(
+                pd.DataFrame(filas).rename(columns={
+                    'etapa': 'Etapa', 'llamadas': 'N', 'segundos': 'Tiempo (s)', 'segundos_cpu': 'CPU (s)',
+                    'memoria_pico_mb': 'Pico (MB)', 'tokens_entrada': 'Tokens in', 'tokens_salida': 'Tokens out',
+                }),
+                hide_index=True,
+                column_config={'Tiempo (s)': st.column_config.NumberColumn(format="%.3f"),
+                               'CPU (s)': st.column_config.NumberColumn(format="%.3f")},
+            )
+            st.download_button(
+                "💾 Exportar etapas (JSONL)",
+                data="\n".join(json.dumps(e, ensure_ascii=False, default=str) for e in etapas),
+                file_name="etapas_daxdesktop.jsonl",
+                mime="application/x-ndjson",
+            )
+            if obtener_exportador_trazas() is not None:
+                exportador = obtener_exportador_trazas()
+                st.caption(f"Exportando en formato {exportador.formato} a `{exportador.ruta}`")
+
+# Fin de la ejecución: libera tracemalloc para la siguiente traza (de esta u otra sesión)
+traza.terminar()
@@ -0,0 +1,24 @@
+import os
+
+from cli import main, rutas_salida
+
+
+def test_rutas_salida_relativas_a_la_carpeta_comun(tmp_path):
+    a, b = str(tmp_path / 'a' / 'ventas.csv'), str(tmp_path / 'b' / 'ventas.csv')
+    assert rutas_salida([a, b]) == {a: os.path.join('a', 'ventas.csv'), b: os.path.join('b', 'ventas.csv')}
+    assert rutas_salida([a]) == {a: 'ventas.csv'}
+
+
+def test_mismo_nombre_en_carpetas_distintas_no_se_pisa(tmp_path):
+    for carpeta, columna in (('a', 'Importe'), ('b', 'Cantidad')):
+        (tmp_path / 'datos' / carpeta).mkdir(parents=True)
+        (tmp_path / 'datos' / carpeta / 'ventas.csv').write_text(f'{columna},Region\n1.5,Norte\n2.5,Sur\n')
+    salida = tmp_path / 'salida'
+
+    codigo = main([str(tmp_path / 'datos' / '**' / '*.csv'), '--salida', str(salida),
+                   '--procesos', '1', '--sin-indice', '--sin-gemini'])
+
+    assert codigo == 0
+    assert 'Total Importe' in (salida / 'a' / 'ventas.csv.dax').read_text(encoding='utf-8')
+    assert 'Total Cantidad' in (salida / 'b' / 'ventas.csv.dax').read_text(encoding='utf-8')
+    assert (salida / 'a' / 'ventas.csv.json').exists() and (salida / 'b' / 'ventas.csv.json').exists()
@@ -0,0 +1,200 @@
+import json
+
+import pytest
+
+from analizador import consultar_gemini_json
+from cliente_gemini import CircuitoAbierto, ClienteFalso, ClienteGemini, Cortacircuitos, LimitadorTasa
+
+
+# CLASE: Reloj manual: dormir() avanza el tiempo en lugar de esperar
+class Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+        self.esperas = []
+
+    def __call__(self):
+        return self.ahora
+
+    def dormir(self, segundos):
+        self.esperas.append(segundos)
+        self.ahora += segundos
+
+
+# CLASE: Error transitorio con la cabecera Retry-After de la respuesta HTTP
+class ErrorConRetryAfter(TimeoutError):
+    def __init__(self, segundos):
+        super().__init__('cuota')
+        self.response = type('Respuesta', (), {'headers': {'retry-after': str(segundos)}})()
+
+
+# FUNCIÓN: ClienteGemini sobre un ClienteFalso, sin esperas reales ni jitter
+def cliente_de(falso, reloj, **opciones):
+    opciones.setdefault('limitador', LimitadorTasa(0, reloj=reloj))
+    opciones.setdefault('cortacircuitos', Cortacircuitos(reloj=reloj))
+    return ClienteGemini(falso, 'modelo', dormir=reloj.dormir, aleatorio=lambda: 1.0, **opciones)
+
+
+RESPUESTA = {
+    'nombre_tabla': 'Ventas',
+    'columnas': [{'nombre': 'Importe', 'tipo': 'numerico'}, {'nombre': 'Region', 'tipo': 'categorico'}],
+    'relaciones_posibles': [],
+    'metricas_clave': ['Total Importe'],
+}
+
+
+# --- Reintentos ---
+
+def test_reintenta_errores_transitorios_con_espera_exponencial():
+    reloj = Reloj()
+    falso = ClienteFalso([TimeoutError('lento'), ConnectionError('caído'), 'ok'])
+    cliente = cliente_de(falso, reloj)
+
+    assert cliente.generar('hola').text == 'ok'
+    assert len(falso.peticiones) == 3
+    # Jitter fijado en 1.0: la espera es el tope exponencial base * 2 ** intento
+    assert reloj.esperas == [1.0, 2.0]
+    assert cliente.contadores['reintentos'] == 2
+    assert cliente.contadores['fallos'] == 0
+
+
+def test_respeta_retry_after_del_servidor():
+    reloj = Reloj()
+    cliente = cliente_de(ClienteFalso([ErrorConRetryAfter(7), 'ok']), reloj)
+
+    assert cliente.generar('hola').text == 'ok'
+    assert reloj.esperas == [7.0]
+
+
+def test_no_reintenta_errores_del_cliente():
+    reloj = Reloj()
+    falso = ClienteFalso([ValueError('petición mal formada'), 'ok'])
+    cliente = cliente_de(falso, reloj)
+
+    with pytest.raises(ValueError):
+        cliente.generar('hola')
+    assert len(falso.peticiones) == 1
+    assert reloj.esperas == []
+    assert cliente.estadisticas()['circuito'] == 'cerrado'
+
+
+def test_propaga_el_ultimo_error_al_agotar_los_reintentos():
+    reloj = Reloj()
+    falso = ClienteFalso([TimeoutError('lento')])
+    cliente = cliente_de(falso, reloj, reintentos=2)
+
+    with pytest.raises(TimeoutError):
+        cliente.generar('hola')
+    assert len(falso.peticiones) == 3
+    assert cliente.contadores['fallos'] == 1
+
+
+def test_flujo_reintenta_hasta_el_primer_trozo():
+    reloj = Reloj()
+    falso = ClienteFalso([TimeoutError('lento'), 'abcdefghij'], tamano_trozo=3)
+    cliente = cliente_de(falso, reloj)
+
+    assert list(cliente.generar_flujo('hola')) == ['abc', 'def', 'ghi', 'j']
+    assert len(falso.peticiones) == 2
+
+
+# --- Cortacircuitos ---
+
+def test_circuito_se_abre_y_rechaza_sin_llamar():
+    reloj = Reloj()
+    falso = ClienteFalso([TimeoutError('caído')])
+    cliente = cliente_de(falso, reloj, reintentos=0, cortacircuitos=Cortacircuitos(2, 10, reloj))
+
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            cliente.generar('hola')
+    assert cliente.estadisticas()['circuito'] == 'abierto'
+
+    with pytest.raises(CircuitoAbierto):
+        cliente.generar('hola')
+    assert len(falso.peticiones) == 2
+    assert cliente.contadores['rechazadas'] == 1
+
+
+def test_circuito_semiabierto_deja_pasar_una_sola_prueba():
+    reloj = Reloj()
+    circuito = Cortacircuitos(1, 10, reloj)
+    circuito.registrar_fallo()
+    assert circuito.estado == 'abierto'
+
+    reloj.ahora += 10
+    assert circuito.estado == 'semiabierto'
+    circuito.permitir()
+    # Mientras la prueba está en curso, el resto de peticiones se rechaza
+    with pytest.raises(CircuitoAbierto):
+        circuito.permitir()
+
+
+def test_circuito_semiabierto_se_cierra_o_reabre_segun_la_prueba():
+    reloj = Reloj()
+    falso = ClienteFalso([TimeoutError('caído'), TimeoutError('sigue caído'), 'ok'])
+    cliente = cliente_de(falso, reloj, reintentos=0, cortacircuitos=Cortacircuitos(1, 10, reloj))
+
+    with pytest.raises(TimeoutError):
+        cliente.generar('hola')
+    reloj.ahora += 10
+    # La prueba falla: el circuito vuelve a abrirse con un enfriamiento nuevo
+    with pytest.raises(TimeoutError):
+        cliente.generar('hola')
+    assert cliente.estadisticas()['circuito'] == 'abierto'
+
+    reloj.ahora += 10
+    assert cliente.generar('hola').text == 'ok'
+    assert cliente.estadisticas()['circuito'] == 'cerrado'
+
+
+# --- Limitador de tasa ---
+
+def test_limitador_espacia_las_peticiones_tras_la_rafaga():
+    reloj = Reloj()
+    limitador = LimitadorTasa(60, rafaga=3, reloj=reloj)
+
+    assert [limitador.reservar() for _ in range(5)] == [0.0, 0.0, 0.0, 1.0, 2.0]
+
+
+def test_cliente_envia_al_ritmo_del_limitador():
+    reloj = Reloj()
+    envios = []
+    falso = ClienteFalso(lambda contents: envios.append(reloj()) or 'ok')
+    cliente = cliente_de(falso, reloj, limitador=LimitadorTasa(120, rafaga=1, reloj=reloj))
+
+    for _ in range(4):
+        cliente.generar('hola')
+    assert [b - a for a, b in zip(envios, envios[1:])] == [0.5, 0.5, 0.5]
+    assert cliente.contadores['segundos_espera_cuota'] == pytest.approx(1.5)
+
+
+# --- Respuestas truncadas o con vallas ---
+
+def test_respuesta_con_vallas_markdown():
+    texto = '```json\n' + json.dumps(RESPUESTA) + '\n```'
+    cliente = cliente_de(ClienteFalso([texto], tamano_trozo=5), Reloj())
+
+    resultado = consultar_gemini_json(cliente, 'instrucciones', ['texto'])
+    assert resultado['nombre_tabla'] == 'Ventas'
+    assert resultado['columnas'] == RESPUESTA['columnas']
+    assert resultado['metricas_clave'] == ['Total Importe']
+    assert 'truncado' not in resultado
+
+
+def test_respuesta_truncada_devuelve_lo_recibido():
+    texto = json.dumps(RESPUESTA)
+    corte = texto.index('{"nombre": "Region"') + 10
+    recibidas = []
+    cliente = cliente_de(ClienteFalso([texto[:corte]], tamano_trozo=7), Reloj())
+
+    resultado = consultar_gemini_json(cliente, 'instrucciones', ['texto'], lambda clave, valor: recibidas.append(clave))
+    assert resultado['truncado'] is True
+    assert resultado['columnas'] == RESPUESTA['columnas'][:1]
+    assert recibidas == ['nombre_tabla', 'columnas']
+
+
+def test_respuesta_truncada_sin_columnas_es_un_error():
+    cliente = cliente_de(ClienteFalso(['{"nombre_tabla": "Ventas", "colum']), Reloj())
+
+    with pytest.raises(ValueError):
+        consultar_gemini_json(cliente, 'instrucciones', ['texto'])
@@ -0,0 +1,35 @@
+import io
+
+import pandas as pd
+
+from perfilado import convertir_fechas, detectar_dia_primero, perfilar_por_bloques
+from previsualizacion import _serie_por_fecha
+
+
+def test_detecta_el_orden_con_campos_mayores_que_12():
+    assert detectar_dia_primero(['03/04/2024', '13/04/2024'])
+    assert not detectar_dia_primero(['04/03/2024', '04/13/2024'])
+    # Sin evidencia (todo ≤ 12) se asume dd/mm; las ISO no cuentan
+    assert detectar_dia_primero(['03/04/2024', '2024-12-31'])
+
+
+def test_toda_la_columna_se_lee_con_el_mismo_orden():
+    assert convertir_fechas(['03/04/2024', '13/04/2024', '2024-03-04']).tolist() == [
+        pd.Timestamp('2024-04-03'), pd.Timestamp('2024-04-13'), pd.Timestamp('2024-03-04'),
+    ]
+    assert convertir_fechas(['04/03/2024', '04/13/2024']).tolist() == [
+        pd.Timestamp('2024-04-03'), pd.Timestamp('2024-04-13'),
+    ]
+
+
+def test_perfilado_por_bloques_usa_el_orden_del_primer_bloque():
+    csv = b'Fecha,Importe\n13/01/2024,1\n03/04/2024,2\n05/02/2024,3\n'
+    analisis = perfilar_por_bloques(io.BytesIO(csv), 'ventas.csv', tamano_bloque=1)
+    assert analisis['rango_fechas']['Fecha'] == ('2024-01-13 00:00:00', '2024-04-03 00:00:00')
+
+
+def test_serie_de_la_previsualizacion_por_dia_primero():
+    parcial = pd.Series([1.0, 2.0, 3.0], index=['13/01/2024', '03/04/2024', '05/02/2024'])
+    serie = _serie_por_fecha(parcial)
+    assert list(serie.index) == [pd.Timestamp('2024-01-13'), pd.Timestamp('2024-02-05'), pd.Timestamp('2024-04-03')]
+    assert serie.tolist() == [1.0, 3.0, 2.0]
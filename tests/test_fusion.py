@@ -0,0 +1,141 @@
+import io
+import json
+import zipfile
+
+from analizador import convertir_analisis_imagen
+from exportacion import tablas_modelo
+from lotes import fusionar_analisis, fusionar_resultados_gemini, id_columna, origen_columna
+from medidas_dax import generar_medidas_dax
+from revision_dax import RevisorDax
+from vpax import leer_vpax
+
+
+# FUNCIÓN: Análisis mínimo de una tabla: {columna: (categoría, tipo)}
+def analisis_tabla(nombre, columnas):
+    analisis = {
+        'nombre_tabla': nombre, 'columnas': list(columnas), 'tipos': {}, 'nulls': {},
+        'numericas': [], 'categoricas': [], 'fechas': [],
+    }
+    for col, (categoria, tipo) in columnas.items():
+        analisis['tipos'][col] = tipo
+        analisis['nulls'][col] = 0
+        analisis[categoria].append(col)
+    return analisis
+
+
+def modelo_estrella():
+    fusion = fusionar_analisis([
+        analisis_tabla('Ventas', {'Importe': ('numericas', 'float64'), 'Nombre': ('categoricas', 'object')}),
+        analisis_tabla('Cliente', {'Nombre': ('categoricas', 'object'), 'Edad': ('numericas', 'int64')}),
+        analisis_tabla('Producto', {'Nombre': ('categoricas', 'object'), 'Precio': ('numericas', 'decimal')}),
+    ])
+    fusion['relaciones_modelo'] = [
+        {'desde_tabla': 'Ventas', 'desde_columna': 'Nombre', 'hacia_tabla': 'Producto', 'hacia_columna': 'Nombre',
+         'activa': True},
+    ]
+    return fusion
+
+
+def test_columnas_repetidas_se_identifican_por_tabla():
+    fusion = modelo_estrella()
+    assert fusion['columnas'] == ['Importe', 'Nombre', 'Nombre (Cliente)', 'Edad', 'Nombre (Producto)', 'Precio']
+    assert fusion['categoricas'] == ['Nombre', 'Nombre (Cliente)', 'Nombre (Producto)']
+    assert origen_columna(fusion, 'Nombre (Producto)') == ('Producto', 'Nombre')
+    assert id_columna(fusion, 'Cliente', 'Nombre') == 'Nombre (Cliente)'
+    assert id_columna(fusion, 'Ventas', 'Nombre') == 'Nombre'
+    assert fusion['tablas']['Producto'] == ['Nombre', 'Precio']
+
+
+def test_misma_tabla_en_varios_analisis_no_se_califica():
+    fusion = fusionar_analisis([
+        analisis_tabla('Tabla', {'Importe': ('numericas', 'float64')}),
+        analisis_tabla('Tabla', {'Importe': ('numericas', 'float64'), 'Region': ('categoricas', 'object')}),
+    ])
+    assert fusion['columnas'] == ['Importe', 'Region']
+
+
+def test_medidas_referencian_la_tabla_de_cada_columna():
+    fusion = modelo_estrella()
+    medidas = {m['nombre']: m['dax'] for m in generar_medidas_dax(fusion, 'Hechos')}
+    assert medidas['Conteo Distinto Nombre'] == 'Conteo Distinto Nombre = DISTINCTCOUNT(Hechos[Nombre])'
+    assert medidas['Conteo Distinto Nombre (Cliente)'] == 'Conteo Distinto Nombre (Cliente) = DISTINCTCOUNT(Cliente[Nombre])'
+    assert medidas['Conteo Distinto Nombre (Producto)'] == \
+        'Conteo Distinto Nombre (Producto) = DISTINCTCOUNT(Producto[Nombre])'
+    assert medidas['Importe x Precio'] == 'Importe x Precio = SUMX(Hechos, Hechos[Importe] * RELATED(Producto[Precio]))'
+
+    revisor = RevisorDax(generar_medidas_dax(fusion, 'Hechos'), fusion, 'Hechos')
+    sin_resolver = [r for r in revisor.revisar_todas(generar_medidas_dax(fusion, 'Hechos'))
+                    if any(h['regla'] == 'referencia_sin_resolver' for h in r['hallazgos'])]
+    assert sin_resolver == []
+
+
+def test_exportacion_con_tipos_de_cada_tabla():
+    fusion = modelo_estrella()
+    fusion['tipos']['Nombre (Producto)'] = 'bool'
+    modelo = tablas_modelo(fusion, 'Hechos')
+    assert modelo['Cliente'] == [('Nombre', 'string', 'none'), ('Edad', 'int64', 'sum')]
+    assert modelo['Producto'] == [('Nombre', 'boolean', 'none'), ('Precio', 'decimal', 'sum')]
+
+
+def test_cardinalidad_vpax_por_tabla():
+    columnas = [
+        {'TableName': 'Ventas', 'ColumnName': 'Importe', 'DataType': 'Double', 'ColumnCardinality': 900},
+        {'TableName': 'Cliente', 'ColumnName': 'Nombre', 'DataType': 'String', 'ColumnCardinality': 50},
+        {'TableName': 'Producto', 'ColumnName': 'Nombre', 'DataType': 'String', 'ColumnCardinality': 7},
+    ]
+    archivo = io.BytesIO()
+    with zipfile.ZipFile(archivo, 'w') as zf:
+        zf.writestr('DaxVpaView.json', json.dumps({'Tables': [], 'Columns': columnas}))
+    archivo.seek(0)
+
+    analisis = leer_vpax(archivo)
+    assert analisis['cardinalidad'][id_columna(analisis, 'Cliente', 'Nombre')] == 50
+    assert analisis['cardinalidad'][id_columna(analisis, 'Producto', 'Nombre')] == 7
+    assert analisis['cardinalidad']['Importe'] == 900
+
+
+def test_catalogo_con_relaciones_sin_hallazgos_del_revisor():
+    fusion = fusionar_analisis([
+        analisis_tabla('Ventas', {
+            'ProductoID': ('numericas', 'int64'), 'Cliente': ('categoricas', 'object'),
+            'Fecha': ('fechas', 'datetime64[ns]'), 'Importe': ('numericas', 'float64'),
+        }),
+        analisis_tabla('Producto', {'ProductoID': ('numericas', 'int64'), 'Precio': ('numericas', 'decimal')}),
+        analisis_tabla('Clientes', {'Cliente': ('categoricas', 'object'), 'Edad': ('numericas', 'int64')}),
+        analisis_tabla('Calendario', {'Fecha': ('fechas', 'datetime64[ns]')}),
+    ])
+    fusion['relaciones_modelo'] = [
+        {'desde_tabla': 'Ventas', 'desde_columna': col, 'hacia_tabla': tabla, 'hacia_columna': col, 'activa': True}
+        for col, tabla in (('ProductoID', 'Producto'), ('Cliente', 'Clientes'), ('Fecha', 'Calendario'))
+    ]
+    medidas = list(generar_medidas_dax(fusion, 'Ventas'))
+    por_nombre = {m['nombre']: m['dax'] for m in medidas}
+    assert por_nombre['Producto con Importe'] == \
+        'Producto con Importe = CALCULATE([Conteo Distinto ProductoID], Ventas[Importe] <> 0)'
+    assert 'Clientes con Importe' in por_nombre
+    # La clave de fecha no tiene medida de conteo distinto que reutilizar
+    assert 'Calendario con Importe' not in por_nombre
+
+    revisiones = RevisorDax(medidas, fusion, 'Ventas').revisar_todas(medidas)
+    assert [(r['nombre'], r['hallazgos']) for r in revisiones if r['hallazgos']] == []
+
+
+def test_fragmentos_de_gemini_conservan_columnas_de_cada_tabla():
+    resultado = fusionar_resultados_gemini([
+        {'nombre_tabla': 'Cliente', 'columnas': [{'nombre': 'Nombre', 'tipo': 'categorico'}],
+         'metricas_clave': ['Clientes'], 'relaciones_posibles': []},
+        {'nombre_tabla': 'Producto', 'columnas': [{'nombre': 'Nombre', 'tipo': 'categorico'},
+                                                  {'nombre': 'Precio', 'tipo': 'numerico'}],
+         'metricas_clave': ['Clientes'], 'relaciones_posibles': []},
+        {'nombre_tabla': 'Producto', 'columnas': [{'nombre': 'Precio', 'tipo': 'numerico'}]},
+    ])
+    assert [(c['tabla'], c['nombre']) for c in resultado['columnas']] == [
+        ('Cliente', 'Nombre'), ('Producto', 'Nombre'), ('Producto', 'Precio'),
+    ]
+    assert resultado['metricas_clave'] == ['Clientes']
+
+    analisis = convertir_analisis_imagen(resultado)
+    assert analisis['columnas'] == ['Nombre', 'Nombre (Producto)', 'Precio']
+    medidas = {m['nombre']: m['dax'] for m in generar_medidas_dax(analisis, 'Cliente')}
+    assert medidas['Conteo Distinto Nombre (Producto)'] == \
+        'Conteo Distinto Nombre (Producto) = DISTINCTCOUNT(Producto[Nombre])'
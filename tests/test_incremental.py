@@ -0,0 +1,33 @@
+from incremental import comparar_huellas, huellas_analisis
+from metadatos import parsear_metadatos
+
+
+# FUNCIÓN: Modelo TMSL con Nombre en Cliente y en Producto
+def modelo_tmsl(tipo_nombre_producto):
+    return {'model': {'tables': [
+        {'name': 'Ventas', 'columns': [{'name': 'ClienteID', 'dataType': 'int64'},
+                                       {'name': 'Importe', 'dataType': 'double'}]},
+        {'name': 'Cliente', 'columns': [{'name': 'ClienteID', 'dataType': 'int64'},
+                                        {'name': 'Nombre', 'dataType': 'string'}]},
+        {'name': 'Producto', 'columns': [{'name': 'Nombre', 'dataType': tipo_nombre_producto}]},
+    ]}}
+
+
+def test_retipar_una_columna_con_nombre_compartido():
+    antes = huellas_analisis(parsear_metadatos(modelo_tmsl('string')))
+    despues = huellas_analisis(parsear_metadatos(modelo_tmsl('int64')))
+    assert despues['tablas']['Producto']['Nombre'][:2] == ('numericas', 'int64')
+
+    diferencias = comparar_huellas(antes, despues)
+    assert diferencias['hay_cambios']
+    assert list(diferencias['tablas']) == ['Producto']
+    assert diferencias['tablas']['Producto']['retipadas'] == [
+        {'columna': 'Nombre', 'antes': 'categoricas', 'despues': 'numericas'},
+    ]
+
+
+def test_mismo_modelo_sin_cambios():
+    diferencias = comparar_huellas(huellas_analisis(parsear_metadatos(modelo_tmsl('string'))),
+                                   huellas_analisis(parsear_metadatos(modelo_tmsl('string'))))
+    assert not diferencias['hay_cambios']
+    assert diferencias['sin_cambios'] == 3
@@ -0,0 +1,62 @@
+import datetime
+import io
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import ingesta
+
+
+@pytest.fixture(autouse=True)
+def cache_temporal(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingesta, 'DIR_CACHE_PARQUET', str(tmp_path))
+    # Bloques diminutos: cada tipo nuevo aparece en un bloque distinto del primero
+    monkeypatch.setattr(ingesta, 'FILAS_BLOQUE_EXCEL', 2)
+
+
+# FUNCIÓN: .xlsx en memoria con las filas indicadas (la primera es la cabecera)
+def xlsx(*filas):
+    libro = openpyxl.Workbook()
+    for fila in filas:
+        libro.active.append(fila)
+    archivo = io.BytesIO()
+    libro.save(archivo)
+    archivo.seek(0)
+    return archivo
+
+
+# FUNCIÓN: Valores de una serie con None en los nulos (NaN, NaT y NA de Arrow)
+def valores(serie):
+    return [None if pd.isna(v) else v for v in serie.tolist()]
+
+
+def test_parquet_por_bloques_igual_que_read_excel():
+    archivo = xlsx(
+        ['Id', 'Nombre', 'Nombre', 'Fecha', 'Mixta', 'Tardía', 'Importe'],
+        [1, 'a', 'x', datetime.datetime(2024, 1, 2), 5, None, 1],
+        [None, None, None, None, None, None, None],
+        [3, 'c', 'z', datetime.datetime(2024, 1, 4), 't', 7, 2],
+        [4, 'd', 'w', datetime.datetime(2024, 1, 5), 6, 8, 2.5],
+        [None, None, None, None, None, None, None],
+    )
+    esperado = pd.read_excel(archivo)
+    # La columna mixta se guarda como texto
+    esperado['Mixta'] = esperado['Mixta'].map(lambda v: v if pd.isna(v) else str(v))
+    df = ingesta.leer_excel_cacheado(archivo, 'h')
+
+    assert list(df.columns) == ['Id', 'Nombre', 'Nombre.1', 'Fecha', 'Mixta', 'Tardía', 'Importe']
+    assert len(df) == len(esperado) == 4
+    for col in esperado.columns:
+        assert valores(df[col]) == valores(esperado[col]), col
+
+
+def test_lotes_de_excel_solo_con_las_columnas_pedidas():
+    archivo = xlsx(['A', 'B'], *[[i, f'v{i}'] for i in range(5)])
+    lotes = list(ingesta.iterar_lotes_datos(archivo, 'datos.xlsx', 'h', ['B']))
+    assert pd.concat(lotes)['B'].tolist() == [f'v{i}' for i in range(5)]
+    assert all(list(lote.columns) == ['B'] for lote in lotes)
+
+
+def test_excel_sin_datos():
+    assert ingesta.leer_excel_cacheado(xlsx(), 'h').empty
@@ -0,0 +1,59 @@
+import gc
+import tracemalloc
+
+import pytest
+
+from instrumentacion import etapa, iniciar_traza
+
+
+@pytest.fixture(autouse=True)
+def sin_tracemalloc():
+    yield
+    # Las trazas de cada prueba se recolectan y liberan la medición antes de la siguiente
+    iniciar_traza()
+    gc.collect()
+    tracemalloc.stop()
+
+
+def test_la_traza_que_arranca_tracemalloc_lo_detiene():
+    traza = iniciar_traza(medir_memoria=True)
+    assert tracemalloc.is_tracing()
+    with etapa('reserva'):
+        bloque = bytearray(2 * 1024 ** 2)
+    del bloque
+    assert traza.destino[0]['memoria_pico_mb'] >= 2
+
+    traza.terminar()
+    assert not tracemalloc.is_tracing()
+
+
+def test_solo_una_traza_mide_memoria_a_la_vez():
+    primera = iniciar_traza(medir_memoria=True)
+    segunda = iniciar_traza(medir_memoria=True)
+    assert primera.medir_memoria and not segunda.medir_memoria
+    with etapa('sin medir'):
+        pass
+    assert segunda.destino[0]['memoria_pico_mb'] is None
+
+    # Terminar la que no mide no toca tracemalloc
+    segunda.terminar()
+    assert tracemalloc.is_tracing()
+    primera.terminar()
+    assert iniciar_traza(medir_memoria=True).medir_memoria
+
+
+def test_traza_abandonada_libera_la_medicion():
+    traza = iniciar_traza(medir_memoria=True)
+    del traza
+    # La traza activa del contexto también la retiene: una nueva la sustituye
+    iniciar_traza()
+    gc.collect()
+    assert not tracemalloc.is_tracing()
+    assert iniciar_traza(medir_memoria=True).medir_memoria
+
+
+def test_no_detiene_un_tracemalloc_ajeno():
+    tracemalloc.start()
+    traza = iniciar_traza(medir_memoria=True)
+    traza.terminar()
+    assert tracemalloc.is_tracing()
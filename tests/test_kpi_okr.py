@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from analizador import analizar_estructura, sugerir_kpi_okr
+from medidas_dax import generar_medidas_dax
+from revision_dax import RevisorDax
+
+
+# FUNCIÓN: Análisis de un DataFrame pequeño con las columnas indicadas
+def analisis_de(**columnas):
+    return analizar_estructura(pd.DataFrame(columnas))
+
+
+FECHAS = pd.date_range('2024-01-01', periods=6, freq='MS')
+
+CASOS = {
+    'con_fechas': dict(
+        Importe=[10.5, 20.0, 5.25, 7.0, 3.5, 8.0], Coste=[4.0, 9.5, 2.0, 3.0, 1.5, 4.5],
+        Region=['Norte', 'Sur', 'Norte', 'Este', 'Sur', 'Este'], Fecha=FECHAS,
+    ),
+    'sin_fechas': dict(Importe=[10.5, 20.0, 5.25, 7.0], Region=['Norte', 'Sur', 'Norte', 'Este']),
+    'con_clave': dict(
+        ClienteID=[1, 2, 3, 4, 5, 6], Importe=[10.5, 20.0, 5.25, 7.0, 3.5, 8.0],
+        Region=['Norte', 'Sur', 'Norte', 'Este', 'Sur', 'Este'], Fecha=FECHAS,
+    ),
+    'solo_clave': dict(ClienteID=[1, 2, 3, 4], Region=['Norte', 'Sur', 'Norte', 'Este']),
+}
+
+
+@pytest.mark.parametrize('caso', CASOS)
+def test_kpi_sin_hallazgos_del_revisor(caso):
+    analisis = analisis_de(**CASOS[caso])
+    revisor = RevisorDax(generar_medidas_dax(analisis, 'Ventas'), analisis, 'Ventas')
+    sugerencias = sugerir_kpi_okr(analisis, 'Ventas')
+    assert sugerencias
+    for sugerencia in sugerencias:
+        revision = revisor.revisar(sugerencia)
+        assert revision['hallazgos'] == [], (sugerencia['nombre'], sugerencia['dax_base'], revision['hallazgos'])
+
+
+def test_kpi_reutilizan_medidas_del_catalogo():
+    analisis = analisis_de(**CASOS['con_fechas'])
+    kpi = {k['nombre']: k['dax_base'] for k in sugerir_kpi_okr(analisis, 'Ventas')}
+    num_col = next(n[len('KPI: Tasa de '):] for n in kpi if n.startswith('KPI: Tasa de '))
+    assert kpi[f'KPI: Tasa de {num_col}'] == f'[Total {num_col}]'
+    crecimiento = kpi[f'KPI: Crecimiento de {num_col} (MoM)']
+    assert f'VAR Anterior = [{num_col} Mes Anterior]' in crecimiento
+    assert f'DIVIDE([Total {num_col}] - Anterior, Anterior)' in crecimiento
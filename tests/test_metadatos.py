@@ -0,0 +1,15 @@
+import pytest
+
+from metadatos import parsear_metadatos
+
+
+@pytest.mark.parametrize('data', [{'model': [1, 2]}, {'model': 'x'}, {'createOrReplace': 'x'}])
+def test_json_ajeno_no_es_tmsl(data):
+    assert parsear_metadatos(data) is None
+
+
+def test_model_que_no_es_objeto_pasa_al_siguiente_parser():
+    filas = [{'TableName': 'Ventas', 'ColumnName': 'Importe', 'DataType': 'double'}]
+    analisis = parsear_metadatos({'model': 'x', 'results': [{'tables': [{'rows': filas}]}]})
+    assert analisis['columnas'] == ['Importe']
+    assert analisis['numericas'] == ['Importe']
@@ -0,0 +1,38 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from perfilado import PERCENTILES, _estadisticas_numericas, perfilar_por_bloques
+
+
+def test_estadisticas_por_columna_coinciden_con_numpy():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'real': np.where(rng.random(1000) < 0.2, np.nan, rng.normal(size=1000)),
+        'entero': pd.array(rng.integers(0, 7, 1000), dtype='Int64'),
+        'vacia': np.full(1000, np.nan),
+    })
+    df.loc[::5, 'entero'] = pd.NA
+    original = df.copy()
+
+    estadisticas, distintos = _estadisticas_numericas(df, list(df.columns))
+    for col in ('real', 'entero'):
+        valores = df[col].dropna().to_numpy(dtype=np.float64)
+        assert distintos[col] == len(np.unique(valores))
+        assert estadisticas[col]['minimo'] == valores.min()
+        assert estadisticas[col]['maximo'] == valores.max()
+        assert np.isclose(estadisticas[col]['media'], valores.mean())
+        esperados = np.percentile(valores, PERCENTILES)
+        assert np.allclose(list(estadisticas[col]['percentiles'].values()), esperados)
+    # Una columna sin valores solo cuenta distintos; el DataFrame no se ordena en su sitio
+    assert distintos['vacia'] == 0 and 'vacia' not in estadisticas
+    pd.testing.assert_frame_equal(df, original)
+
+
+def test_cardinalidad_con_bloques_de_distinto_tipo_numerico():
+    # El primer bloque se lee como int64; el segundo, con un vacío, como float64 con los mismos valores
+    filas = [f'{i},a' for i in range(2000)] + [f'{i},a' for i in range(1999)] + [',a']
+    csv = ('Codigo,Tipo\n' + '\n'.join(filas) + '\n').encode()
+    analisis = perfilar_por_bloques(io.BytesIO(csv), 'codigos.csv', tamano_bloque=2000)
+    assert abs(analisis['cardinalidad']['Codigo'] - 2000) < 100
@@ -0,0 +1,164 @@
+import csv
+import hashlib
+import json
+import re
+from functools import lru_cache
+
+
+# Presupuesto de tokens por fragmento enviado a Gemini
+PRESUPUESTO_TOKENS_DEFECTO = 30_000
+
+# Cortes por contenido: un fragmento se cierra tras una tabla cuyo hash es múltiplo de este valor
+# (una de cada ~8), siempre que ya ocupe al menos esta fracción del presupuesto
+TABLAS_POR_CORTE = 8
+FRACCION_MINIMA_FRAGMENTO = 0.25
+
+# Precios de gemini-2.5-flash en USD por millón de tokens (entrada / salida de texto)
+PRECIO_ENTRADA_MILLON = 0.30
+PRECIO_SALIDA_MILLON = 2.50
+
+# La respuesta JSON suele ocupar una fracción de la entrada (una entrada por columna)
+PROPORCION_SALIDA_ESTIMADA = 0.25
+
+# Sin el vocabulario de tiktoken disponible (entornos sin red) se estima ~4 caracteres por token
+CARACTERES_POR_TOKEN = 4
+
+PATRON_CABECERA_TABLA = re.compile(r'^\s*(table|tabla)\b', re.IGNORECASE)
+
+
+# FUNCIÓN: Codificador de tiktoken (cl100k_base aproxima bien el tokenizador de Gemini)
+@lru_cache(maxsize=1)
+def _codificador():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding('cl100k_base')
+    except Exception:
+        return None
+
+
+# FUNCIÓN: Contar tokens de un texto
+def contar_tokens(texto):
+    codificador = _codificador()
+    if codificador is None:
+        return -(-len(texto) // CARACTERES_POR_TOKEN)
+    return len(codificador.encode(texto, disallowed_special=()))
+
+
+# FUNCIÓN: Coste estimado en USD de analizar `tokens_entrada` tokens
+def estimar_coste(tokens_entrada, tokens_salida=None):
+    if tokens_salida is None:
+        tokens_salida = int(tokens_entrada * PROPORCION_SALIDA_ESTIMADA)
+    return (tokens_entrada * PRECIO_ENTRADA_MILLON + tokens_salida * PRECIO_SALIDA_MILLON) / 1_000_000
+
+
+# FUNCIÓN: Unidades indivisibles (una por tabla) de una exportación JSON
+def _unidades_json(data):
+    if isinstance(data, dict):
+        modelo = data.get('model', data)
+        tablas = modelo.get('tables') if isinstance(modelo, dict) else None
+        if isinstance(tablas, list):
+            return [json.dumps(t, ensure_ascii=False) for t in tablas]
+        return [json.dumps(data, ensure_ascii=False)]
+    if isinstance(data, list):
+        return [json.dumps(elemento, ensure_ascii=False) for elemento in data]
+    return [json.dumps(data, ensure_ascii=False)]
+
+
+# FUNCIÓN: Unidades (una por tabla) de una exportación de texto, con la cabecera a repetir
+def _unidades_texto(texto):
+    lineas = texto.splitlines()
+    if not lineas:
+        return '', []
+
+    # Volcados tabulares (TABLE_NAME<sep>COLUMN_NAME<sep>...): se agrupa por la primera columna
+    try:
+        dialecto = csv.Sniffer().sniff('\n'.join(lineas[:50]), delimiters='\t;,|')
+        filas = list(csv.reader(lineas, dialecto))
+        if len(filas) > 1 and all(len(f) == len(filas[0]) for f in filas[:50] if f):
+            grupos = {}
+            for linea, fila in zip(lineas[1:], filas[1:]):
+                if fila:
+                    grupos.setdefault(fila[0], []).append(linea)
+            return lineas[0], ['\n'.join(grupo) for grupo in grupos.values()]
+    except csv.Error:
+        pass
+
+    # Texto libre: un bloque por cada línea que empieza con "Table"/"Tabla", o por párrafos
+    separar = PATRON_CABECERA_TABLA.match if any(PATRON_CABECERA_TABLA.match(l) for l in lineas) else None
+    bloques, actual = [], []
+    for linea in lineas:
+        nuevo_bloque = separar(linea) if separar else not linea.strip()
+        if nuevo_bloque and actual:
+            bloques.append('\n'.join(actual))
+            actual = []
+        if linea.strip() or separar:
+            actual.append(linea)
+    if actual:
+        bloques.append('\n'.join(actual))
+    return '', bloques
+
+
+# FUNCIÓN: Partir una unidad que por sí sola excede el presupuesto
+def _partir_por_lineas(unidad, presupuesto):
+    trozos, actual, tokens_actual = [], [], 0
+    for linea in unidad.splitlines():
+        tokens_linea = contar_tokens(linea) + 1
+        if actual and tokens_actual + tokens_linea > presupuesto:
+            trozos.append('\n'.join(actual))
+            actual, tokens_actual = [], 0
+        actual.append(linea)
+        tokens_actual += tokens_linea
+    if actual:
+        trozos.append('\n'.join(actual))
+    return trozos
+
+
+# FUNCIÓN: ¿Se puede cerrar un fragmento después de esta unidad? (depende solo de su contenido)
+def _es_corte(unidad):
+    return int.from_bytes(hashlib.blake2b(unidad.encode('utf-8'), digest_size=4).digest(), 'big') % TABLAS_POR_CORTE == 0
+
+
+# FUNCIÓN: Dividir una exportación de metadata en fragmentos que caben en el presupuesto
+def dividir_por_tablas(texto, presupuesto=PRESUPUESTO_TOKENS_DEFECTO):
+    """
+    Corta solo en límites de tabla; cada fragmento es JSON (lista) o texto con su cabecera.
+    Los cortes los decide el contenido de las tablas y no su posición: si una tabla cambia, solo
+    cambia su fragmento y los demás se siguen encontrando en la caché de Gemini.
+    """
+    try:
+        data = json.loads(texto)
+        cabecera, unidades, es_json = '', _unidades_json(data), True
+    except ValueError:
+        (cabecera, unidades), es_json = _unidades_texto(texto), False
+
+    tokens_cabecera = contar_tokens(cabecera) if cabecera else 0
+    limite = max(1, presupuesto - tokens_cabecera)
+    minimo = limite * FRACCION_MINIMA_FRAGMENTO
+    fragmentos, actual, tokens_actual = [], [], 0
+
+    def cerrar():
+        if not actual:
+            return
+        if es_json:
+            fragmentos.append('[' + ',\n'.join(actual) + ']')
+        else:
+            fragmentos.append('\n'.join(([cabecera] if cabecera else []) + actual))
+
+    for unidad in unidades:
+        tokens_unidad = contar_tokens(unidad)
+        if es_json and tokens_unidad > limite:
+            # Una tabla JSON enorme se reindenta para poder cortarla por líneas
+            unidad = json.dumps(json.loads(unidad), ensure_ascii=False, indent=1)
+        piezas = [unidad] if tokens_unidad <= limite else _partir_por_lineas(unidad, limite)
+        for pieza in piezas:
+            tokens_pieza = tokens_unidad if len(piezas) == 1 else contar_tokens(pieza)
+            if actual and tokens_actual + tokens_pieza > limite:
+                cerrar()
+                actual, tokens_actual = [], 0
+            actual.append(pieza)
+            tokens_actual += tokens_pieza
+            if tokens_actual >= minimo and _es_corte(pieza):
+                cerrar()
+                actual, tokens_actual = [], 0
+    cerrar()
+    return fragmentos or [texto]
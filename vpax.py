@@ -0,0 +1,94 @@
+import zipfile
+
+from json_incremental import abrir_texto, iterar_arrays_json
+from lotes import id_columna
+from metadatos import construir_analisis, es_columna_interna, nombre_referencia, relaciones_vertipaq
+
+
+# Partes del paquete .vpax que se leen (en orden de preferencia)
+PARTE_VPA_VIEW = 'daxvpaview.json'
+PARTE_DAX_MODEL = 'daxmodel.json'
+
+
+# FUNCIÓN: Localizar una parte del zip sin distinguir mayúsculas ni carpeta
+def _buscar_parte(zf, nombre):
+    for info in zf.infolist():
+        if info.filename.rsplit('/', 1)[-1].lower() == nombre:
+            return info
+    return None
+
+
+# FUNCIÓN: Estadísticas de VertiPaq de una columna
+def _estadisticas_columna(col):
+    return {
+        'cardinalidad': col.get('ColumnCardinality'),
+        'diccionario': col.get('DictionarySize'),
+        'datos': col.get('DataSize'),
+        'total': col.get('TotalSize'),
+        'codificacion': col.get('Encoding'),
+    }
+
+
+# FUNCIÓN: Leer DaxVpaView.json en streaming (tablas, columnas y relaciones en listas planas)
+def _leer_vpa_view(flujo):
+    tablas, estadisticas, filas_tablas, relaciones, medidas = {}, {}, {}, [], []
+    for clave, elemento in iterar_arrays_json(flujo, {'Tables', 'Columns', 'Relationships', 'Measures'}):
+        if clave == 'Tables':
+            filas_tablas[elemento.get('TableName')] = elemento.get('RowsCount')
+        elif clave == 'Columns':
+            nombre = elemento.get('ColumnName')
+            if nombre and not es_columna_interna(nombre, elemento.get('ColumnType')):
+                tabla = elemento.get('TableName', 'Tabla')
+                tablas.setdefault(tabla, []).append((nombre, elemento.get('DataType', 'String')))
+                estadisticas.setdefault(tabla, {})[nombre] = _estadisticas_columna(elemento)
+        elif clave == 'Relationships':
+            relaciones.extend(relaciones_vertipaq([elemento]))
+        elif clave == 'Measures' and elemento.get('MeasureName'):
+            medidas.append(elemento['MeasureName'])
+    return tablas, estadisticas, filas_tablas, relaciones, medidas
+
+
+# FUNCIÓN: Leer DaxModel.json en streaming (columnas anidadas en cada tabla)
+def _leer_dax_model(flujo):
+    tablas, estadisticas, filas_tablas, relaciones, medidas = {}, {}, {}, [], []
+    for clave, elemento in iterar_arrays_json(flujo, {'Tables', 'Relationships'}):
+        if clave == 'Relationships':
+            relaciones.extend(relaciones_vertipaq([elemento]))
+            continue
+        tabla = nombre_referencia(elemento.get('TableName')) or 'Tabla'
+        filas_tablas[tabla] = elemento.get('RowsCount')
+        for col in elemento.get('Columns', []):
+            nombre = nombre_referencia(col.get('ColumnName'))
+            if nombre and not es_columna_interna(nombre, col.get('ColumnType')):
+                tablas.setdefault(tabla, []).append((nombre, col.get('DataType', 'String')))
+                estadisticas.setdefault(tabla, {})[nombre] = _estadisticas_columna(col)
+        medidas.extend(nombre_referencia(m.get('MeasureName')) for m in elemento.get('Measures', []) if m.get('MeasureName'))
+    return tablas, estadisticas, filas_tablas, relaciones, medidas
+
+
+# FUNCIÓN: Lector de archivos .vpax / .ovpax (VertiPaq Analyzer) sin extraer a disco
+def leer_vpax(archivo):
+    """ Devuelve el análisis con cardinalidad, tamaño de diccionario, codificación y filas por tabla, o None. """
+    with zipfile.ZipFile(archivo) as zf:
+        for nombre_parte, lector in ((PARTE_VPA_VIEW, _leer_vpa_view), (PARTE_DAX_MODEL, _leer_dax_model)):
+            info = _buscar_parte(zf, nombre_parte)
+            if info is None:
+                continue
+            with zf.open(info) as binario, abrir_texto(binario) as flujo:
+                tablas, estadisticas, filas_tablas, relaciones, medidas = lector(flujo)
+            if tablas:
+                break
+        else:
+            return None
+
+    analisis = construir_analisis(tablas, relaciones, medidas)
+    analisis['origen'] = 'vpax'
+    analisis['filas_tablas'] = filas_tablas
+    analisis['estadisticas_columnas'] = estadisticas
+    # 'cardinalidad' por id de columna, igual que el resto del análisis fusionado ('Nombre (Producto)')
+    analisis['cardinalidad'] = {}
+    for tabla in analisis['tablas']:
+        for columna, stats in estadisticas.get(tabla, {}).items():
+            if stats['cardinalidad'] is not None:
+                analisis['cardinalidad'].setdefault(id_columna(analisis, tabla, columna), stats['cardinalidad'])
+    return analisis